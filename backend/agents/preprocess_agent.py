@@ -1,36 +1,53 @@
 from __future__ import annotations
 
 import functools
-import json
 import logging
-import re
 from typing import Any, Dict
 
-from backend.llm.client import chat_completion
+from backend.llm.async_lru import async_lru_cache
+from backend.llm.single_flight import fingerprint, get_single_flight
+from backend.llm.client import chat_completion, chat_completion_async
+from backend.llm.json_output import json_schema_format, parse_json_output
+from backend.llm.tokens import count_message_tokens, count_tokens, plan_max_tokens
 from backend.models import PreprocessResult
 from backend.agents.prompts import PREPROCESS_SYSTEM_PROMPT
 
 
 logger = logging.getLogger(__name__)
 
-
-@functools.lru_cache(maxsize=256)
-#function to run the preprocess agent with an LRU cache
-def _run_preprocess_agent_cached(document_text: str) -> PreprocessResult:
+PREPROCESS_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "language": {"type": "string"},
+        "cleaned_text": {"type": "string"},
+        "removed_text": {"type": "string"},
+        "key_requirements_summary": {"type": "string"},
+        "comparison_agreement": {"type": "boolean"},
+        "comparison_notes": {"type": "string"},
+    },
+    "required": ["language", "cleaned_text", "removed_text", "key_requirements_summary"],
+}
+
+
+#function to build the preprocess chat completion request (shared by the sync and async clients)
+def _build_preprocess_request(document_text: str) -> Dict[str, Any]:
     logger.info(
         "Preprocess agent: starting (input_chars=%d)",
         len(document_text),
     )
-
     text_input = document_text[:50000] if len(document_text) > 50000 else document_text
 
     user_prompt = f"""FULL RAW RFP TEXT (after OCR):
 {text_input}
 """
 
-    system_tokens = len(PREPROCESS_SYSTEM_PROMPT) // 4
-    user_tokens = len(user_prompt) // 4
-    total_input_tokens = system_tokens + user_tokens + 100
+    messages = [
+        {"role": "system", "content": PREPROCESS_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+    system_tokens = count_tokens(PREPROCESS_SYSTEM_PROMPT)
+    user_tokens = count_tokens(user_prompt)
+    total_input_tokens = count_message_tokens(messages)
 
     logger.info(
         "Preprocess prompt tokens: system=%d, user=%d, total=%d",
@@ -39,37 +56,22 @@ def _run_preprocess_agent_cached(document_text: str) -> PreprocessResult:
         total_input_tokens,
     )
 
-    max_output_tokens = max(4000, min(8000, 32769 - total_input_tokens - 1000))
-
-    content = chat_completion(
-        model="gpt-5-chat",
-        messages=[
-            {"role": "system", "content": PREPROCESS_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.0,
-        max_tokens=max_output_tokens,
-    )
-
-    #function to safely parse JSON returned by the LLM
-    def _parse_json_safely(raw: str) -> Dict[str, Any]:
-        cleaned = (
-            raw.replace("```json", "")
-            .replace("```", "")
-            .strip()
-        )
-        match = re.search(r"\{.*\}", cleaned, flags=re.DOTALL)
-        if match:
-            cleaned = match.group(0)
-        cleaned = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]', '', cleaned)
-        cleaned = re.sub(r",\s*([}\]])", r"\\1", cleaned)
-        try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            logger.error("Preprocess agent: failed to parse JSON: %s", str(e))
-            logger.debug("Preprocess agent: problematic JSON (first 1500 chars):\n%s", cleaned[:1500])
-            raise
-
+    max_output_tokens = plan_max_tokens("preprocess", total_input_tokens, ceiling=8000, floor=4000)
+    return {
+        "model": "gpt-5-chat",
+        "messages": messages,
+        "temperature": 0.0,
+        "max_tokens": max_output_tokens,
+        "agent": "preprocess",
+        "response_format": json_schema_format("preprocess_result", PREPROCESS_OUTPUT_SCHEMA),
+    }
+
+#function to safely parse JSON returned by the LLM
+def _parse_json_safely(raw: str) -> Dict[str, Any]:
+    return parse_json_output(raw, expect="object", label="Preprocess agent")
+
+#function to convert the raw LLM output into a PreprocessResult
+def _parse_preprocess_content(content: str) -> PreprocessResult:
     data = _parse_json_safely(content)
 
     language = data.get("language") or "en"
@@ -102,6 +104,20 @@ def _run_preprocess_agent_cached(document_text: str) -> PreprocessResult:
     )
     return result
 
+
+@functools.lru_cache(maxsize=256)
+#function to run the preprocess agent with an LRU cache
+def _run_preprocess_agent_cached(document_text: str) -> PreprocessResult:
+    content = chat_completion(**_build_preprocess_request(document_text))
+    return _parse_preprocess_content(content)
+
+
+@async_lru_cache(maxsize=256)
+#function to run the preprocess agent on the async LLM client with an LRU cache
+async def _run_preprocess_agent_cached_async(document_text: str) -> PreprocessResult:
+    content = await chat_completion_async(**_build_preprocess_request(document_text))
+    return _parse_preprocess_content(content)
+
 #function to run the preprocess agent and log cache status
 def run_preprocess_agent(document_text: str) -> PreprocessResult:
     cache_info = _run_preprocess_agent_cached.cache_info()
@@ -113,7 +129,10 @@ def run_preprocess_agent(document_text: str) -> PreprocessResult:
         cache_info.maxsize,
     )
 
-    result = _run_preprocess_agent_cached(document_text)
+    #identical concurrent requests share one in-flight LLM call instead of all missing the cache at once
+    result = get_single_flight("preprocess").do(
+        fingerprint(document_text), lambda: _run_preprocess_agent_cached(document_text)
+    )
     new_cache_info = _run_preprocess_agent_cached.cache_info()
     if new_cache_info.hits > cache_info.hits:
         logger.info("Preprocess agent: cache HIT - returned cached result")
@@ -122,3 +141,25 @@ def run_preprocess_agent(document_text: str) -> PreprocessResult:
 
     return result
 
+
+#function to run the preprocess agent without blocking the event loop and log cache status
+async def run_preprocess_agent_async(document_text: str) -> PreprocessResult:
+    cache_info = _run_preprocess_agent_cached_async.cache_info()
+    logger.info(
+        "Preprocess agent (async): cache status (hits=%d, misses=%d, size=%d/%d)",
+        cache_info.hits,
+        cache_info.misses,
+        cache_info.currsize,
+        cache_info.maxsize,
+    )
+
+    result = await get_single_flight("preprocess").do_async(
+        fingerprint(document_text), lambda: _run_preprocess_agent_cached_async(document_text)
+    )
+    new_cache_info = _run_preprocess_agent_cached_async.cache_info()
+    if new_cache_info.hits > cache_info.hits:
+        logger.info("Preprocess agent (async): cache HIT - returned cached result")
+    else:
+        logger.info("Preprocess agent (async): cache MISS - processed new request")
+
+    return result
@@ -3,22 +3,33 @@ from __future__ import annotations
 import functools
 import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any
 
-from backend.llm.client import chat_completion
+from backend.llm.async_lru import async_lru_cache
+from backend.llm.client import chat_completion, chat_completion_async
+from backend.llm.json_output import json_schema_format, parse_json_output
 from backend.models import RequirementItem
 from backend.agents.prompts import QUALITY_SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 QUALITY_MODEL = "gpt-5-chat"
 
+QUALITY_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number"},
+        "completeness": {"type": "string", "enum": ["complete", "partial", "incomplete"]},
+        "relevance": {"type": "string", "enum": ["high", "medium", "low"]},
+        "issues": {"type": "array", "items": {"type": "string"}},
+        "suggestions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "completeness", "relevance", "issues", "suggestions"],
+}
 
-@functools.lru_cache(maxsize=256)
-#function to call LLM and parse JSON quality assessment (cached)
-def _assess_response_quality_cached(
-    requirement_json: str,
-    response_text: str,
-) -> Dict[str, Any]:
+
+#function to build the quality assessment chat completion request for a requirement/response pair
+#(shared by the sync and async clients)
+def _build_quality_request(requirement_json: str, response_text: str) -> Dict[str, Any]:
     requirement = RequirementItem(**json.loads(requirement_json))
     
     logger.info("Quality assessment: evaluating response for requirement %s", requirement.id)
@@ -39,70 +50,95 @@ Provide a quality assessment with:
 - suggestions: List of improvement suggestions
 
 Output JSON format."""
+    return {
+        "model": QUALITY_MODEL,
+        "messages": [
+            {"role": "system", "content": QUALITY_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 800,
+        "agent": "quality",
+        "response_format": json_schema_format("quality_assessment", QUALITY_OUTPUT_SCHEMA),
+    }
+
+#function to parse and normalise the LLM quality assessment JSON
+def _parse_quality_content(content: str) -> Dict[str, Any]:
+    result = parse_json_output(content, expect="object", label="Quality agent")
+    
+    score = float(result.get("score", 50))
+    score = max(0, min(100, score))
+    
+    completeness = result.get("completeness", "partial")
+    if completeness not in ["complete", "partial", "incomplete"]:
+        completeness = "partial"
+    
+    relevance = result.get("relevance", "medium")
+    if relevance not in ["high", "medium", "low"]:
+        relevance = "medium"
+    
+    issues = result.get("issues", [])
+    if not isinstance(issues, list):
+        issues = []
+    
+    suggestions = result.get("suggestions", [])
+    if not isinstance(suggestions, list):
+        suggestions = []
     
+    logger.info(
+        "Quality assessment: score=%.1f, completeness=%s, relevance=%s, issues=%d",
+        score,
+        completeness,
+        relevance,
+        len(issues),
+    )
+    
+    return {
+        "score": score,
+        "completeness": completeness,
+        "relevance": relevance,
+        "issues": issues,
+        "suggestions": suggestions,
+    }
+
+#function to build the fallback assessment returned when the quality check fails
+def _quality_failure(error: Exception) -> Dict[str, Any]:
+    logger.error("Quality assessment failed: %s", error)
+    return {
+        "score": 50.0,
+        "completeness": "unknown",
+        "relevance": "unknown",
+        "issues": [f"Quality assessment failed: {str(error)}"],
+        "suggestions": [],
+    }
+
+
+@functools.lru_cache(maxsize=256)
+#function to call LLM and parse JSON quality assessment (cached)
+def _assess_response_quality_cached(
+    requirement_json: str,
+    response_text: str,
+) -> Dict[str, Any]:
+    request = _build_quality_request(requirement_json, response_text)
     try:
-        content = chat_completion(
-            model=QUALITY_MODEL,
-            messages=[
-                {"role": "system", "content": QUALITY_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=800,
-        )
-        
-        import re
-        cleaned = content.replace("```json", "").replace("```", "").strip()
-        json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-        if json_match:
-            result = json.loads(json_match.group(0))
-        else:
-            result = json.loads(cleaned)
-        
-        score = float(result.get("score", 50))
-        score = max(0, min(100, score))
-        
-        completeness = result.get("completeness", "partial")
-        if completeness not in ["complete", "partial", "incomplete"]:
-            completeness = "partial"
-        
-        relevance = result.get("relevance", "medium")
-        if relevance not in ["high", "medium", "low"]:
-            relevance = "medium"
-        
-        issues = result.get("issues", [])
-        if not isinstance(issues, list):
-            issues = []
-        
-        suggestions = result.get("suggestions", [])
-        if not isinstance(suggestions, list):
-            suggestions = []
-        
-        logger.info(
-            "Quality assessment: score=%.1f, completeness=%s, relevance=%s, issues=%d",
-            score,
-            completeness,
-            relevance,
-            len(issues),
-        )
-        
-        return {
-            "score": score,
-            "completeness": completeness,
-            "relevance": relevance,
-            "issues": issues,
-            "suggestions": suggestions,
-        }
-        
+        content = chat_completion(**request)
+        return _parse_quality_content(content)
     except Exception as e:
-        logger.error("Quality assessment failed: %s", e)
-        return {
-            "score": 50.0,
-            "completeness": "unknown",
-            "relevance": "unknown",
-            "issues": [f"Quality assessment failed: {str(e)}"],
-            "suggestions": [],
-        }
+        return _quality_failure(e)
+
+
+@async_lru_cache(maxsize=256)
+#function to call the async LLM client and parse JSON quality assessment (cached)
+async def _assess_response_quality_cached_async(
+    requirement_json: str,
+    response_text: str,
+) -> Dict[str, Any]:
+    request = _build_quality_request(requirement_json, response_text)
+    try:
+        content = await chat_completion_async(**request)
+        return _parse_quality_content(content)
+    except Exception as e:
+        return _quality_failure(e)
 
 #function to assess response quality using a cached LLM call wrapper
 def assess_response_quality(
@@ -130,3 +166,28 @@ def assess_response_quality(
     
     return result
 
+#function to assess response quality without blocking the event loop (cached wrapper)
+async def assess_response_quality_async(
+    requirement: RequirementItem,
+    response_text: str,
+) -> Dict[str, Any]:
+    requirement_json = json.dumps(requirement.model_dump(), sort_keys=True)
+    
+    cache_info = _assess_response_quality_cached_async.cache_info()
+    logger.info(
+        "Quality assessment (async): starting (cache_hits=%d, cache_misses=%d, cache_size=%d/%d)",
+        cache_info.hits,
+        cache_info.misses,
+        cache_info.currsize,
+        cache_info.maxsize,
+    )
+    
+    result = await _assess_response_quality_cached_async(requirement_json, response_text)
+    
+    new_cache_info = _assess_response_quality_cached_async.cache_info()
+    if new_cache_info.hits > cache_info.hits:
+        logger.info("Quality assessment (async): cache HIT - returned cached result")
+    else:
+        logger.info("Quality assessment (async): cache MISS - processed new request")
+    
+    return result
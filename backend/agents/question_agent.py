@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
 from typing import List, Dict, Any, Optional, Tuple
 
-from backend.llm.client import chat_completion
+from backend.llm.client import chat_completion, chat_completion_async
+from backend.llm.json_output import json_schema_format, parse_json_output
 from backend.models import RequirementItem, Question, BuildQuery, RequirementsResult, Answer
 from backend.rag import RAGSystem
 from backend.knowledge_base.company_kb import CompanyKnowledgeBase
@@ -16,29 +18,33 @@ QUESTION_MODEL = "gpt-5-chat"
 
 MAX_CRITICAL_QUESTIONS = 5
 
- #function to determine the next single most critical clarification question
-def get_next_critical_question(
+CRITICAL_QUESTION_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "has_critical_gap": {"type": "boolean"},
+        "question": {
+            "type": ["object", "null"],
+            "properties": {
+                "question_text": {"type": "string"},
+                "context": {"type": "string"},
+                "requirement_id": {"type": "string"},
+                "category": {"type": "string"},
+            },
+        },
+        "remaining_gaps": {"type": "integer"},
+    },
+    "required": ["has_critical_gap", "question", "remaining_gaps"],
+}
+
+#function to build the critical question prompt (runs RAG searches for requirements not yet cached)
+def _build_critical_question_prompt(
     requirements_result: RequirementsResult,
     company_kb: CompanyKnowledgeBase,
     rag_system: Optional[RAGSystem],
     previous_answers: List[Answer],
     rag_contexts_by_req: Dict[str, str],
-    max_questions: int = MAX_CRITICAL_QUESTIONS,
-) -> Tuple[Optional[Dict[str, Any]], int, Dict[str, str]]:
-    logger.info(
-        "Getting next critical question (previous_answers=%d, cached_rag=%d, max=%d)",
-        len(previous_answers),
-        len(rag_contexts_by_req),
-        max_questions,
-    )
-    
-    if len(previous_answers) >= max_questions:
-        logger.info(
-            "Maximum number of critical questions (%d) already reached. No more questions will be asked.",
-            max_questions,
-        )
-        return None, 0, rag_contexts_by_req
-    
+    max_questions: int,
+) -> Tuple[str, List[str]]:
     known_info = company_kb.format_for_prompt()
     
     answers_context = ""
@@ -53,12 +59,14 @@ def get_next_critical_question(
                 answer_lines.append(f"Q: {a.question_text}\nA: {a.answer_text}")
         answers_context = "\n".join(answer_lines)
     
+    uncached = [req for req in requirements_result.solution_requirements if req.id not in rag_contexts_by_req]
+    if uncached and rag_system is not None:
+        for req_id, rag_ctx in _build_rag_contexts_for_requirements(uncached, rag_system, max_chunks=3).items():
+            rag_contexts_by_req[req_id] = rag_ctx or "[No RAG info]"
+
     all_requirements_with_rag = []
     for req in requirements_result.solution_requirements:
         rag_ctx = rag_contexts_by_req.get(req.id)
-        if rag_ctx is None and rag_system is not None:
-            rag_ctx = _build_rag_context_for_requirement(req, rag_system, max_chunks=3)
-            rag_contexts_by_req[req.id] = rag_ctx or "[No RAG info]"
         all_requirements_with_rag.append(
             {
                 "id": req.id,
@@ -131,28 +139,51 @@ IMPORTANT:
 - If there's ANY information that would improve the response quality AND you have questions remaining, set has_critical_gap: true
 - Only return false if you're confident ALL requirements can be answered well with existing information OR you've reached the question limit
 """
+    return user_prompt, skipped_topics
+
+#function to build the critical question chat completion request (shared by the sync and async clients)
+def _build_critical_question_request(user_prompt: str) -> Dict[str, Any]:
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {"role": "system", "content": "You identify important information gaps in RFP requirements. Ask questions that would improve response quality. Keep questions concise (3-5 sentences). Ask one at a time."},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 800,
+        "agent": "question_critical",
+        "response_format": json_schema_format("critical_question", CRITICAL_QUESTION_OUTPUT_SCHEMA),
+    }
+
+#function to check whether the critical question limit is reached, before any prompt is built
+def _critical_question_limit_reached(
+    previous_answers: List[Answer],
+    rag_contexts_by_req: Dict[str, str],
+    max_questions: int,
+) -> bool:
+    logger.info(
+        "Getting next critical question (previous_answers=%d, cached_rag=%d, max=%d)",
+        len(previous_answers),
+        len(rag_contexts_by_req),
+        max_questions,
+    )
+    
+    if len(previous_answers) >= max_questions:
+        logger.info(
+            "Maximum number of critical questions (%d) already reached. No more questions will be asked.",
+            max_questions,
+        )
+        return True
+    return False
 
+#function to parse the critical question response and drop questions about skipped topics
+def _parse_critical_question(
+    response: str,
+    skipped_topics: List[str],
+    rag_contexts_by_req: Dict[str, str],
+) -> Tuple[Optional[Dict[str, Any]], int, Dict[str, str]]:
     try:
-        response = chat_completion(
-            model=QUESTION_MODEL,
-            messages=[
-                {"role": "system", "content": "You identify important information gaps in RFP requirements. Ask questions that would improve response quality. Keep questions concise (3-5 sentences). Ask one at a time."},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=800,
-        )
-        
-        cleaned = response.strip()
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:]
-        if cleaned.startswith("```"):
-            cleaned = cleaned[3:]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-        
-        result = json.loads(cleaned)
+        result = parse_json_output(response, expect="object", label="Critical question")
         
         logger.info(
             "Question generation result: has_gap=%s, question=%s",
@@ -196,6 +227,30 @@ IMPORTANT:
         logger.error("Critical question generation failed: %s", e)
         return None, 0, rag_contexts_by_req
 
+#function to determine the next single most critical clarification question
+def get_next_critical_question(
+    requirements_result: RequirementsResult,
+    company_kb: CompanyKnowledgeBase,
+    rag_system: Optional[RAGSystem],
+    previous_answers: List[Answer],
+    rag_contexts_by_req: Dict[str, str],
+    max_questions: int = MAX_CRITICAL_QUESTIONS,
+) -> Tuple[Optional[Dict[str, Any]], int, Dict[str, str]]:
+    if _critical_question_limit_reached(previous_answers, rag_contexts_by_req, max_questions):
+        return None, 0, rag_contexts_by_req
+    
+    user_prompt, skipped_topics = _build_critical_question_prompt(
+        requirements_result, company_kb, rag_system, previous_answers, rag_contexts_by_req, max_questions
+    )
+
+    try:
+        response = chat_completion(**_build_critical_question_request(user_prompt))
+    except Exception as e:
+        logger.error("Critical question generation failed: %s", e)
+        return None, 0, rag_contexts_by_req
+    
+    return _parse_critical_question(response, skipped_topics, rag_contexts_by_req)
+
 
 #function to check whether more clarification questions are needed and return next question
 def check_if_more_questions_needed(
@@ -218,47 +273,61 @@ def check_if_more_questions_needed(
     
     return True, question, remaining, rag_contexts_by_req
 
-#function to collect compact RAG context for a requirement (search k chunks)
-def _build_rag_context_for_requirement(
-    requirement: RequirementItem,
+#function to format RAG search results into the compact context block shown to the question LLM
+def _format_rag_context(results: List[Dict[str, Any]]) -> str:
+    if not results:
+        return ""
+
+    parts = [
+        "RAG CONTEXT (PRIOR RFP ANSWERS / KNOWLEDGE ALREADY AVAILABLE):",
+        "Use this ONLY to identify information that is ALREADY KNOWN so you DO NOT ask questions about it.",
+        "If a detail clearly appears here, treat it as known and do NOT generate a question for it.",
+        "",
+    ]
+    for i, r in enumerate(results, 1):
+        chunk = r.get("chunk_text", "")
+        if len(chunk) > 800:
+            chunk = chunk[:800] + "..."
+        parts.append(f"[RAG-{i}] {chunk}")
+    return "\n".join(parts)
+
+#function to collect compact RAG context for several requirements with one batched search
+def _build_rag_contexts_for_requirements(
+    requirements: List[RequirementItem],
     rag_system: Optional[RAGSystem],
     max_chunks: int = 3,
-) -> str:
-    if rag_system is None:
-        return ""
+) -> Dict[str, str]:
+    if rag_system is None or not requirements:
+        return {}
 
     try:
-        search_query = requirement.source_text
         logger.info(
-            "Question agent: running RAG search for requirement %s (k=%d, query_len=%d)",
-            requirement.id,
+            "Question agent: running batched RAG search for %d requirement(s) (k=%d)",
+            len(requirements),
             max_chunks,
-            len(search_query),
         )
-        results = rag_system.search(search_query, k=max_chunks)
+        results_per_req = rag_system.search_many([req.source_text for req in requirements], k=max_chunks)
+    except Exception as e:
+        logger.warning("RAG lookup for %d requirement(s) failed: %s", len(requirements), e)
+        return {req.id: "" for req in requirements}
+
+    contexts: Dict[str, str] = {}
+    for req, results in zip(requirements, results_per_req):
         logger.info(
             "Question agent: RAG search for requirement %s returned %d chunk(s)",
-            requirement.id,
+            req.id,
             len(results),
         )
-        if not results:
-            return ""
-
-        parts = [
-            "RAG CONTEXT (PRIOR RFP ANSWERS / KNOWLEDGE ALREADY AVAILABLE):",
-            "Use this ONLY to identify information that is ALREADY KNOWN so you DO NOT ask questions about it.",
-            "If a detail clearly appears here, treat it as known and do NOT generate a question for it.",
-            "",
-        ]
-        for i, r in enumerate(results, 1):
-            chunk = r.get("chunk_text", "")
-            if len(chunk) > 800:
-                chunk = chunk[:800] + "..."
-            parts.append(f"[RAG-{i}] {chunk}")
-        return "\n".join(parts)
-    except Exception as e:
-        logger.warning("RAG lookup for requirement %s failed: %s", requirement.id, e)
-        return ""
+        contexts[req.id] = _format_rag_context(results)
+    return contexts
+
+#function to collect compact RAG context for a requirement (search k chunks)
+def _build_rag_context_for_requirement(
+    requirement: RequirementItem,
+    rag_system: Optional[RAGSystem],
+    max_chunks: int = 3,
+) -> str:
+    return _build_rag_contexts_for_requirements([requirement], rag_system, max_chunks).get(requirement.id, "")
 
 #function to heuristically test if a question is already answered by rag_context
 def _is_question_covered_by_rag(question_text: str, rag_context: str) -> bool:
@@ -275,22 +344,13 @@ def _is_question_covered_by_rag(question_text: str, rag_context: str) -> bool:
     overlap = sum(1 for w in words if w in rc)
     return overlap >= 2
 
-#function to generate a list of follow-up questions for a requirement
-def generate_questions(
+#function to build the follow-up question prompt for a single requirement
+def _build_generate_questions_prompt(
     requirement: RequirementItem,
     all_requirements: List[RequirementItem],
-    company_kb: CompanyKnowledgeBase,
-    rag_system: Optional[RAGSystem] = None,
-) -> List[Dict[str, Any]]:
-    logger.info(
-        "Question agent: analyzing requirement %s for information gaps",
-        requirement.id,
-    )
-    
-    known_topics = company_kb.get_all_known_topics()
-    known_info_text = company_kb.format_for_prompt()
-    rag_context = _build_rag_context_for_requirement(requirement, rag_system)
-    
+    known_info_text: str,
+    rag_context: str,
+) -> str:
     all_req_text = "\n\n".join([
         f"[{req.id}] {req.source_text}"
         for req in all_requirements[:10]
@@ -324,29 +384,35 @@ Output JSON array of questions, each with:
 
 If no questions are needed (all information is clear, in knowledge base, or any gaps are minor/nice-to-have), return an empty array [].
 """
-    
+    return user_prompt
+
+#function to build the follow-up question chat completion request for a requirement (shared by the sync and async clients)
+def _build_generate_questions_request(user_prompt: str) -> Dict[str, Any]:
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 1500,
+        "agent": "question_generate",
+    }
+
+#function to parse, filter and prioritise generated follow-up questions for a requirement
+def _select_generated_questions(
+    content: str,
+    requirement: RequirementItem,
+    rag_context: str,
+    company_kb: CompanyKnowledgeBase,
+) -> List[Dict[str, Any]]:
+    known_topics = company_kb.get_all_known_topics()
     try:
-        content = chat_completion(
-            model=QUESTION_MODEL,
-            messages=[
-                {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=1500,
-        )
-        
-        cleaned = content.replace("```json", "").replace("```", "").strip()
         try:
-            questions = json.loads(cleaned)
+            questions = parse_json_output(content, expect="array", label="Question generation")
         except json.JSONDecodeError:
-            import re
-            array_match = re.search(r'\[.*\]', cleaned, re.DOTALL)
-            if array_match:
-                questions = json.loads(array_match.group(0))
-            else:
-                logger.warning("Could not parse questions JSON, returning empty list")
-                questions = []
+            logger.warning("Could not parse questions JSON, returning empty list")
+            questions = []
         
         if not isinstance(questions, list):
             questions = []
@@ -411,35 +477,34 @@ If no questions are needed (all information is clear, in knowledge base, or any
         logger.exception("Full traceback:")
         return []
 
-#function to analyze all solution requirements and produce questions and rag contexts
-def analyze_build_query_for_questions(
-    build_query: BuildQuery,
-    requirements_result: RequirementsResult,
+#function to generate a list of follow-up questions for a requirement
+def generate_questions(
+    requirement: RequirementItem,
+    all_requirements: List[RequirementItem],
     company_kb: CompanyKnowledgeBase,
-    max_questions_per_requirement: int = 1,
     rag_system: Optional[RAGSystem] = None,
-) -> tuple[List[Dict[str, Any]], Dict[str, str]]:
-    logger.info("Analyzing requirements individually for information gaps")
+) -> List[Dict[str, Any]]:
+    logger.info(
+        "Question agent: analyzing requirement %s for information gaps",
+        requirement.id,
+    )
     
     known_info_text = company_kb.format_for_prompt()
+    rag_context = _build_rag_context_for_requirement(requirement, rag_system)
+    user_prompt = _build_generate_questions_prompt(requirement, all_requirements, known_info_text, rag_context)
     
-    all_questions: List[Dict[str, Any]] = []
-    rag_contexts_by_req: Dict[str, str] = {}
+    try:
+        content = chat_completion(**_build_generate_questions_request(user_prompt))
+    except Exception as e:
+        logger.error("Question generation failed: %s", e)
+        logger.exception("Full traceback:")
+        return []
     
-    for req in requirements_result.solution_requirements:
-        logger.info("Analyzing requirement %s for information gaps", req.id)
-        
-        other_reqs_text = "\n".join([
-            f"[{r.id}] {r.source_text}"
-            for r in requirements_result.solution_requirements
-            if r.id != req.id
-        ])
-        
-        rag_context = _build_rag_context_for_requirement(req, rag_system)
-        if rag_context:
-            rag_contexts_by_req[req.id] = rag_context
+    return _select_generated_questions(content, requirement, rag_context, company_kb)
 
-        user_prompt = f"""Analyze this RFP requirement and identify ONLY the CRITICAL information gaps that would make it IMPOSSIBLE to write a credible response without vendor input.
+#function to build the critical-gap chat completion request for a single requirement (shared by the sync and async clients)
+def _build_requirement_gap_request(req: RequirementItem, known_info_text: str, rag_context: str) -> Dict[str, Any]:
+    user_prompt = f"""Analyze this RFP requirement and identify ONLY the CRITICAL information gaps that would make it IMPOSSIBLE to write a credible response without vendor input.
 
 REQUIREMENT TO ANALYZE:
 ID: {req.id}
@@ -485,78 +550,77 @@ Return an EMPTY ARRAY [] if:
 - The requirement is straightforward and doesn't require specific vendor commitments
 - You're unsure if a question is truly critical
 """
-        
-        try:
-            response = chat_completion(
-                model=QUESTION_MODEL,
-                messages=[
-                    {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.0,
-                max_tokens=1500,
-            )
-            
-            questions = []
-            try:
-                response_text = response.strip()
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-                
-                parsed = json.loads(response_text)
-                if isinstance(parsed, list):
-                    questions = parsed
-                elif isinstance(parsed, dict) and "questions" in parsed:
-                    questions = parsed["questions"]
-            except json.JSONDecodeError as e:
-                logger.warning("Failed to parse questions JSON for requirement %s: %s", req.id, e)
-                logger.debug("Response was: %s", response[:500])
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 1500,
+        "agent": "question_gaps",
+    }
+
+#function to parse one requirement's gap questions into all_questions, capped per requirement
+def _collect_requirement_gap_questions(
+    response: str,
+    req: RequirementItem,
+    rag_context: str,
+    all_questions: List[Dict[str, Any]],
+    max_questions_per_requirement: int,
+) -> None:
+    questions = []
+    try:
+        parsed = parse_json_output(response, label="Requirement gap questions")
+        if isinstance(parsed, list):
+            questions = parsed
+        elif isinstance(parsed, dict) and "questions" in parsed:
+            questions = parsed["questions"]
+    except json.JSONDecodeError as e:
+        logger.warning("Failed to parse questions JSON for requirement %s: %s", req.id, e)
+        logger.debug("Response was: %s", response[:500])
+        return
+    
+    for q in questions:
+        if isinstance(q, dict) and "question_text" in q:
+            q_text = q.get("question_text", "")
+            if rag_context and _is_question_covered_by_rag(q_text, rag_context):
+                logger.info(
+                    "Question agent (build_query): skipping question for requirement %s because RAG already covers it: %s",
+                    req.id,
+                    q_text[:150].replace("\n", " "),
+                )
                 continue
-            
-            for q in questions:
-                if isinstance(q, dict) and "question_text" in q:
-                    q_text = q.get("question_text", "")
-                    if rag_context and _is_question_covered_by_rag(q_text, rag_context):
-                        logger.info(
-                            "Question agent (build_query): skipping question for requirement %s because RAG already covers it: %s",
-                            req.id,
-                            q_text[:150].replace("\n", " "),
-                        )
-                        continue
-                    validated_q = {
-                        "question_text": q_text,
-                        "context": q.get("context", ""),
-                        "category": q.get("category", "general"),
-                        "priority": q.get("priority", "medium"),
-                        "requirement_id": req.id,
-                    }
-                    if validated_q["question_text"]:
-                        all_questions.append(validated_q)
-            
-            req_questions = [q for q in all_questions if q.get("requirement_id") == req.id]
-            if len(req_questions) > max_questions_per_requirement:
-                priority_order = {"high": 0, "medium": 1, "low": 2}
-                req_questions.sort(key=lambda q: priority_order.get(q.get("priority", "medium"), 1))
-                excess = req_questions[max_questions_per_requirement:]
-                for ex_q in excess:
-                    all_questions.remove(ex_q)
-            
-            logger.info(
-                "Generated %d questions for requirement %s",
-                len([q for q in all_questions if q.get("requirement_id") == req.id]),
-                req.id,
-            )
-            
-        except Exception as e:
-            logger.error("Question generation failed for requirement %s: %s", req.id, e)
-            logger.exception("Full traceback:")
-            continue
+            validated_q = {
+                "question_text": q_text,
+                "context": q.get("context", ""),
+                "category": q.get("category", "general"),
+                "priority": q.get("priority", "medium"),
+                "requirement_id": req.id,
+            }
+            if validated_q["question_text"]:
+                all_questions.append(validated_q)
     
+    req_questions = [q for q in all_questions if q.get("requirement_id") == req.id]
+    if len(req_questions) > max_questions_per_requirement:
+        priority_order = {"high": 0, "medium": 1, "low": 2}
+        req_questions.sort(key=lambda q: priority_order.get(q.get("priority", "medium"), 1))
+        excess = req_questions[max_questions_per_requirement:]
+        for ex_q in excess:
+            all_questions.remove(ex_q)
+    
+    logger.info(
+        "Generated %d questions for requirement %s",
+        len([q for q in all_questions if q.get("requirement_id") == req.id]),
+        req.id,
+    )
+
+#function to filter known topics and keep the high-priority questions in priority order
+def _rank_critical_questions(
+    all_questions: List[Dict[str, Any]],
+    requirements_result: RequirementsResult,
+    company_kb: CompanyKnowledgeBase,
+) -> List[Dict[str, Any]]:
     filtered_questions = []
     known_topics = company_kb.get_all_known_topics()
     for q in all_questions:
@@ -587,6 +651,41 @@ Return an EMPTY ARRAY [] if:
         len(critical_questions),
     )
     
+    return critical_questions
+
+#function to analyze all solution requirements and produce questions and rag contexts
+def analyze_build_query_for_questions(
+    build_query: BuildQuery,
+    requirements_result: RequirementsResult,
+    company_kb: CompanyKnowledgeBase,
+    max_questions_per_requirement: int = 1,
+    rag_system: Optional[RAGSystem] = None,
+) -> tuple[List[Dict[str, Any]], Dict[str, str]]:
+    logger.info("Analyzing requirements individually for information gaps")
+    
+    known_info_text = company_kb.format_for_prompt()
+    
+    all_questions: List[Dict[str, Any]] = []
+    rag_contexts_by_req: Dict[str, str] = {}
+    batched_rag_contexts = _build_rag_contexts_for_requirements(requirements_result.solution_requirements, rag_system)
+    
+    for req in requirements_result.solution_requirements:
+        logger.info("Analyzing requirement %s for information gaps", req.id)
+        
+        rag_context = batched_rag_contexts.get(req.id, "")
+        if rag_context:
+            rag_contexts_by_req[req.id] = rag_context
+
+        try:
+            response = chat_completion(**_build_requirement_gap_request(req, known_info_text, rag_context))
+            _collect_requirement_gap_questions(response, req, rag_context, all_questions, max_questions_per_requirement)
+        except Exception as e:
+            logger.error("Question generation failed for requirement %s: %s", req.id, e)
+            logger.exception("Full traceback:")
+            continue
+    
+    critical_questions = _rank_critical_questions(all_questions, requirements_result, company_kb)
+    
     if len(critical_questions) > MAX_CRITICAL_QUESTIONS:
         critical_questions = _consolidate_critical_questions(critical_questions, company_kb, max_questions=MAX_CRITICAL_QUESTIONS)
     
@@ -594,17 +693,8 @@ Return an EMPTY ARRAY [] if:
     
     return critical_questions, rag_contexts_by_req
 
-#function to consolidate and select the most critical questions from a list
-def _consolidate_critical_questions(
-    questions: List[Dict[str, Any]],
-    company_kb: CompanyKnowledgeBase,
-    max_questions: int = MAX_CRITICAL_QUESTIONS,
-) -> List[Dict[str, Any]]:
-    if len(questions) <= max_questions:
-        return questions
-    
-    logger.info("Consolidating %d critical questions down to max %d", len(questions), max_questions)
-    
+#function to build the prompt asking the LLM to pick the most critical questions
+def _build_consolidation_prompt(questions: List[Dict[str, Any]], max_questions: int) -> str:
     questions_text = "\n".join([
         f"{i+1}. [{q.get('requirement_id', 'unknown')}] {q['question_text']}"
         for i, q in enumerate(questions)
@@ -627,20 +717,12 @@ Some questions may be nice-to-have rather than critical - skip those.
 Output a JSON array of the question numbers (1-indexed) to KEEP, e.g. [1, 3, 5, 8, 12]
 Only output the JSON array, nothing else.
 """
+    return user_prompt
 
+#function to map the LLM's selected question numbers back onto the question list
+def _parse_consolidation(response: str, questions: List[Dict[str, Any]], max_questions: int) -> List[Dict[str, Any]]:
     try:
-        response = chat_completion(
-            model=QUESTION_MODEL,
-            messages=[
-                {"role": "system", "content": "You select the most critical questions from a list. Be very selective."},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=200,
-        )
-        
-        cleaned = response.replace("```json", "").replace("```", "").strip()
-        selected_indices = json.loads(cleaned)
+        selected_indices = parse_json_output(response, expect="array", label="Question consolidation")
         
         if isinstance(selected_indices, list):
             result = []
@@ -656,16 +738,39 @@ Only output the JSON array, nothing else.
     
     return questions[:max_questions]
 
-#function (legacy) to derive questions from a whole build query rather than per-requirement
-def analyze_build_query_for_questions_legacy(
-    build_query: BuildQuery,
+#function to build the consolidation chat completion request (shared by the sync and async clients)
+def _build_consolidation_request(questions: List[Dict[str, Any]], max_questions: int) -> Dict[str, Any]:
+    logger.info("Consolidating %d critical questions down to max %d", len(questions), max_questions)
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {"role": "system", "content": "You select the most critical questions from a list. Be very selective."},
+            {"role": "user", "content": _build_consolidation_prompt(questions, max_questions)},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 200,
+        "agent": "question_consolidate",
+    }
+
+#function to consolidate and select the most critical questions from a list
+def _consolidate_critical_questions(
+    questions: List[Dict[str, Any]],
     company_kb: CompanyKnowledgeBase,
-    max_questions: int = 20,
+    max_questions: int = MAX_CRITICAL_QUESTIONS,
 ) -> List[Dict[str, Any]]:
-    logger.info("Analyzing build query as whole (legacy mode)")
+    if len(questions) <= max_questions:
+        return questions
     
-    known_info_text = company_kb.format_for_prompt()
+    try:
+        response = chat_completion(**_build_consolidation_request(questions, max_questions))
+    except Exception as e:
+        logger.warning("Failed to consolidate questions: %s, returning first %d", e, max_questions)
+        return questions[:max_questions]
     
+    return _parse_consolidation(response, questions, max_questions)
+
+#function to build the legacy whole-build-query question chat completion request (shared by the sync and async clients)
+def _build_legacy_questions_request(build_query: BuildQuery, known_info_text: str) -> Dict[str, Any]:
     user_prompt = f"""Analyze this RFP build query and identify what information is MISSING or UNCLEAR that would be needed to generate a high-quality response.
 
 BUILD QUERY:
@@ -686,30 +791,27 @@ Output a JSON array of questions, each with:
 - category: Type (technical, business, implementation, commercial, etc.)
 - priority: "high", "medium", or "low"
 """
-    
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 2000,
+        "agent": "question_legacy",
+    }
+
+#function to parse, filter and prioritise the legacy build query questions
+def _parse_legacy_questions(
+    response: str,
+    company_kb: CompanyKnowledgeBase,
+    max_questions: int,
+) -> List[Dict[str, Any]]:
     try:
-        response = chat_completion(
-            model=QUESTION_MODEL,
-            messages=[
-                {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=2000,
-        )
-        
         questions = []
         try:
-            response_text = response.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            
-            parsed = json.loads(response_text)
+            parsed = parse_json_output(response, label="Legacy questions")
             if isinstance(parsed, list):
                 questions = parsed
             elif isinstance(parsed, dict) and "questions" in parsed:
@@ -755,6 +857,25 @@ Output a JSON array of questions, each with:
         logger.exception("Full traceback:")
         return []
 
+#function (legacy) to derive questions from a whole build query rather than per-requirement
+def analyze_build_query_for_questions_legacy(
+    build_query: BuildQuery,
+    company_kb: CompanyKnowledgeBase,
+    max_questions: int = 20,
+) -> List[Dict[str, Any]]:
+    logger.info("Analyzing build query as whole (legacy mode)")
+    
+    request = _build_legacy_questions_request(build_query, company_kb.format_for_prompt())
+    
+    try:
+        response = chat_completion(**request)
+    except Exception as e:
+        logger.error("Question generation from build query failed: %s", e)
+        logger.exception("Full traceback:")
+        return []
+    
+    return _parse_legacy_questions(response, company_kb, max_questions)
+
 #function to generate questions for multiple requirements and return mapping by requirement id
 def analyze_requirements_for_questions(
     requirements: List[RequirementItem],
@@ -778,15 +899,13 @@ def analyze_requirements_for_questions(
     
     return all_questions
 
-#function to infer which other pending questions are answered by a given answer
-def infer_answered_questions_from_answer(
+#function to build the chat completion request for inferring additionally answered questions
+#(shared by the sync and async clients)
+def _build_infer_answered_request(
     answered_question: Question,
     answer_text: str,
     remaining_questions: List[Question],
-) -> List[str]:
-    if not remaining_questions or not answer_text.strip():
-        return []
-
+) -> Dict[str, Any]:
     logger.info(
         "Inferring additionally answered questions from answer to %s (remaining=%d)",
         answered_question.question_id,
@@ -834,32 +953,27 @@ ANSWER TEXT:
 REMAINING OPEN QUESTIONS:
 {remaining_block}
 """
-
+    return {
+        "model": QUESTION_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 300,
+        "agent": "question_infer_answered",
+    }
+
+#function to parse the inferred question ids and keep only ids that are still pending
+def _parse_inferred_answered(content: str, remaining_questions: List[Question]) -> List[str]:
     try:
-        content = chat_completion(
-            model=QUESTION_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=300,
-        )
-
-        cleaned = content.replace("```json", "").replace("```", "").strip()
         try:
-            result = json.loads(cleaned)
+            result = parse_json_output(content, expect="array", label="Inferred answered questions")
         except json.JSONDecodeError:
-            import re
-
-            array_match = re.search(r"\[.*\]", cleaned, re.DOTALL)
-            if array_match:
-                result = json.loads(array_match.group(0))
-            else:
-                logger.warning(
-                    "Could not parse inferred answered questions JSON, returning empty list"
-                )
-                return []
+            logger.warning(
+                "Could not parse inferred answered questions JSON, returning empty list"
+            )
+            return []
 
         if not isinstance(result, list):
             logger.warning(
@@ -882,3 +996,221 @@ REMAINING OPEN QUESTIONS:
         logger.exception("Full traceback:")
         return []
 
+#function to infer which other pending questions are answered by a given answer
+def infer_answered_questions_from_answer(
+    answered_question: Question,
+    answer_text: str,
+    remaining_questions: List[Question],
+) -> List[str]:
+    if not remaining_questions or not answer_text.strip():
+        return []
+
+    try:
+        content = chat_completion(**_build_infer_answered_request(answered_question, answer_text, remaining_questions))
+    except Exception as e:
+        logger.error("Inference of additionally answered questions failed: %s", e)
+        logger.exception("Full traceback:")
+        return []
+
+    return _parse_inferred_answered(content, remaining_questions)
+
+#function to determine the next critical clarification question on the async LLM client
+async def get_next_critical_question_async(
+    requirements_result: RequirementsResult,
+    company_kb: CompanyKnowledgeBase,
+    rag_system: Optional[RAGSystem],
+    previous_answers: List[Answer],
+    rag_contexts_by_req: Dict[str, str],
+    max_questions: int = MAX_CRITICAL_QUESTIONS,
+) -> Tuple[Optional[Dict[str, Any]], int, Dict[str, str]]:
+    if _critical_question_limit_reached(previous_answers, rag_contexts_by_req, max_questions):
+        return None, 0, rag_contexts_by_req
+    
+    #prompt building runs RAG searches for uncached requirements, so keep it off the event loop
+    user_prompt, skipped_topics = await asyncio.to_thread(
+        _build_critical_question_prompt,
+        requirements_result, company_kb, rag_system, previous_answers, rag_contexts_by_req, max_questions,
+    )
+
+    try:
+        response = await chat_completion_async(**_build_critical_question_request(user_prompt))
+    except Exception as e:
+        logger.error("Critical question generation failed: %s", e)
+        return None, 0, rag_contexts_by_req
+    
+    return _parse_critical_question(response, skipped_topics, rag_contexts_by_req)
+
+#function to check whether more clarification questions are needed on the async LLM client
+async def check_if_more_questions_needed_async(
+    requirements_result: RequirementsResult,
+    company_kb: CompanyKnowledgeBase,
+    rag_system: Optional[RAGSystem],
+    all_answers: List[Answer],
+    rag_contexts_by_req: Dict[str, str],
+) -> Tuple[bool, Optional[Dict[str, Any]], int, Dict[str, str]]:
+    question, remaining, rag_contexts_by_req = await get_next_critical_question_async(
+        requirements_result=requirements_result,
+        company_kb=company_kb,
+        rag_system=rag_system,
+        previous_answers=all_answers,
+        rag_contexts_by_req=rag_contexts_by_req,
+    )
+    
+    if question is None:
+        return False, None, 0, rag_contexts_by_req
+    
+    return True, question, remaining, rag_contexts_by_req
+
+#function to generate follow-up questions for a requirement on the async LLM client
+async def generate_questions_async(
+    requirement: RequirementItem,
+    all_requirements: List[RequirementItem],
+    company_kb: CompanyKnowledgeBase,
+    rag_system: Optional[RAGSystem] = None,
+) -> List[Dict[str, Any]]:
+    logger.info(
+        "Question agent: analyzing requirement %s for information gaps",
+        requirement.id,
+    )
+    
+    known_info_text = company_kb.format_for_prompt()
+    rag_context = await asyncio.to_thread(_build_rag_context_for_requirement, requirement, rag_system)
+    user_prompt = _build_generate_questions_prompt(requirement, all_requirements, known_info_text, rag_context)
+    
+    try:
+        content = await chat_completion_async(**_build_generate_questions_request(user_prompt))
+    except Exception as e:
+        logger.error("Question generation failed: %s", e)
+        logger.exception("Full traceback:")
+        return []
+    
+    return _select_generated_questions(content, requirement, rag_context, company_kb)
+
+#function to analyze all solution requirements for questions on the async LLM client (requirements run concurrently)
+async def analyze_build_query_for_questions_async(
+    build_query: BuildQuery,
+    requirements_result: RequirementsResult,
+    company_kb: CompanyKnowledgeBase,
+    max_questions_per_requirement: int = 1,
+    rag_system: Optional[RAGSystem] = None,
+) -> tuple[List[Dict[str, Any]], Dict[str, str]]:
+    logger.info("Analyzing requirements individually for information gaps")
+    
+    known_info_text = company_kb.format_for_prompt()
+    requirements = requirements_result.solution_requirements
+    batched_rag_contexts = await asyncio.to_thread(_build_rag_contexts_for_requirements, requirements, rag_system)
+    
+    #function to run the gap analysis LLM call for one requirement
+    async def _analyze_one(req: RequirementItem) -> Tuple[str, Optional[str]]:
+        logger.info("Analyzing requirement %s for information gaps", req.id)
+        rag_context = batched_rag_contexts.get(req.id, "")
+        try:
+            response = await chat_completion_async(**_build_requirement_gap_request(req, known_info_text, rag_context))
+        except Exception as e:
+            logger.error("Question generation failed for requirement %s: %s", req.id, e)
+            logger.exception("Full traceback:")
+            return rag_context, None
+        return rag_context, response
+    
+    results = await asyncio.gather(*[_analyze_one(req) for req in requirements])
+    
+    all_questions: List[Dict[str, Any]] = []
+    rag_contexts_by_req: Dict[str, str] = {}
+    for req, (rag_context, response) in zip(requirements, results):
+        if rag_context:
+            rag_contexts_by_req[req.id] = rag_context
+        if response is None:
+            continue
+        try:
+            _collect_requirement_gap_questions(response, req, rag_context, all_questions, max_questions_per_requirement)
+        except Exception as e:
+            logger.error("Question generation failed for requirement %s: %s", req.id, e)
+            logger.exception("Full traceback:")
+    
+    critical_questions = _rank_critical_questions(all_questions, requirements_result, company_kb)
+    
+    if len(critical_questions) > MAX_CRITICAL_QUESTIONS:
+        critical_questions = await _consolidate_critical_questions_async(critical_questions, company_kb, max_questions=MAX_CRITICAL_QUESTIONS)
+    
+    critical_questions = critical_questions[:MAX_CRITICAL_QUESTIONS]
+    
+    return critical_questions, rag_contexts_by_req
+
+#function to consolidate the most critical questions on the async LLM client
+async def _consolidate_critical_questions_async(
+    questions: List[Dict[str, Any]],
+    company_kb: CompanyKnowledgeBase,
+    max_questions: int = MAX_CRITICAL_QUESTIONS,
+) -> List[Dict[str, Any]]:
+    if len(questions) <= max_questions:
+        return questions
+    
+    try:
+        response = await chat_completion_async(**_build_consolidation_request(questions, max_questions))
+    except Exception as e:
+        logger.warning("Failed to consolidate questions: %s, returning first %d", e, max_questions)
+        return questions[:max_questions]
+    
+    return _parse_consolidation(response, questions, max_questions)
+
+#function (legacy) to derive questions from a whole build query on the async LLM client
+async def analyze_build_query_for_questions_legacy_async(
+    build_query: BuildQuery,
+    company_kb: CompanyKnowledgeBase,
+    max_questions: int = 20,
+) -> List[Dict[str, Any]]:
+    logger.info("Analyzing build query as whole (legacy mode)")
+    
+    request = _build_legacy_questions_request(build_query, company_kb.format_for_prompt())
+    
+    try:
+        response = await chat_completion_async(**request)
+    except Exception as e:
+        logger.error("Question generation from build query failed: %s", e)
+        logger.exception("Full traceback:")
+        return []
+    
+    return _parse_legacy_questions(response, company_kb, max_questions)
+
+#function to generate questions for multiple requirements concurrently on the async LLM client
+async def analyze_requirements_for_questions_async(
+    requirements: List[RequirementItem],
+    company_kb: CompanyKnowledgeBase,
+    max_questions_per_requirement: int = 2,
+    rag_system: Optional[RAGSystem] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    results = await asyncio.gather(*[
+        generate_questions_async(req, requirements, company_kb, rag_system=rag_system)
+        for req in requirements
+    ])
+    all_questions = {
+        req.id: questions[:max_questions_per_requirement]
+        for req, questions in zip(requirements, results)
+    }
+    
+    total_questions = sum(len(qs) for qs in all_questions.values())
+    logger.info(
+        "Analyzed %d requirements, generated %d total questions",
+        len(requirements),
+        total_questions,
+    )
+    
+    return all_questions
+
+#function to infer which other pending questions are answered by a given answer on the async LLM client
+async def infer_answered_questions_from_answer_async(
+    answered_question: Question,
+    answer_text: str,
+    remaining_questions: List[Question],
+) -> List[str]:
+    if not remaining_questions or not answer_text.strip():
+        return []
+
+    try:
+        content = await chat_completion_async(**_build_infer_answered_request(answered_question, answer_text, remaining_questions))
+    except Exception as e:
+        logger.error("Inference of additionally answered questions failed: %s", e)
+        logger.exception("Full traceback:")
+        return []
+
+    return _parse_inferred_answered(content, remaining_questions)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Tuple
 
-from backend.llm.client import chat_completion
+from backend.llm.client import chat_completion, chat_completion_async, chat_completion_stream
+from backend.llm.tokens import count_tokens, plan_max_tokens
 from backend.models import BuildQuery, ResponseResult
 from backend.knowledge_base import FusionAIxKnowledgeBase
 from backend.agents.prompts import RESPONSE_SYSTEM_PROMPT
@@ -12,12 +14,10 @@ from backend.memory.mem0_client import search_memories
 logger = logging.getLogger(__name__)
 
 RESPONSE_MODEL = "gpt-5-chat"
+MAX_RESPONSE_LENGTH = 10000
 
-#function to run a clarity check on a requirement and return clarifying questions if needed
-def _clarity_check(requirement_text: str, structure_text: Optional[str] = None) -> dict:
-    if not requirement_text:
-        return {"clarity": "unclear", "questions": ["Requirement text is empty"], "raw": ""}
-
+#function to build the clarity check chat completion request for a requirement (shared by the sync and async clients)
+def _build_clarity_request(requirement_text: str, structure_text: Optional[str] = None) -> Dict[str, Any]:
     prompt_parts = [
         "You are an assistant whose job is ONLY to check clarity of an RFP requirement for the purpose of deciding whether to fetch additional local context.",
         "Do NOT attempt to answer the requirement or search for answers. Instead, analyze the provided requirement text and determine whether it is sufficiently clear to write a complete, detailed response.",
@@ -29,21 +29,19 @@ def _clarity_check(requirement_text: str, structure_text: Optional[str] = None)
         prompt_parts.append("RESPONSE_STRUCTURE_GUIDANCE:\n" + structure_text)
 
     user_prompt = "\n\n".join(prompt_parts)
+    return {
+        "model": RESPONSE_MODEL,
+        "messages": [
+            {"role": "system", "content": RESPONSE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 300,
+        "agent": "response_clarity",
+    }
 
-    try:
-        resp = chat_completion(
-            model=RESPONSE_MODEL,
-            messages=[
-                {"role": "system", "content": RESPONSE_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=300,
-        )
-    except Exception as e:
-        logger.warning("Clarity check LLM call failed: %s", e)
-        return {"clarity": "unclear", "questions": [], "raw": ""}
-
+#function to interpret the clarity check LLM output
+def _parse_clarity_response(resp: str) -> dict:
     parsed = {"clarity": "unclear", "questions": [], "raw": resp}
     try:
         import json
@@ -74,23 +72,39 @@ def _clarity_check(requirement_text: str, structure_text: Optional[str] = None)
 
     return parsed
 
+#function to report a clarity check that could not run (empty requirement or failed LLM call)
+def _clarity_failure(error: Optional[Exception] = None) -> dict:
+    if error is None:
+        return {"clarity": "unclear", "questions": ["Requirement text is empty"], "raw": ""}
+    logger.warning("Clarity check LLM call failed: %s", error)
+    return {"clarity": "unclear", "questions": [], "raw": ""}
 
-#function to generate a detailed response for a single build query using LLM
-def run_response_agent(
-    build_query: BuildQuery,
-    temperature: float = 0.0,
-    max_tokens: Optional[int] = None,
-    knowledge_base: Optional[FusionAIxKnowledgeBase] = None,
-    qa_context: Optional[str] = None,
-) -> ResponseResult:
-    if not build_query.confirmed:
-        raise ValueError("Build query must be confirmed before generating response")
+#function to run a clarity check on a requirement and return clarifying questions if needed
+def _clarity_check(requirement_text: str, structure_text: Optional[str] = None) -> dict:
+    if not requirement_text:
+        return _clarity_failure()
+    try:
+        resp = chat_completion(**_build_clarity_request(requirement_text, structure_text))
+    except Exception as e:
+        return _clarity_failure(e)
+    return _parse_clarity_response(resp)
 
-    logger.info(
-        "Response agent: starting (query_length=%d)",
-        len(build_query.query_text),
-    )
-    
+#function to run the clarity check on the async LLM client
+async def _clarity_check_async(requirement_text: str, structure_text: Optional[str] = None) -> dict:
+    if not requirement_text:
+        return _clarity_failure()
+    try:
+        resp = await chat_completion_async(**_build_clarity_request(requirement_text, structure_text))
+    except Exception as e:
+        return _clarity_failure(e)
+    return _parse_clarity_response(resp)
+
+
+#function to format the fusionAIx knowledge base context for a build query
+def _fusionaix_context_for(
+    build_query: BuildQuery,
+    knowledge_base: Optional[FusionAIxKnowledgeBase],
+) -> str:
     fusionaix_context = ""
     if knowledge_base is not None:
         try:
@@ -103,14 +117,23 @@ def run_response_agent(
             logger.warning("Failed to format knowledge base context: %s", kb_exc)
             fusionaix_context = ""
 
+    return fusionaix_context
+
+
+#function to retrieve memories and assemble the response user prompt (clarity=None means the check failed)
+def _build_response_prompt(
+    build_query: BuildQuery,
+    fusionaix_context: str,
+    clarity: Optional[dict],
+    qa_context: Optional[str] = None,
+) -> Tuple[str, List[Dict[str, Any]]]:
     req_summary = build_query.solution_requirements_summary
     struct_summary = build_query.response_structure_requirements_summary
 
     retrieved_memories: List[Dict[str, Any]] = []
     retrieved_edit_memories: List[Dict[str, Any]] = []
     
-    try:
-        clarity = _clarity_check(req_summary or "", struct_summary or None)
+    if clarity is not None:
         logger.info("Clarity check result: %s (questions=%d)", clarity.get("clarity"), len(clarity.get("questions") or []))
         logger.debug("Clarity check raw output: %s", (clarity.get("raw") or "")[:2000])
         if clarity.get("questions"):
@@ -133,8 +156,7 @@ def run_response_agent(
                 logger.warning("Local memory search failed: %s", mem_exc)
         else:
             logger.debug("Skipping local memory retrieval; requirement considered clear by LLM")
-    except Exception as e:
-        logger.warning("Clarity check failed, falling back to retrieving local memories: %s", e)
+    else:
         try:
             retrieved_memories = search_memories(req_summary or "", max_results=3, stage="requirements")
             if retrieved_memories:
@@ -266,9 +288,14 @@ def run_response_agent(
     ])
 
     user_prompt = "\n".join(user_prompt_parts)
-    
-    system_tokens = len(RESPONSE_SYSTEM_PROMPT) // 4
-    user_tokens = len(user_prompt) // 4
+    return user_prompt, retrieved_memories
+
+
+#function to build the response chat completion request, sizing max_tokens from the prompt length when
+#not given explicitly (shared by the sync, async and streaming clients)
+def _build_response_request(user_prompt: str, temperature: float, max_tokens: Optional[int]) -> Dict[str, Any]:
+    system_tokens = count_tokens(RESPONSE_SYSTEM_PROMPT)
+    user_tokens = count_tokens(user_prompt)
     total_input_tokens = system_tokens + user_tokens + 100
     logger.info(
         "Prompt tokens: system=%d, user=%d, total_input=%d",
@@ -278,8 +305,7 @@ def run_response_agent(
     )
 
     if max_tokens is None:
-        estimated_input_tokens = total_input_tokens
-        max_tokens = min(2500, 32769 - estimated_input_tokens - 1000)
+        max_tokens = plan_max_tokens("response", total_input_tokens, ceiling=2500)
         logger.info(
             "Response max_tokens set to %d (target: ~5000-10000 characters, ~800-1500 words)",
             max_tokens,
@@ -291,18 +317,39 @@ def run_response_agent(
         temperature,
         max_tokens,
     )
-
-    response_text = chat_completion(
-        model=RESPONSE_MODEL,
-        messages=[
+    return {
+        "model": RESPONSE_MODEL,
+        "messages": [
             {"role": "system", "content": RESPONSE_SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
-        temperature=temperature,
-        max_tokens=max_tokens,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "agent": "response",
+    }
+
+
+#function to check a build query can be answered and gather the knowledge base context for it
+def _start_response(
+    build_query: BuildQuery,
+    knowledge_base: Optional[FusionAIxKnowledgeBase],
+) -> str:
+    if not build_query.confirmed:
+        raise ValueError("Build query must be confirmed before generating response")
+
+    logger.info(
+        "Response agent: starting (query_length=%d)",
+        len(build_query.query_text),
     )
-    
-    MAX_RESPONSE_LENGTH = 10000
+    return _fusionaix_context_for(build_query, knowledge_base)
+
+
+#function to cap an over-long response and wrap it into a ResponseResult
+def _finalize_response(
+    response_text: str,
+    build_query: BuildQuery,
+    retrieved_memories: List[Dict[str, Any]],
+) -> ResponseResult:
     if len(response_text) > MAX_RESPONSE_LENGTH:
         logger.warning(
             "Response too long (%d chars), truncating to %d chars",
@@ -331,3 +378,76 @@ def run_response_agent(
         notes="Generated response",
     )
 
+
+#function to generate a detailed response for a single build query using LLM
+def run_response_agent(
+    build_query: BuildQuery,
+    temperature: float = 0.0,
+    max_tokens: Optional[int] = None,
+    knowledge_base: Optional[FusionAIxKnowledgeBase] = None,
+    qa_context: Optional[str] = None,
+) -> ResponseResult:
+    fusionaix_context = _start_response(build_query, knowledge_base)
+    clarity = _clarity_check(
+        build_query.solution_requirements_summary or "",
+        build_query.response_structure_requirements_summary or None,
+    )
+    user_prompt, retrieved_memories = _build_response_prompt(build_query, fusionaix_context, clarity, qa_context)
+    request = _build_response_request(user_prompt, temperature, max_tokens)
+
+    response_text = chat_completion(**request)
+    
+    return _finalize_response(response_text, build_query, retrieved_memories)
+
+
+#function to generate a detailed response on the async LLM client without blocking the event loop
+async def run_response_agent_async(
+    build_query: BuildQuery,
+    temperature: float = 0.0,
+    max_tokens: Optional[int] = None,
+    knowledge_base: Optional[FusionAIxKnowledgeBase] = None,
+    qa_context: Optional[str] = None,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> ResponseResult:
+    fusionaix_context = _start_response(build_query, knowledge_base)
+    clarity = await _clarity_check_async(
+        build_query.solution_requirements_summary or "",
+        build_query.response_structure_requirements_summary or None,
+    )
+    #memory search may call the embedding API, so keep it off the event loop
+    user_prompt, retrieved_memories = await asyncio.to_thread(
+        _build_response_prompt, build_query, fusionaix_context, clarity, qa_context
+    )
+    request = _build_response_request(user_prompt, temperature, max_tokens)
+
+    if on_delta is None:
+        response_text = await chat_completion_async(**request)
+    else:
+        response_text = await _stream_response_text(request, on_delta)
+    
+    return _finalize_response(response_text, build_query, retrieved_memories)
+
+
+#function to stream the response, forwarding deltas and stopping generation once MAX_RESPONSE_LENGTH is exceeded
+async def _stream_response_text(
+    request: Dict[str, Any],
+    on_delta: Callable[[str], Awaitable[None]],
+) -> str:
+    parts: List[str] = []
+    length = 0
+    stream = chat_completion_stream(**request)
+    try:
+        async for delta in stream:
+            parts.append(delta)
+            length += len(delta)
+            await on_delta(delta)
+            if length > MAX_RESPONSE_LENGTH:
+                logger.info(
+                    "Response agent: stopping stream early at %d chars (max_allowed=%d)",
+                    length,
+                    MAX_RESPONSE_LENGTH,
+                )
+                break
+    finally:
+        await stream.aclose()
+    return "".join(parts)
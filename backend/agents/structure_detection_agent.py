@@ -5,28 +5,47 @@ import json
 import logging
 from typing import Any, Dict, List, Optional
 
-from backend.llm.client import chat_completion
+from backend.llm.async_lru import async_lru_cache
+from backend.llm.client import chat_completion, chat_completion_async
+from backend.llm.json_output import json_schema_format, parse_json_output
 from backend.models import RequirementItem
 from backend.agents.prompts import STRUCTURE_DETECTION_SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 STRUCTURE_DETECTION_MODEL = "gpt-5-chat"
 
-@functools.lru_cache(maxsize=128)
-def _detect_structure_cached(response_structure_json: str) -> Dict[str, Any]:
+STRUCTURE_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "has_explicit_structure": {"type": "boolean"},
+        "structure_type": {"type": "string", "enum": ["explicit", "implicit", "none"]},
+        "detected_sections": {"type": "array", "items": {"type": "string"}},
+        "structure_description": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["has_explicit_structure", "structure_type", "detected_sections", "structure_description", "confidence"],
+}
+
+#function to return the result used when the RFP has no response structure requirements
+def _no_structure_result() -> Dict[str, Any]:
+    logger.info("Structure detection: No response structure requirements found")
+    return {
+        "has_explicit_structure": False,
+        "structure_type": "none",
+        "detected_sections": [],
+        "structure_description": "No response structure requirements found in RFP.",
+        "confidence": 1.0,
+    }
+
+#function to build the structure detection chat completion request (shared by the sync and async clients);
+#None when there are no response structure requirements to analyse
+def _build_structure_request(response_structure_json: str) -> Optional[Dict[str, Any]]:
     response_structure_requirements = [
         RequirementItem(**r) for r in json.loads(response_structure_json)
     ]
     
     if not response_structure_requirements:
-        logger.info("Structure detection: No response structure requirements found")
-        return {
-            "has_explicit_structure": False,
-            "structure_type": "none",
-            "detected_sections": [],
-            "structure_description": "No response structure requirements found in RFP.",
-            "confidence": 1.0,
-        }
+        return None
     
     structure_text = "\n\n".join([
         f"{req.source_text}"
@@ -51,67 +70,88 @@ Output JSON with:
         "Structure detection: analyzing %d response structure requirements",
         len(response_structure_requirements),
     )
+    return {
+        "model": STRUCTURE_DETECTION_MODEL,
+        "messages": [
+            {"role": "system", "content": STRUCTURE_DETECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.0,
+        "max_tokens": 1000,
+        "agent": "structure_detection",
+        "response_format": json_schema_format("structure_detection", STRUCTURE_OUTPUT_SCHEMA),
+    }
+
+#function to parse and normalise the structure detection JSON returned by the LLM
+def _parse_structure_content(content: str) -> Dict[str, Any]:
+    try:
+        result = parse_json_output(content, expect="object", label="Structure detection")
+    except json.JSONDecodeError as e:
+        raise ValueError("Could not parse JSON from structure detection response") from e
+    
+    has_explicit = result.get("has_explicit_structure", False)
+    structure_type = result.get("structure_type", "none")
+    detected_sections = result.get("detected_sections", [])
+    structure_description = result.get("structure_description", "")
+    confidence = float(result.get("confidence", 0.5))
+    
+    if has_explicit and structure_type != "explicit":
+        structure_type = "explicit"
+    elif not has_explicit and structure_type == "explicit":
+        has_explicit = False
+        structure_type = "implicit" if detected_sections else "none"
+    
+    logger.info(
+        "Structure detection: result - explicit=%s, type=%s, sections=%d, confidence=%.2f",
+        has_explicit,
+        structure_type,
+        len(detected_sections),
+        confidence,
+    )
+    
+    return {
+        "has_explicit_structure": has_explicit,
+        "structure_type": structure_type,
+        "detected_sections": detected_sections if isinstance(detected_sections, list) else [],
+        "structure_description": structure_description or "No explicit structure detected.",
+        "confidence": max(0.0, min(1.0, confidence)),
+    }
+
+#function to build the fallback result returned when structure detection fails
+def _structure_failure(error: Exception) -> Dict[str, Any]:
+    logger.error("Structure detection failed: %s", error)
+    logger.exception("Full traceback:")
+    return {
+        "has_explicit_structure": False,
+        "structure_type": "none",
+        "detected_sections": [],
+        "structure_description": f"Structure detection failed: {str(error)}",
+        "confidence": 0.0,
+    }
+
+@functools.lru_cache(maxsize=128)
+def _detect_structure_cached(response_structure_json: str) -> Dict[str, Any]:
+    request = _build_structure_request(response_structure_json)
+    if request is None:
+        return _no_structure_result()
+    
+    try:
+        content = chat_completion(**request)
+        return _parse_structure_content(content)
+    except Exception as e:
+        return _structure_failure(e)
+
+@async_lru_cache(maxsize=128)
+async def _detect_structure_cached_async(response_structure_json: str) -> Dict[str, Any]:
+    request = _build_structure_request(response_structure_json)
+    if request is None:
+        return _no_structure_result()
     
     try:
-        content = chat_completion(
-            model=STRUCTURE_DETECTION_MODEL,
-            messages=[
-                {"role": "system", "content": STRUCTURE_DETECTION_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0,
-            max_tokens=1000,
-        )
-        
-        cleaned = content.replace("```json", "").replace("```", "").strip()
-        try:
-            result = json.loads(cleaned)
-        except json.JSONDecodeError:
-            import re
-            json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(0))
-            else:
-                raise ValueError("Could not parse JSON from structure detection response")
-        
-        has_explicit = result.get("has_explicit_structure", False)
-        structure_type = result.get("structure_type", "none")
-        detected_sections = result.get("detected_sections", [])
-        structure_description = result.get("structure_description", "")
-        confidence = float(result.get("confidence", 0.5))
-        
-        if has_explicit and structure_type != "explicit":
-            structure_type = "explicit"
-        elif not has_explicit and structure_type == "explicit":
-            has_explicit = False
-            structure_type = "implicit" if detected_sections else "none"
-        
-        logger.info(
-            "Structure detection: result - explicit=%s, type=%s, sections=%d, confidence=%.2f",
-            has_explicit,
-            structure_type,
-            len(detected_sections),
-            confidence,
-        )
-        
-        return {
-            "has_explicit_structure": has_explicit,
-            "structure_type": structure_type,
-            "detected_sections": detected_sections if isinstance(detected_sections, list) else [],
-            "structure_description": structure_description or "No explicit structure detected.",
-            "confidence": max(0.0, min(1.0, confidence)),
-        }
-        
+        content = await chat_completion_async(**request)
+        return _parse_structure_content(content)
     except Exception as e:
-        logger.error("Structure detection failed: %s", e)
-        logger.exception("Full traceback:")
-        return {
-            "has_explicit_structure": False,
-            "structure_type": "none",
-            "detected_sections": [],
-            "structure_description": f"Structure detection failed: {str(e)}",
-            "confidence": 0.0,
-        }
+        return _structure_failure(e)
 
 def detect_structure(
     response_structure_requirements: List[RequirementItem],
@@ -140,3 +180,29 @@ def detect_structure(
     
     return result
 
+async def detect_structure_async(
+    response_structure_requirements: List[RequirementItem],
+) -> Dict[str, Any]:
+    response_structure_json = json.dumps(
+        [r.model_dump() for r in response_structure_requirements],
+        sort_keys=True
+    )
+    
+    cache_info = _detect_structure_cached_async.cache_info()
+    logger.info(
+        "Structure detection (async): starting (cache_hits=%d, cache_misses=%d, cache_size=%d/%d)",
+        cache_info.hits,
+        cache_info.misses,
+        cache_info.currsize,
+        cache_info.maxsize,
+    )
+    
+    result = await _detect_structure_cached_async(response_structure_json)
+    
+    new_cache_info = _detect_structure_cached_async.cache_info()
+    if new_cache_info.hits > cache_info.hits:
+        logger.info("Structure detection (async): cache HIT - returned cached result")
+    else:
+        logger.info("Structure detection (async): cache MISS - processed new request")
+    
+    return result
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from backend.llm.client import chat_completion
+from backend.llm.client import chat_completion, chat_completion_async
+from backend.llm.tokens import count_tokens, plan_max_tokens
 from backend.models import (
     RequirementsResult,
     StructureDetectionResult,
@@ -12,7 +14,7 @@ from backend.models import (
 from backend.rag import RAGSystem
 from backend.knowledge_base import FusionAIxKnowledgeBase
 from backend.agents.prompts import STRUCTURED_RESPONSE_SYSTEM_PROMPT
-from backend.agents.response_agent import _clarity_check
+from backend.agents.response_agent import _clarity_check, _clarity_check_async
 from backend.memory.mem0_client import search_memories
 
 logger = logging.getLogger(__name__)
@@ -57,51 +59,41 @@ def format_retrieved_chunks(
 
     return "\n".join(formatted)
 
-#function to generate a full structured RFP response document using LLM and RAG
-def run_structured_response_agent(
+#function to retrieve RAG chunks for the structure description and the leading requirements
+def _retrieve_structured_chunks(
     requirements_result: RequirementsResult,
     structure_detection: StructureDetectionResult,
-    rag_system: Optional[RAGSystem] = None,
-    num_retrieval_chunks: int = 5,
-    knowledge_base: Optional[FusionAIxKnowledgeBase] = None,
-    temperature: float = 0.0,
-    max_tokens: Optional[int] = None,
-    qa_context: Optional[str] = None,
-) -> ResponseResult:
-    if not structure_detection.has_explicit_structure:
-        raise ValueError("Cannot generate structured response without explicit structure")
-    
-    logger.info(
-        "Structured response agent: starting (sections=%d, solution_reqs=%d)",
-        len(structure_detection.detected_sections),
-        len(requirements_result.solution_requirements),
-    )
-    
+    rag_system: Optional[RAGSystem],
+    num_retrieval_chunks: int,
+) -> List[Dict[str, Any]]:
     retrieved_chunks: List[Dict[str, Any]] = []
     if rag_system is not None:
         try:
             all_chunks = []
             seen_chunk_ids = set()
             
-            structure_chunks = rag_system.search(structure_detection.structure_description, k=min(3, num_retrieval_chunks))
+            #the structure description and the leading requirements are searched in one batch
+            leading_reqs = requirements_result.solution_requirements[:5]
+            batch_results = rag_system.search_many(
+                [structure_detection.structure_description] + [req.source_text for req in leading_reqs],
+                k=min(3, num_retrieval_chunks),
+            )
+            structure_chunks = batch_results[0]
             for chunk in structure_chunks:
                 chunk_id = chunk.get("chunk_id") or str(chunk.get("chunk_text", ""))[:50]
                 if chunk_id not in seen_chunk_ids:
                     all_chunks.append(chunk)
                     seen_chunk_ids.add(chunk_id)
             
-            for req in requirements_result.solution_requirements[:5]:
+            for req, req_results in zip(leading_reqs, batch_results[1:]):
                 if len(all_chunks) >= num_retrieval_chunks * 2:
                     break
-                try:
-                    req_chunks = rag_system.search(req.source_text, k=min(2, num_retrieval_chunks))
-                    for chunk in req_chunks:
-                        chunk_id = chunk.get("chunk_id") or str(chunk.get("chunk_text", ""))[:50]
-                        if chunk_id not in seen_chunk_ids:
-                            all_chunks.append(chunk)
-                            seen_chunk_ids.add(chunk_id)
-                except Exception as req_e:
-                    logger.warning("Failed to search RAG for requirement %s: %s", req.id, req_e)
+                req_chunks = req_results[:min(2, num_retrieval_chunks)]
+                for chunk in req_chunks:
+                    chunk_id = chunk.get("chunk_id") or str(chunk.get("chunk_text", ""))[:50]
+                    if chunk_id not in seen_chunk_ids:
+                        all_chunks.append(chunk)
+                        seen_chunk_ids.add(chunk_id)
             
             retrieved_chunks = all_chunks[:num_retrieval_chunks * 2]
             logger.info("Retrieved %d chunks from RAG (searched structure + %d requirements)", len(retrieved_chunks), min(5, len(requirements_result.solution_requirements)))
@@ -109,7 +101,13 @@ def run_structured_response_agent(
             logger.warning("Failed to retrieve chunks from RAG: %s", str(e))
             retrieved_chunks = []
     
-    chunks_text = format_retrieved_chunks(retrieved_chunks, max_chunks=5, max_total_chars=3000)
+    return retrieved_chunks
+
+#function to format the fusionAIx knowledge base context for the structured response
+def _structured_kb_context(
+    requirements_result: RequirementsResult,
+    knowledge_base: Optional[FusionAIxKnowledgeBase],
+) -> str:
     fusionaix_context = ""
     if knowledge_base is not None:
         try:
@@ -124,6 +122,13 @@ def run_structured_response_agent(
         except Exception as kb_exc:
             logger.warning("Failed to format knowledge base context: %s", kb_exc)
             fusionaix_context = ""
+    return fusionaix_context
+
+#function to summarise the solution requirements and the structure description for the prompt
+def _structured_summaries(
+    requirements_result: RequirementsResult,
+    structure_detection: StructureDetectionResult,
+) -> Tuple[str, str]:
     solution_reqs_parts = []
     for req in requirements_result.solution_requirements:
         req_summary = req.source_text[:150] + ("..." if len(req.source_text) > 150 else "")
@@ -133,16 +138,27 @@ def run_structured_response_agent(
     structure_desc = structure_detection.structure_description
     if len(structure_desc) > 500:
         structure_desc = structure_desc[:500] + "..."
+    return solution_reqs_text, structure_desc
 
-    try:
-        clarity_input = solution_reqs_text
-        clarity = _clarity_check(clarity_input or "", structure_desc or None)
+#function to retrieve memories and assemble the structured response user prompt (clarity=None means the check failed)
+def _build_structured_prompt(
+    requirements_result: RequirementsResult,
+    structure_detection: StructureDetectionResult,
+    solution_reqs_text: str,
+    structure_desc: str,
+    chunks_text: str,
+    fusionaix_context: str,
+    clarity: Optional[dict],
+    qa_context: Optional[str] = None,
+) -> str:
+    clarity_input = solution_reqs_text
+    retrieved_memories: List[Dict[str, Any]] = []
+    if clarity is not None:
         logger.info("Structured clarity check: %s (questions=%d)", clarity.get("clarity"), len(clarity.get("questions") or []))
         logger.debug("Structured clarity raw output: %s", (clarity.get("raw") or "")[:2000])
         if clarity.get("questions"):
             logger.info("Structured clarity questions: %s", clarity.get("questions"))
 
-        retrieved_memories: List[Dict[str, Any]] = []
         if clarity.get("clarity") == "unclear":
             try:
                 retrieved_memories = search_memories(clarity_input or "", max_results=5, stage="requirements")
@@ -157,9 +173,6 @@ def run_structured_response_agent(
                 logger.warning("Structured flow local memory search failed: %s", mem_e)
         else:
             logger.debug("Structured flow skipping mem0; requirements considered clear by LLM")
-    except Exception as e:
-        logger.warning("Structured clarity check failed: %s", e)
-        retrieved_memories = []
     
     retrieved_edit_memories: List[Dict[str, Any]] = []
     try:
@@ -176,7 +189,7 @@ def run_structured_response_agent(
     except Exception as edit_mem_exc:
         logger.warning("Structured flow edit memory search failed: %s", edit_mem_exc)
 
-    if 'retrieved_memories' in locals() and retrieved_memories:
+    if retrieved_memories:
         user_prompt_extra_mem = ["", "=" * 80, "LOCAL MEMORY (mem0) - Relevant snippets (use as additional context):", "=" * 80]
         for mem in retrieved_memories:
             score = mem.get("score")
@@ -303,10 +316,24 @@ def run_structured_response_agent(
         "Generate the complete structured response now:",
     ])
     
-    user_prompt = "\n".join(user_prompt_parts)
-    
-    system_tokens = len(STRUCTURED_RESPONSE_SYSTEM_PROMPT) // 4
-    user_tokens = len(user_prompt) // 4
+    return "\n".join(user_prompt_parts)
+
+#function to build the structured response chat completion request, sizing max_tokens from the structure
+#when not given explicitly (shared by the sync and async clients)
+def _build_structured_request(
+    user_prompt: str,
+    requirements_result: RequirementsResult,
+    structure_detection: StructureDetectionResult,
+    structure_desc: str,
+    solution_reqs_text: str,
+    fusionaix_context: str,
+    chunks_text: str,
+    qa_context: Optional[str],
+    temperature: float,
+    max_tokens: Optional[int],
+) -> Dict[str, Any]:
+    system_tokens = count_tokens(STRUCTURED_RESPONSE_SYSTEM_PROMPT)
+    user_tokens = count_tokens(user_prompt)
     total_input_tokens = system_tokens + user_tokens + 100
     
     logger.debug(
@@ -326,7 +353,14 @@ def run_structured_response_agent(
         num_sections = len(structure_detection.detected_sections)
         num_requirements = len(requirements_result.solution_requirements)
         estimated_output_tokens = max(12000, num_sections * 2500 + num_requirements * 200)
-        max_tokens = min(estimated_output_tokens, 16384)
+        #the section-based estimate only sizes the budget until there is observed usage to go on
+        max_tokens = plan_max_tokens(
+            "structured_response",
+            total_input_tokens,
+            ceiling=16384,
+            floor=4000,
+            default=estimated_output_tokens,
+        )
         logger.info("Calculated max_tokens: %d (sections=%d, requirements=%d, estimated_output=%d)", 
                    max_tokens, num_sections, num_requirements, estimated_output_tokens)
     
@@ -337,27 +371,114 @@ def run_structured_response_agent(
         max_tokens,
         total_input_tokens,
     )
-    
-    response_text = chat_completion(
-        model=STRUCTURED_RESPONSE_MODEL,
-        messages=[
+    return {
+        "model": STRUCTURED_RESPONSE_MODEL,
+        "messages": [
             {"role": "system", "content": STRUCTURED_RESPONSE_SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "agent": "structured_response",
+    }
+
+#function to check a structured response can be generated for the detected structure
+def _start_structured_response(
+    requirements_result: RequirementsResult,
+    structure_detection: StructureDetectionResult,
+) -> None:
+    if not structure_detection.has_explicit_structure:
+        raise ValueError("Cannot generate structured response without explicit structure")
     
+    logger.info(
+        "Structured response agent: starting (sections=%d, solution_reqs=%d)",
+        len(structure_detection.detected_sections),
+        len(requirements_result.solution_requirements),
+    )
+
+#function to wrap the structured response text into a ResponseResult
+def _structured_result(
+    response_text: str,
+    structure_detection: StructureDetectionResult,
+    num_chunks_used: int,
+) -> ResponseResult:
     logger.info(
         "Structured response agent: finished (response_length=%d, chunks_used=%d)",
         len(response_text),
-        len(retrieved_chunks),
+        num_chunks_used,
     )
     
     return ResponseResult(
         response_text=response_text,
         build_query_used=f"Structured response following: {', '.join(structure_detection.detected_sections)}",
-        num_retrieved_chunks=len(retrieved_chunks),
-        notes=f"Generated structured response with {len(structure_detection.detected_sections)} sections, using {len(retrieved_chunks)} RAG chunks",
+        num_retrieved_chunks=num_chunks_used,
+        notes=f"Generated structured response with {len(structure_detection.detected_sections)} sections, using {num_chunks_used} RAG chunks",
+    )
+
+#function to generate a full structured RFP response document using LLM and RAG
+def run_structured_response_agent(
+    requirements_result: RequirementsResult,
+    structure_detection: StructureDetectionResult,
+    rag_system: Optional[RAGSystem] = None,
+    num_retrieval_chunks: int = 5,
+    knowledge_base: Optional[FusionAIxKnowledgeBase] = None,
+    temperature: float = 0.0,
+    max_tokens: Optional[int] = None,
+    qa_context: Optional[str] = None,
+) -> ResponseResult:
+    _start_structured_response(requirements_result, structure_detection)
+    
+    retrieved_chunks = _retrieve_structured_chunks(requirements_result, structure_detection, rag_system, num_retrieval_chunks)
+    chunks_text = format_retrieved_chunks(retrieved_chunks, max_chunks=5, max_total_chars=3000)
+    fusionaix_context = _structured_kb_context(requirements_result, knowledge_base)
+    solution_reqs_text, structure_desc = _structured_summaries(requirements_result, structure_detection)
+    clarity = _clarity_check(solution_reqs_text or "", structure_desc or None)
+
+    user_prompt = _build_structured_prompt(
+        requirements_result, structure_detection, solution_reqs_text, structure_desc,
+        chunks_text, fusionaix_context, clarity, qa_context,
+    )
+    request = _build_structured_request(
+        user_prompt, requirements_result, structure_detection, structure_desc,
+        solution_reqs_text, fusionaix_context, chunks_text, qa_context, temperature, max_tokens,
     )
+    
+    response_text = chat_completion(**request)
+    
+    return _structured_result(response_text, structure_detection, len(retrieved_chunks))
 
+#function to generate a full structured RFP response on the async LLM client without blocking the event loop
+async def run_structured_response_agent_async(
+    requirements_result: RequirementsResult,
+    structure_detection: StructureDetectionResult,
+    rag_system: Optional[RAGSystem] = None,
+    num_retrieval_chunks: int = 5,
+    knowledge_base: Optional[FusionAIxKnowledgeBase] = None,
+    temperature: float = 0.0,
+    max_tokens: Optional[int] = None,
+    qa_context: Optional[str] = None,
+) -> ResponseResult:
+    _start_structured_response(requirements_result, structure_detection)
+    
+    #RAG search and memory search call the embedding API, so keep them off the event loop
+    retrieved_chunks = await asyncio.to_thread(
+        _retrieve_structured_chunks, requirements_result, structure_detection, rag_system, num_retrieval_chunks
+    )
+    chunks_text = format_retrieved_chunks(retrieved_chunks, max_chunks=5, max_total_chars=3000)
+    fusionaix_context = _structured_kb_context(requirements_result, knowledge_base)
+    solution_reqs_text, structure_desc = _structured_summaries(requirements_result, structure_detection)
+    clarity = await _clarity_check_async(solution_reqs_text or "", structure_desc or None)
+
+    user_prompt = await asyncio.to_thread(
+        _build_structured_prompt,
+        requirements_result, structure_detection, solution_reqs_text, structure_desc,
+        chunks_text, fusionaix_context, clarity, qa_context,
+    )
+    request = _build_structured_request(
+        user_prompt, requirements_result, structure_detection, structure_desc,
+        solution_reqs_text, fusionaix_context, chunks_text, qa_context, temperature, max_tokens,
+    )
+    
+    response_text = await chat_completion_async(**request)
+    
+    return _structured_result(response_text, structure_detection, len(retrieved_chunks))
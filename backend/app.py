@@ -1,15 +1,17 @@
 from __future__ import annotations
 
+import json
 import logging
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import httpx
@@ -18,22 +20,34 @@ import asyncio
 
 
 from backend.pipeline.text_extraction import extract_text_from_file
-from backend.agents.preprocess_agent import run_preprocess_agent
-from backend.agents.requirements_agent import run_requirements_agent
+from backend.pipeline.generation import generate_requirement_responses
+from backend.agents.preprocess_agent import run_preprocess_agent_async
+from backend.agents.requirements_agent import run_requirements_agent_async
 from backend.agents.build_query import build_query, build_query_for_single_requirement
-from backend.agents.response_agent import run_response_agent
-from backend.agents.structure_detection_agent import detect_structure
-from backend.agents.structured_response_agent import run_structured_response_agent
+from backend.agents.structure_detection_agent import detect_structure_async
+from backend.agents.structured_response_agent import run_structured_response_agent_async
 from backend.agents.question_agent import (
-    analyze_requirements_for_questions,
-    analyze_build_query_for_questions,
-    analyze_build_query_for_questions_legacy,
-    infer_answered_questions_from_answer,
-    get_next_critical_question,
-    check_if_more_questions_needed,
+    analyze_requirements_for_questions_async,
+    analyze_build_query_for_questions_async,
+    analyze_build_query_for_questions_legacy_async,
+    infer_answered_questions_from_answer_async,
+    get_next_critical_question_async,
+    check_if_more_questions_needed_async,
 )
-from backend.agents.quality_agent import assess_response_quality
-from backend.rag import RAGSystem
+from backend.llm.client import close_async_clients
+from backend.llm.cache import llm_cache_stats
+from backend.llm.cassette import cassette_stats
+from backend.llm.rate_limiter import rate_limiter_stats
+from backend.llm.single_flight import single_flight_stats
+from backend.llm.tokens import token_usage_stats
+from backend.rag import (
+    RAGSystem,
+    get_shared_rag_system,
+    rag_readiness,
+    shutdown_shared_rag_system,
+    warm_shared_rag_system,
+)
+from backend.rag.embedding_store import embedding_store_stats
 from backend.models import (
     ExtractionResult,
     RequirementsResult,
@@ -55,40 +69,8 @@ from backend.memory.mem0_client import (
 
 #function to setup rag system and load the fusionAIx knowledge base
 def _setup_rag_and_kb(use_rag: bool) -> tuple[Optional[RAGSystem], FusionAIxKnowledgeBase]:
-    rag_system = None
-    if use_rag:
-        try:
-            project_root = Path(__file__).parent.parent
-            docs_folder = project_root / "docs"
-            index_path = project_root / "rag_index"
-            query_cache_path = project_root / "rag_query_cache.pkl"
-            rag_system = RAGSystem(
-                docs_folder=str(docs_folder), 
-                index_path=str(index_path),
-                query_cache_path=str(query_cache_path),
-            )
-            try:
-                rag_system.ensure_index_up_to_date()
-                stats = rag_system.get_stats()
-                logger.info(
-                    "RAG index ready | built=%s, docs=%s, vectors=%s, dim=%s, model=%s",
-                    stats.get("index_built"),
-                    stats.get("num_documents"),
-                    stats.get("num_vectors"),
-                    stats.get("embedding_dimension"),
-                    stats.get("embedding_model"),
-                )
-            except ValueError as build_err:
-                logger.warning(
-                    "Failed to build RAG index: %s. RAG system not available. "
-                    "Make sure you have documents (PDF, DOCX, TXT) in the 'docs' folder. "
-                    "Continuing without RAG.",
-                    str(build_err)
-                )
-                rag_system = None
-        except Exception as rag_exc:
-            logger.warning("Failed to load/build RAG system: %s. Continuing without RAG.", rag_exc)
-            rag_system = None
+    #the process-wide RAG system is loaded once at startup; this only waits if a request beats the warm-up
+    rag_system = get_shared_rag_system() if use_rag else None
     
     knowledge_base = get_fusionaix_kb()
     logger.info(
@@ -214,7 +196,20 @@ logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI(title="RFP Assistant Backend")
+#function to manage application-wide resources (warms the shared RAG index, closes pooled LLM connections on shutdown)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #load in the background so the server accepts traffic (and /ready reports progress) while a large index loads
+    rag_warmup = asyncio.create_task(asyncio.to_thread(warm_shared_rag_system))
+    yield
+    #cancelling the task does not stop the loading thread, so shutdown first tells it not to publish its result
+    shutdown_shared_rag_system()
+    if not rag_warmup.done():
+        rag_warmup.cancel()
+    await close_async_clients()
+
+
+app = FastAPI(title="RFP Assistant Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -323,7 +318,7 @@ async def process_rfp(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
             raise HTTPException(status_code=500, detail="Failed to process uploaded file.") from e
 
         try:
-            file_text = extract_text_from_file(temp_path)
+            file_text = await asyncio.to_thread(extract_text_from_file, temp_path)
             logger.info(
                 "REQUEST %s: extracted %d chars from file %d/%d (%s)",
                 request_id, len(file_text), file_index, len(files), file.filename,
@@ -380,7 +375,7 @@ async def run_preprocess(req: PreprocessRequest) -> Dict[str, Any]:
     
     t0 = time.time()
     try:
-        preprocess_res = run_preprocess_agent(req.ocr_text)
+        preprocess_res = await run_preprocess_agent_async(req.ocr_text)
     except Exception as exc:
         elapsed = time.time() - t0
         logger.exception(
@@ -408,7 +403,7 @@ async def run_preprocess(req: PreprocessRequest) -> Dict[str, Any]:
     response["ocr_text"] = req.ocr_text
 
     try:
-        store_preprocess_result(req.ocr_text, preprocess_res.to_dict())
+        await asyncio.to_thread(store_preprocess_result, req.ocr_text, preprocess_res.to_dict())
     except Exception as exc:
         logger.warning("Mem0 preprocess storage failed: %s", exc)
 
@@ -480,11 +475,11 @@ async def run_requirements(req: RequirementsRequest) -> Dict[str, Any]:
         "Requirements endpoint called (essential_chars=%d)", len(req.essential_text)
     )
     try:
-        result = run_requirements_agent(essential_text=req.essential_text)
+        result = await run_requirements_agent_async(essential_text=req.essential_text)
         
         logger.info("Running structure detection on %d response structure requirements", 
                    len(result.response_structure_requirements))
-        structure_detection_dict = detect_structure(result.response_structure_requirements)
+        structure_detection_dict = await detect_structure_async(result.response_structure_requirements)
         structure_detection = StructureDetectionResult(**structure_detection_dict)
         result.structure_detection = structure_detection
         
@@ -508,7 +503,7 @@ async def run_requirements(req: RequirementsRequest) -> Dict[str, Any]:
     )
 
     try:
-        store_requirements_result(req.essential_text, result.to_dict())
+        await asyncio.to_thread(store_requirements_result, req.essential_text, result.to_dict())
     except Exception as exc:
         logger.warning("Mem0 requirements storage failed: %s", exc)
 
@@ -601,53 +596,6 @@ def _build_combined_response_text(
     return "\n".join(combined_parts)
 
 
-#function to extract key phrase from requirement text
-def _extract_key_phrase(source_text: str, max_words: int = 10) -> str:
-    words = source_text.split()
-    return " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
-
-
-#function to create an error response dict for a failed requirement
-def _create_error_response(
-    requirement_id: str,
-    requirement_text: str,
-    key_phrase: str,
-    error: Exception,
-) -> Dict[str, Any]:
-    return {
-        "requirement_id": requirement_id,
-        "requirement_text": requirement_text,
-        "key_phrase": key_phrase,
-        "response": f"[ERROR: Failed to generate response for this requirement: {str(error)}]",
-        "notes": f"Error: {str(error)}",
-        "quality": {
-            "score": 0.0,
-            "completeness": "incomplete",
-            "relevance": "low",
-            "issues": [f"Generation failed: {str(error)}"],
-            "suggestions": ["Fix the error and regenerate"],
-        },
-    }
-
-
-#function to log progress for requirement processing
-def _log_requirement_progress(
-    idx: int,
-    total: int,
-    successful: int,
-    failed: int,
-    requirement_id: str,
-) -> None:
-    logger.info(
-        "[%d/%d] Progress: %d successful, %d failed, %d remaining",
-        idx,
-        total,
-        successful,
-        failed,
-        total - idx,
-    )
-
-
 #function to log final generation summary
 def _log_generation_summary(
     total_requirements: int,
@@ -674,98 +622,6 @@ def _log_generation_summary(
     logger.info("=" * 80)
 
 
-#function to process a single requirement and generate response
-def _process_single_requirement(
-    solution_req: Any,
-    idx: int,
-    total_requirements: int,
-    extraction_result: ExtractionResult,
-    requirements_result: RequirementsResult,
-    knowledge_base: Any,
-    qa_context: str,
-) -> Dict[str, Any]:
-    req_start_time = time.time()
-    key_phrase = _extract_key_phrase(solution_req.source_text)
-    
-    logger.info(
-        "[%d/%d] Processing requirement: %s",
-        idx,
-        total_requirements,
-        solution_req.id,
-    )
-    logger.debug(
-        "[%d/%d] Requirement text: %s",
-        idx,
-        total_requirements,
-        solution_req.source_text[:100] + "..."
-        if len(solution_req.source_text) > 100
-        else solution_req.source_text,
-    )
-    
-    build_query_obj = build_query_for_single_requirement(
-        extraction_result=extraction_result,
-        single_requirement=solution_req,
-        all_response_structure_requirements=requirements_result.response_structure_requirements,
-    )
-    build_query_obj.confirmed = True
-    
-    try:
-        result = run_response_agent(
-            build_query=build_query_obj,
-            knowledge_base=knowledge_base,
-            qa_context=qa_context,
-        )
-        
-        quality_assessment = assess_response_quality(solution_req, result.response_text)
-        req_elapsed = time.time() - req_start_time
-        
-        response_dict = {
-            "requirement_id": solution_req.id,
-            "requirement_text": solution_req.source_text,
-            "key_phrase": key_phrase,
-            "response": result.response_text,
-            "notes": result.notes,
-            "quality": quality_assessment,
-        }
-        
-        logger.info(
-            "[%d/%d] ✓ SUCCESS: Generated response for requirement %s (length=%d chars, time=%.2fs)",
-            idx,
-            total_requirements,
-            solution_req.id,
-            len(result.response_text),
-            req_elapsed,
-        )
-        
-        return {"response": response_dict, "success": True, "elapsed": req_elapsed}
-        
-    except Exception as req_exc:
-        req_elapsed = time.time() - req_start_time
-        logger.error(
-            "[%d/%d] ✗ FAILED: Requirement %s failed after %.2fs: %s",
-            idx,
-            total_requirements,
-            solution_req.id,
-            req_elapsed,
-            req_exc,
-        )
-        logger.exception(
-            "[%d/%d] Full error traceback for requirement %s:",
-            idx,
-            total_requirements,
-            solution_req.id,
-        )
-        
-        error_response = _create_error_response(
-            requirement_id=solution_req.id,
-            requirement_text=solution_req.source_text,
-            key_phrase=key_phrase,
-            error=req_exc,
-        )
-        
-        return {"response": error_response, "success": False, "elapsed": req_elapsed}
-
-
 #function to build a query from preprocess and requirements
 @app.post("/build-query")
 async def build_query_endpoint(req: BuildQueryRequest) -> Dict[str, Any]:
@@ -778,7 +634,7 @@ async def build_query_endpoint(req: BuildQueryRequest) -> Dict[str, Any]:
         payload = query.model_dump()
 
         try:
-            store_build_query_result(req.preprocess.get("cleaned_text") or "", payload)
+            await asyncio.to_thread(store_build_query_result, req.preprocess.get("cleaned_text") or "", payload)
         except Exception as exc:
             logger.warning("Mem0 build query storage failed: %s", exc)
 
@@ -816,7 +672,7 @@ async def generate_response_endpoint(req: GenerateResponseRequest) -> Dict[str,
         
         if requirements_result.structure_detection is None:
             logger.info("Structure detection not found in requirements, running now...")
-            structure_detection_dict = detect_structure(requirements_result.response_structure_requirements)
+            structure_detection_dict = await detect_structure_async(requirements_result.response_structure_requirements)
             requirements_result.structure_detection = StructureDetectionResult(**structure_detection_dict)
         
         structure_detection = requirements_result.structure_detection
@@ -888,7 +744,7 @@ async def _generate_structured_response(
     num_retrieval_chunks: int,
     session_id: Optional[str] = None,
 ) -> Response:
-    rag_system, knowledge_base = _setup_rag_and_kb(use_rag)
+    rag_system, knowledge_base = await asyncio.to_thread(_setup_rag_and_kb, use_rag)
     
     logger.info("=" * 80)
     logger.info("Running pre-flight validation before structured response generation...")
@@ -916,7 +772,7 @@ async def _generate_structured_response(
             qa_context = context.get_qa_context()
             logger.info("Including Q&A context from session %s (%d answers)", session_id, len(context.answers))
         
-        result = run_structured_response_agent(
+        result = await run_structured_response_agent_async(
             requirements_result=requirements_result,
             structure_detection=structure_detection,
             rag_system=rag_system,
@@ -1030,7 +886,7 @@ async def _generate_per_requirement_response(
     num_retrieval_chunks: int,
     session_id: Optional[str] = None,
 ) -> Response:
-    rag_system, knowledge_base = _setup_rag_and_kb(use_rag)
+    rag_system, knowledge_base = await asyncio.to_thread(_setup_rag_and_kb, use_rag)
     
     qa_context = ""
     if session_id and session_id in _conversation_sessions:
@@ -1066,32 +922,20 @@ async def _generate_per_requirement_response(
     partial_completion = False
     
     try:
-        for idx, solution_req in enumerate(requirements_result.solution_requirements, 1):
-            result = _process_single_requirement(
-                solution_req=solution_req,
-                idx=idx,
-                total_requirements=total_requirements,
-                extraction_result=extraction_result,
-                requirements_result=requirements_result,
-                knowledge_base=knowledge_base,
-                qa_context=qa_context,
-            )
-            
+        results = await generate_requirement_responses(
+            extraction_result=extraction_result,
+            requirements_result=requirements_result,
+            knowledge_base=knowledge_base,
+            qa_context=qa_context,
+        )
+        
+        for result in results:
             individual_responses.append(result["response"])
-            
             if result["success"]:
                 successful_responses += 1
             else:
                 failed_responses += 1
             
-            _log_requirement_progress(
-                idx=idx,
-                total=total_requirements,
-                successful=successful_responses,
-                failed=failed_responses,
-                requirement_id=solution_req.id,
-            )
-            
     except KeyboardInterrupt:
         logger.warning("Response generation interrupted by user")
         partial_completion = True
@@ -1174,7 +1018,7 @@ async def generate_questions_endpoint(req: GenerateQuestionsRequest) -> Dict[str
     logger.info("Generate questions endpoint called")
     try:
         company_kb = get_company_kb()
-        rag_system, _ = _setup_rag_and_kb(use_rag=True)
+        rag_system, _ = await asyncio.to_thread(_setup_rag_and_kb, True)
         
         if req.build_query:
             logger.info("Analyzing build query for questions")
@@ -1182,7 +1026,7 @@ async def generate_questions_endpoint(req: GenerateQuestionsRequest) -> Dict[str
             
             if req.requirements:
                 requirements_result = RequirementsResult(**req.requirements)
-                questions_list, rag_contexts_by_req = analyze_build_query_for_questions(
+                questions_list, rag_contexts_by_req = await analyze_build_query_for_questions_async(
                     build_query_obj,
                     requirements_result,
                     company_kb,
@@ -1196,7 +1040,7 @@ async def generate_questions_endpoint(req: GenerateQuestionsRequest) -> Dict[str
                 )
             else:
                 logger.warning("Requirements not provided with build query, analyzing build query as whole")
-                questions_list = analyze_build_query_for_questions_legacy(
+                questions_list = await analyze_build_query_for_questions_legacy_async(
                     build_query_obj,
                     company_kb,
                     max_questions=20,
@@ -1234,7 +1078,7 @@ async def generate_questions_endpoint(req: GenerateQuestionsRequest) -> Dict[str
             logger.info("Analyzing requirements for questions (legacy mode)")
             requirements_result = RequirementsResult(**req.requirements)
             
-            questions_dict = analyze_requirements_for_questions(
+            questions_dict = await analyze_requirements_for_questions_async(
                 requirements_result.solution_requirements,
                 company_kb,
                 max_questions_per_requirement=1,
@@ -1287,7 +1131,7 @@ async def get_next_question_endpoint(req: GetNextQuestionRequest) -> Dict[str, A
     
     try:
         company_kb = get_company_kb()
-        rag_system, _ = _setup_rag_and_kb(use_rag=True)
+        rag_system, _ = await asyncio.to_thread(_setup_rag_and_kb, True)
         requirements_result = RequirementsResult(**req.requirements)
         
         previous_answers: List[Answer] = []
@@ -1302,7 +1146,7 @@ async def get_next_question_endpoint(req: GetNextQuestionRequest) -> Dict[str, A
                 len(rag_contexts_by_req),
             )
         
-        question, remaining_gaps, updated_rag = get_next_critical_question(
+        question, remaining_gaps, updated_rag = await get_next_critical_question_async(
             requirements_result=requirements_result,
             company_kb=company_kb,
             rag_system=rag_system,
@@ -1367,11 +1211,11 @@ async def submit_answer_and_get_next(req: SubmitIterativeAnswerRequest) -> Dict[
     
     try:
         company_kb = get_company_kb()
-        rag_system, _ = _setup_rag_and_kb(use_rag=True)
+        rag_system, _ = await asyncio.to_thread(_setup_rag_and_kb, True)
         requirements_result = RequirementsResult(**req.requirements)
         rag_contexts_by_req = context.rag_contexts_by_req or {}
         
-        needs_more, next_question, remaining, updated_rag = check_if_more_questions_needed(
+        needs_more, next_question, remaining, updated_rag = await check_if_more_questions_needed_async(
             requirements_result=requirements_result,
             company_kb=company_kb,
             rag_system=rag_system,
@@ -1495,7 +1339,7 @@ async def submit_answer(req: SubmitAnswerRequest) -> Dict[str, Any]:
     auto_resolved_ids: list[str] = []
     if remaining_questions:
         try:
-            auto_resolved_ids = infer_answered_questions_from_answer(
+            auto_resolved_ids = await infer_answered_questions_from_answer_async(
                 answered_question=question,
                 answer_text=req.answer_text,
                 remaining_questions=remaining_questions,
@@ -1612,85 +1456,51 @@ class PreviewResponseRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+#function to parse a preview request and prepare everything the generation engine needs
+async def _prepare_preview_generation(
+    req: PreviewResponseRequest,
+) -> tuple[ExtractionResult, RequirementsResult, FusionAIxKnowledgeBase, str]:
+    preprocess_result = PreprocessResult(**req.preprocess)
+    extraction_result = _extraction_from_preprocess(preprocess_result)
+    requirements_result = RequirementsResult(**req.requirements)
+
+    if not requirements_result.solution_requirements:
+        raise HTTPException(
+            status_code=400,
+            detail="No solution requirements found. Cannot generate responses.",
+        )
+
+    if requirements_result.structure_detection is None:
+        structure_detection_dict = await detect_structure_async(requirements_result.response_structure_requirements)
+        requirements_result.structure_detection = StructureDetectionResult(**structure_detection_dict)
+
+    rag_system, knowledge_base = await asyncio.to_thread(_setup_rag_and_kb, req.use_rag)
+
+    qa_context = ""
+    if req.session_id and req.session_id in _conversation_sessions:
+        context = _conversation_sessions[req.session_id]
+        qa_context = context.get_qa_context()
+
+    validation_errors = validate_before_generation(extraction_result, requirements_result)
+    if validation_errors:
+        raise HTTPException(status_code=400, detail="Validation failed: " + "; ".join(validation_errors))
+    
+    return extraction_result, requirements_result, knowledge_base, qa_context
+
+
 @app.post("/preview-responses")
 async def preview_responses_endpoint(req: PreviewResponseRequest) -> Dict[str, Any]:
     logger.info("Preview responses endpoint called")
     try:
-        from backend.models import RequirementsResult
-        
-        preprocess_result = PreprocessResult(**req.preprocess)
-        extraction_result = _extraction_from_preprocess(preprocess_result)
-        requirements_result = RequirementsResult(**req.requirements)
+        extraction_result, requirements_result, knowledge_base, qa_context = await _prepare_preview_generation(req)
         
-        if not requirements_result.solution_requirements:
-            raise HTTPException(
-                status_code=400,
-                detail="No solution requirements found. Cannot generate responses.",
-            )
-        
-        if requirements_result.structure_detection is None:
-            structure_detection_dict = detect_structure(requirements_result.response_structure_requirements)
-            requirements_result.structure_detection = StructureDetectionResult(**structure_detection_dict)
-        
-        structure_detection = requirements_result.structure_detection
-        
-        rag_system, knowledge_base = _setup_rag_and_kb(req.use_rag)
-        
-        qa_context = ""
-        if req.session_id and req.session_id in _conversation_sessions:
-            context = _conversation_sessions[req.session_id]
-            qa_context = context.get_qa_context()
-        
-        validation_errors = validate_before_generation(extraction_result, requirements_result)
-        if validation_errors:
-            raise HTTPException(status_code=400, detail="Validation failed: " + "; ".join(validation_errors))
-        
-        individual_responses = []
-        total_requirements = len(requirements_result.solution_requirements)
-        
-        for idx, solution_req in enumerate(requirements_result.solution_requirements, 1):
-            key_phrase = _extract_key_phrase(solution_req.source_text)
-            
-            try:
-                build_query_obj = build_query_for_single_requirement(
-                    extraction_result=extraction_result,
-                    single_requirement=solution_req,
-                    all_response_structure_requirements=requirements_result.response_structure_requirements,
-                )
-                build_query_obj.confirmed = True
-                
-                result = run_response_agent(
-                    build_query=build_query_obj,
-                    knowledge_base=knowledge_base,
-                    qa_context=qa_context,
-                )
-                
-                quality_assessment = assess_response_quality(solution_req, result.response_text)
-                
-                individual_responses.append({
-                    "requirement_id": solution_req.id,
-                    "requirement_text": solution_req.source_text,
-                    "key_phrase": key_phrase,
-                    "response": result.response_text,
-                    "notes": result.notes,
-                    "quality": quality_assessment,
-                })
-            except Exception as req_exc:
-                logger.error("Failed to generate response for requirement %s: %s", solution_req.id, req_exc)
-                individual_responses.append({
-                    "requirement_id": solution_req.id,
-                    "requirement_text": solution_req.source_text,
-                    "key_phrase": key_phrase,
-                    "response": f"[ERROR: Failed to generate response: {str(req_exc)}]",
-                    "notes": f"Error: {str(req_exc)}",
-                    "quality": {
-                        "score": 0.0,
-                        "completeness": "incomplete",
-                        "relevance": "low",
-                        "issues": [f"Generation failed: {str(req_exc)}"],
-                        "suggestions": ["Fix the error and regenerate"],
-                    },
-                })
+        results = await generate_requirement_responses(
+            extraction_result=extraction_result,
+            requirements_result=requirements_result,
+            knowledge_base=knowledge_base,
+            qa_context=qa_context,
+        )
+        individual_responses = [result["response"] for result in results]
         
         preview_id = str(uuid.uuid4())
         _response_cache[preview_id] = individual_responses
@@ -1710,6 +1520,64 @@ async def preview_responses_endpoint(req: PreviewResponseRequest) -> Dict[str, A
         ) from exc
 
 
+#function to format one Server-Sent Events message
+def _sse_event(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+#function to stream per-requirement responses as Server-Sent Events while they are generated
+@app.post("/preview-responses/stream")
+async def preview_responses_stream_endpoint(req: PreviewResponseRequest) -> StreamingResponse:
+    logger.info("Preview responses stream endpoint called")
+    extraction_result, requirements_result, knowledge_base, qa_context = await _prepare_preview_generation(req)
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    #function to push an engine event onto the SSE queue
+    async def sink(event: Dict[str, Any]) -> None:
+        await queue.put(event)
+    
+    #function to run the generation engine and signal completion on the queue
+    async def run_engine() -> None:
+        try:
+            results = await generate_requirement_responses(
+                extraction_result=extraction_result,
+                requirements_result=requirements_result,
+                knowledge_base=knowledge_base,
+                qa_context=qa_context,
+                event_sink=sink,
+            )
+            individual_responses = [result["response"] for result in results]
+            preview_id = str(uuid.uuid4())
+            _response_cache[preview_id] = individual_responses
+            await queue.put({"event": "done", "preview_id": preview_id, "total": len(individual_responses)})
+        except Exception as exc:
+            logger.exception("Preview responses stream failed: %s", exc)
+            await queue.put({"event": "error", "detail": f"Preview generation failed: {str(exc)}"})
+        finally:
+            await queue.put(None)
+    
+    #function to relay queued engine events to the client, cancelling generation if it disconnects
+    async def event_stream():
+        task = asyncio.create_task(run_engine())
+        try:
+            yield _sse_event("begin", {"total": len(requirements_result.solution_requirements)})
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield _sse_event(event.pop("event"), event)
+        finally:
+            if not task.done():
+                logger.info("Preview responses stream closed by client, cancelling generation")
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 class PreviewContextRequest(BaseModel):
     preprocess: Dict[str, Any]
     requirements: Dict[str, Any]
@@ -1732,17 +1600,22 @@ async def preview_context_endpoint(req: PreviewContextRequest | None = None) ->
         extraction_result = _extraction_from_preprocess(preprocess_result)
         requirements_result = RequirementsResult(**req.requirements)
 
-        rag_system, knowledge_base = _setup_rag_and_kb(req.use_rag)
+        rag_system, knowledge_base = await asyncio.to_thread(_setup_rag_and_kb, req.use_rag)
 
         rag_contexts_by_req: Dict[str, List[Dict[str, Any]]] = {}
         if rag_system:
-            for solution_req in requirements_result.solution_requirements:
-                qtext = solution_req.source_text or ""
-                try:
-                    results = rag_system.search(qtext, k=req.num_retrieval_chunks)
-                except Exception as e:
-                    logger.exception("RAG search failed for requirement %s: %s", solution_req.id, e)
-                    results = []
+            solution_reqs = requirements_result.solution_requirements
+            try:
+                #one batched embedding request and one matrix search for every requirement
+                results_per_req = await asyncio.to_thread(
+                    rag_system.search_many,
+                    [solution_req.source_text or "" for solution_req in solution_reqs],
+                    k=req.num_retrieval_chunks,
+                )
+            except Exception as e:
+                logger.exception("RAG search failed for %d requirement(s): %s", len(solution_reqs), e)
+                results_per_req = [[] for _ in solution_reqs]
+            for solution_req, results in zip(solution_reqs, results_per_req):
                 rag_contexts_by_req[solution_req.id] = results
         else:
             for solution_req in requirements_result.solution_requirements:
@@ -2100,7 +1973,7 @@ async def store_edit_memory_endpoint(req: StoreEditMemoryRequest) -> Dict[str, A
             "requirements_context": req.requirements_context,
         }
         
-        success = store_edit_memory(source_text, edit_payload)
+        success = await asyncio.to_thread(store_edit_memory, source_text, edit_payload)
         
         if success:
             logger.info("Stored edit memory with %d changed sentences", len(req.changed_sentences))
@@ -2127,6 +2000,31 @@ async def health() -> Dict[str, Any]:
     return {"status": "ok"}
 
 
+#function to report readiness: 503 until the shared RAG index finished loading (or is known to be unavailable)
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    rag = rag_readiness()
+    is_ready = rag["status"] in ("ready", "unavailable")
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "rag": rag},
+    )
+
+
+#function to report LLM layer statistics (response cache and its cross-worker leases, rate limiter and
+#single-flight counters, which only cover calls coalesced inside this worker process)
+@app.get("/llm-stats")
+async def llm_stats() -> Dict[str, Any]:
+    return {
+        "cache": llm_cache_stats(),
+        "rate_limits": rate_limiter_stats(),
+        "single_flight_per_process": single_flight_stats(),
+        "tokens": token_usage_stats(),
+        "cassette": cassette_stats(),
+        "embedding_store": embedding_store_stats(),
+    }
+
+
 @app.get("/{path:path}")
 async def serve_frontend(path: str):
     if path.startswith(("assets/", "src/", "public/")):
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import functools
+from collections import OrderedDict, namedtuple
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+#function to build a hashable cache key from call arguments
+def _make_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args
+    return args + (object,) + tuple(sorted(kwargs.items()))
+
+
+#function to decorate a coroutine function with an LRU cache of its awaited results
+def async_lru_cache(maxsize: int = 128) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    def decorator(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        stats = {"hits": 0, "misses": 0}
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = _make_key(args, kwargs)
+            if key in cache:
+                stats["hits"] += 1
+                cache.move_to_end(key)
+                return cache[key]
+            stats["misses"] += 1
+            result = await fn(*args, **kwargs)
+            cache[key] = result
+            cache.move_to_end(key)
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+            return result
+
+        #function to report cache statistics in the same shape as functools.lru_cache
+        def cache_info() -> CacheInfo:
+            return CacheInfo(stats["hits"], stats["misses"], maxsize, len(cache))
+
+        #function to drop all cached results and reset statistics
+        def cache_clear() -> None:
+            cache.clear()
+            stats["hits"] = 0
+            stats["misses"] = 0
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
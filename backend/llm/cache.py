@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", str(_PROJECT_ROOT / "llm_cache.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+#a worker calling the LLM for a cache miss holds a lease on the key for at most this long, so identical
+#calls in other workers wait for its response instead of sending the same request
+LLM_CACHE_LEASE_SECONDS = float(os.environ.get("LLM_CACHE_LEASE_SECONDS", "180"))
+
+#eviction is checked every N stores rather than on every write
+_EVICTION_INTERVAL = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    completion_tokens INTEGER,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache(created_at);
+CREATE TABLE IF NOT EXISTS llm_cache_leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+#function to build the content-addressed key for a chat completion request
+def make_cache_key(
+    model: str,
+    deployment: str,
+    provider: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    #max_tokens is deliberately left out: only responses that finished naturally are stored,
+    #and a lookup is rejected if the stored answer needed more tokens than the caller allows
+    payload = {
+        "model": model,
+        "deployment": deployment,
+        "provider": provider,
+        "messages": messages,
+        "temperature": temperature,
+        "extra": extra or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+
+    #function to open (or create) the sqlite cache database
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stores_since_eviction = 0
+        self._stats = {
+            "hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "errors": 0,
+            "leases": 0, "lease_busy": 0,
+        }
+        #lease owner id: unique per process, so a lease left by a crashed worker is only taken over on expiry
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        #WAL lets several uvicorn workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info(
+            "LLM response cache opened at %s (max_entries=%d, ttl=%.0fs)",
+            path, max_entries, ttl_seconds,
+        )
+
+    #function to look up a cached response (None on miss, expiry or insufficient max_tokens); re-checks of a
+    #key already looked up pass record_stats=False so one call is never counted twice
+    def get(self, key: str, max_tokens: Optional[int] = None, record_stats: bool = True) -> Optional[str]:
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, completion_tokens, created_at FROM llm_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    if record_stats:
+                        self._stats["misses"] += 1
+                    return None
+                response, completion_tokens, created_at = row
+                if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._stats["expired"] += 1
+                    if record_stats:
+                        self._stats["misses"] += 1
+                    return None
+                if max_tokens is not None and completion_tokens is not None and completion_tokens > max_tokens:
+                    if record_stats:
+                        self._stats["misses"] += 1
+                    return None
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                if record_stats:
+                    self._stats["hits"] += 1
+                return response
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("LLM cache read failed: %s", e)
+            return None
+
+    #function to store a completed response and periodically evict old entries
+    def put(self, key: str, model: str, response: str, completion_tokens: Optional[int] = None) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, response, completion_tokens, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, completion_tokens, now, now),
+                )
+                self._stats["stores"] += 1
+                self._stores_since_eviction += 1
+                if self._stores_since_eviction >= _EVICTION_INTERVAL:
+                    self._stores_since_eviction = 0
+                    self._evict_locked(now)
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("LLM cache write failed: %s", e)
+
+    #function to take the lease on a key unless another worker holds an unexpired one; True when taken
+    def acquire_lease(self, key: str, lease_seconds: float = LLM_CACHE_LEASE_SECONDS) -> bool:
+        now = time.time()
+        try:
+            with self._lock:
+                #one statement, so two workers racing for the same key cannot both win
+                cur = self._conn.execute(
+                    "INSERT INTO llm_cache_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE llm_cache_leases.expires_at < ?",
+                    (key, self._owner, now + lease_seconds, now),
+                )
+                acquired = cur.rowcount > 0
+                self._stats["leases" if acquired else "lease_busy"] += 1
+                return acquired
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("LLM cache lease failed: %s", e)
+            #without a working lease table every worker calls the LLM itself
+            return True
+
+    #function to report whether any worker holds an unexpired lease on a key
+    def lease_held(self, key: str) -> bool:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT 1 FROM llm_cache_leases WHERE key = ? AND expires_at >= ?",
+                    (key, time.time()),
+                ).fetchone()
+                return row is not None
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("LLM cache lease check failed: %s", e)
+            return False
+
+    #function to release a lease this process holds
+    def release_lease(self, key: str) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "DELETE FROM llm_cache_leases WHERE key = ? AND owner = ?",
+                    (key, self._owner),
+                )
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("LLM cache lease release failed: %s", e)
+
+    #function to drop expired entries and then least recently used entries beyond max_entries
+    def _evict_locked(self, now: float) -> None:
+        if self.ttl_seconds > 0:
+            cur = self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._stats["expired"] += max(cur.rowcount, 0)
+        #leases of workers that died mid-call
+        self._conn.execute("DELETE FROM llm_cache_leases WHERE expires_at < ?", (now,))
+        if self.max_entries > 0:
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+                self._stats["evictions"] += excess
+                logger.info("LLM cache evicted %d least recently used entries", excess)
+
+    #function to run eviction immediately
+    def evict(self) -> None:
+        with self._lock:
+            self._evict_locked(time.time())
+
+    #function to remove all cached responses
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    #function to report hit/miss counters and current size
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": True,
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": (self._stats["hits"] / lookups) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+_LLM_CACHE: Optional[LLMResponseCache] = None
+_LLM_CACHE_LOCK = threading.Lock()
+_LLM_CACHE_FAILED = False
+
+
+#function to get the process-wide LLM response cache (None when disabled or unavailable)
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    global _LLM_CACHE, _LLM_CACHE_FAILED
+    if not LLM_CACHE_ENABLED or _LLM_CACHE_FAILED:
+        return None
+    if _LLM_CACHE is None:
+        with _LLM_CACHE_LOCK:
+            if _LLM_CACHE is None:
+                try:
+                    _LLM_CACHE = LLMResponseCache(LLM_CACHE_PATH)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning("LLM response cache unavailable (%s); continuing without it", e)
+                    _LLM_CACHE_FAILED = True
+                    return None
+    return _LLM_CACHE
+
+
+#function to report LLM cache statistics for monitoring endpoints
+def llm_cache_stats() -> Dict[str, Any]:
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
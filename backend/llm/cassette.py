@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+#off = live calls only, record = live calls saved to disk, replay = served from disk without network access
+LLM_CASSETTE_MODE = os.environ.get("LLM_CASSETTE_MODE", "off").strip().lower()
+LLM_CASSETTE_DIR = os.environ.get("LLM_CASSETTE_DIR", str(_PROJECT_ROOT / "cassettes"))
+#replay latency: "none", "recorded" (sleep for the latency seen while recording) or a fixed number of seconds
+LLM_CASSETTE_LATENCY = os.environ.get("LLM_CASSETTE_LATENCY", "none").strip().lower()
+
+_MODES = ("off", "record", "replay")
+if LLM_CASSETTE_MODE not in _MODES:
+    logger.warning("Unknown LLM_CASSETTE_MODE=%s; cassette mode disabled", LLM_CASSETTE_MODE)
+    LLM_CASSETTE_MODE = "off"
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+#function to build the cassette key of a request (provider, deployment and max_tokens are left out so
+#recordings replay on machines with different credentials and regardless of the max_tokens plan)
+def cassette_key(kind: str, model: str, payload: Dict[str, Any]) -> str:
+    encoded = json.dumps(
+        {"kind": kind, "model": model, "payload": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+#function to pack an embedding matrix as base64 float32 so cassettes stay compact
+def encode_embeddings(embeddings: List[List[float]]) -> Dict[str, Any]:
+    array = np.asarray(embeddings, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+#function to unpack an embedding matrix stored by encode_embeddings
+def decode_embeddings(packed: Dict[str, Any]) -> List[List[float]]:
+    array = np.frombuffer(base64.b64decode(packed["data"]), dtype=np.float32)
+    return array.reshape(packed["shape"]).tolist()
+
+
+class LLMCassette:
+
+    #function to initialise a cassette directory in record or replay mode
+    def __init__(self, mode: str, directory: str, latency: str = "none"):
+        self.mode = mode
+        self.directory = Path(directory)
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0, "simulated_latency_seconds": 0.0}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info("LLM cassette mode=%s dir=%s latency=%s", mode, directory, latency)
+
+    #function to report whether requests are served from disk
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    #function to map a key to its file (sharded by prefix to keep directories small)
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    #function to store one request/response pair (atomic write so concurrent recorders never leave partial files)
+    def record(self, key: str, kind: str, model: str, response: Dict[str, Any], elapsed: float) -> None:
+        path = self._path(key)
+        entry = {
+            "key": key,
+            "kind": kind,
+            "model": model,
+            "elapsed": round(elapsed, 4),
+            "recorded_at": time.time(),
+            "response": response,
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to record cassette entry %s: %s", key[:16], e)
+            return
+        with self._lock:
+            self._stats["recorded"] += 1
+
+    #function to load a recorded entry, raising CassetteMissError when the request was never recorded
+    def _load(self, key: str, kind: str, model: str) -> Dict[str, Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats["misses"] += 1
+            raise CassetteMissError(
+                f"No cassette entry for {kind} request to {model} (key={key[:16]}) in {self.directory}"
+            )
+        with self._lock:
+            self._stats["replayed"] += 1
+        return entry
+
+    #function to compute how long a replayed call should take
+    def _replay_delay(self, entry: Dict[str, Any]) -> float:
+        if self.latency in ("", "none", "0"):
+            return 0.0
+        if self.latency == "recorded":
+            delay = float(entry.get("elapsed") or 0.0)
+        else:
+            try:
+                delay = float(self.latency)
+            except ValueError:
+                return 0.0
+        with self._lock:
+            self._stats["simulated_latency_seconds"] += delay
+        return delay
+
+    #function to replay a recorded response, sleeping the simulated latency on the calling thread
+    def replay(self, key: str, kind: str, model: str) -> Dict[str, Any]:
+        entry = self._load(key, kind, model)
+        delay = self._replay_delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return entry["response"]
+
+    #function to replay a recorded response, sleeping the simulated latency on the event loop
+    async def replay_async(self, key: str, kind: str, model: str) -> Dict[str, Any]:
+        entry = self._load(key, kind, model)
+        delay = self._replay_delay(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return entry["response"]
+
+    #function to report record/replay counters
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "dir": str(self.directory),
+                "latency": self.latency,
+                **{k: (round(v, 2) if isinstance(v, float) else v) for k, v in self._stats.items()},
+            }
+
+
+_CASSETTE: Optional[LLMCassette] = None
+_CASSETTE_LOCK = threading.Lock()
+
+
+#function to get the process-wide cassette (None when cassette mode is off)
+def get_cassette() -> Optional[LLMCassette]:
+    global _CASSETTE
+    if LLM_CASSETTE_MODE == "off":
+        return None
+    if _CASSETTE is None:
+        with _CASSETTE_LOCK:
+            if _CASSETTE is None:
+                _CASSETTE = LLMCassette(LLM_CASSETTE_MODE, LLM_CASSETTE_DIR, LLM_CASSETTE_LATENCY)
+    return _CASSETTE
+
+
+#function to report cassette statistics for monitoring endpoints
+def cassette_stats() -> Dict[str, Any]:
+    cassette = get_cassette()
+    if cassette is None:
+        return {"mode": "off"}
+    return cassette.stats()
@@ -1,11 +1,27 @@
+import asyncio
 import logging
 import os
 import time
-from typing import List, Dict, Any, Optional
+from types import SimpleNamespace
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Tuple, Union
 
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI, AzureOpenAI
-from openai import APITimeoutError
+from openai import OpenAI, AzureOpenAI, AsyncOpenAI, AsyncAzureOpenAI
+from openai import DefaultHttpxClient, DefaultAsyncHttpxClient
+from openai import APIConnectionError, APIStatusError, APITimeoutError, BadRequestError, RateLimitError
+
+from backend.llm.cache import LLM_CACHE_LEASE_SECONDS, get_llm_cache, make_cache_key
+from backend.llm.cassette import cassette_key, decode_embeddings, encode_embeddings, get_cassette
+from backend.llm.rate_limiter import (
+    DEFAULT_COMPLETION_TOKENS,
+    LLM_MAX_RETRIES,
+    DeploymentRateLimiter,
+    backoff_delay,
+    get_rate_limiter,
+    retry_after_seconds,
+)
+from backend.llm.tokens import count_message_tokens, count_tokens, get_token_usage
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +30,61 @@ REQUEST_TIMEOUT = 120.0
 
 load_dotenv()
 
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", "32"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "90"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+
+#size of the deltas a replayed stream is split into
+_REPLAY_DELTA_CHARS = 64
+#how often a worker waiting on another worker's lease checks whether the response has been cached
+_LEASE_POLL_SECONDS = 0.25
+
+#send response_format (JSON schema structured output) to deployments that accept it
+LLM_STRUCTURED_OUTPUT = os.environ.get("LLM_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+#deployments that rejected response_format; later calls skip it and rely on the tolerant JSON parser
+_RESPONSE_FORMAT_UNSUPPORTED: set = set()
+
 _HF_CLIENT = None
 _AZURE_CLIENT = None
+_ASYNC_HF_CLIENT = None
+_ASYNC_AZURE_CLIENT = None
+_HTTP_CLIENT = None
+_ASYNC_HTTP_CLIENT = None
+
+#function to build the connection pool limits shared by all LLM clients
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+#function to build the request timeout shared by all LLM clients
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+#function to get or create the pooled sync HTTP client shared by sync LLM clients
+def get_http_client() -> httpx.Client:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        logger.debug(
+            "Creating pooled HTTP client (max_connections=%d, keepalive=%d, keepalive_expiry=%.0fs)",
+            LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY,
+        )
+        _HTTP_CLIENT = DefaultHttpxClient(limits=_http_limits(), timeout=_http_timeout())
+    return _HTTP_CLIENT
+
+#function to get or create the pooled async HTTP client shared by async LLM clients
+def get_async_http_client() -> httpx.AsyncClient:
+    global _ASYNC_HTTP_CLIENT
+    if _ASYNC_HTTP_CLIENT is None:
+        logger.debug(
+            "Creating pooled async HTTP client (max_connections=%d, keepalive=%d, keepalive_expiry=%.0fs)",
+            LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY,
+        )
+        _ASYNC_HTTP_CLIENT = DefaultAsyncHttpxClient(limits=_http_limits(), timeout=_http_timeout())
+    return _ASYNC_HTTP_CLIENT
 
 #function to get or create a hugging face client
 def get_hf_client() -> OpenAI:
@@ -25,10 +94,13 @@ def get_hf_client() -> OpenAI:
     global _HF_CLIENT
     if _HF_CLIENT is None:
         logger.debug("Creating HF OpenAI client with base_url=%s, timeout=%s", HF_BASE_URL, REQUEST_TIMEOUT)
+        #SDK retries are disabled: _create_with_retries owns retries so the rate limiter sees every attempt
         _HF_CLIENT = OpenAI(
             base_url=HF_BASE_URL,
             api_key=api_key,
             timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=get_http_client(),
         )
     return _HF_CLIENT
 
@@ -36,77 +108,651 @@ def get_hf_client() -> OpenAI:
 def get_azure_client() -> AzureOpenAI:
     api_key = os.environ.get("AZURE_OPENAI_API_KEY")
     endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")    
+    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
     if not api_key:
         raise RuntimeError("AZURE_OPENAI_API_KEY environment variable is not set.")
     if not endpoint:
-        raise RuntimeError("AZURE_OPENAI_ENDPOINT environment variable is not set.")  
+        raise RuntimeError("AZURE_OPENAI_ENDPOINT environment variable is not set.")
     global _AZURE_CLIENT
     if _AZURE_CLIENT is None:
-        logger.debug("Creating Azure OpenAI client with endpoint=%s, api_version=%s, timeout=%s", 
+        logger.debug("Creating Azure OpenAI client with endpoint=%s, api_version=%s, timeout=%s",
                      endpoint, api_version, REQUEST_TIMEOUT)
         _AZURE_CLIENT = AzureOpenAI(
             api_key=api_key,
             azure_endpoint=endpoint,
             api_version=api_version,
             timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=get_http_client(),
         )
     return _AZURE_CLIENT
 
-#function to call chat completion on either hf or azure openai with retries
+#function to get or create an async hugging face client
+def get_async_hf_client() -> AsyncOpenAI:
+    api_key = os.environ.get("HF_TOKEN")
+    if not api_key:
+        raise RuntimeError("HF_TOKEN environment variable is not set.")
+    global _ASYNC_HF_CLIENT
+    if _ASYNC_HF_CLIENT is None:
+        logger.debug("Creating async HF OpenAI client with base_url=%s, timeout=%s", HF_BASE_URL, REQUEST_TIMEOUT)
+        _ASYNC_HF_CLIENT = AsyncOpenAI(
+            base_url=HF_BASE_URL,
+            api_key=api_key,
+            timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=get_async_http_client(),
+        )
+    return _ASYNC_HF_CLIENT
+
+#function to get or create an async azure openai client
+def get_async_azure_client() -> AsyncAzureOpenAI:
+    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
+    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
+    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+    if not api_key:
+        raise RuntimeError("AZURE_OPENAI_API_KEY environment variable is not set.")
+    if not endpoint:
+        raise RuntimeError("AZURE_OPENAI_ENDPOINT environment variable is not set.")
+    global _ASYNC_AZURE_CLIENT
+    if _ASYNC_AZURE_CLIENT is None:
+        logger.debug("Creating async Azure OpenAI client with endpoint=%s, api_version=%s, timeout=%s",
+                     endpoint, api_version, REQUEST_TIMEOUT)
+        _ASYNC_AZURE_CLIENT = AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=get_async_http_client(),
+        )
+    return _ASYNC_AZURE_CLIENT
+
+#function to close the pooled async HTTP client (call on application shutdown)
+async def close_async_clients() -> None:
+    global _ASYNC_HTTP_CLIENT, _ASYNC_HF_CLIENT, _ASYNC_AZURE_CLIENT
+    if _ASYNC_HTTP_CLIENT is not None:
+        await _ASYNC_HTTP_CLIENT.aclose()
+        logger.debug("Closed pooled async HTTP client")
+    _ASYNC_HTTP_CLIENT = None
+    _ASYNC_HF_CLIENT = None
+    _ASYNC_AZURE_CLIENT = None
+
+#function to decide whether a model is served by azure and resolve its deployment name
+def _resolve_deployment(model: str) -> Tuple[bool, str]:
+    use_azure = model.startswith("gpt-5") or "azure" in model.lower()
+    if use_azure:
+        return True, os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", model)
+    return False, model
+
+#function to extract the text content from a chat completion
+def _completion_text(completion: Any) -> str:
+    message = completion.choices[0].message
+    content = getattr(message, "content", "") or ""
+    if isinstance(content, list):
+        content = "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return content
+
+#function to build the persistent cache key for a call (None when the call is not deterministic or caching is off)
+def _response_cache_key(
+    model: str,
+    deployment_name: str,
+    use_azure: bool,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> Optional[str]:
+    #cassette runs bypass the response cache so every request is recorded and replayed
+    if temperature != 0 or get_cassette() is not None or get_llm_cache() is None:
+        return None
+    extra = {"response_format": response_format} if response_format else None
+    return make_cache_key(model, deployment_name, "azure" if use_azure else "hf", messages, temperature, extra)
+
+#function to return a cached response for a deterministic call, if any
+def _cached_response(
+    cache_key: Optional[str],
+    model: str,
+    max_tokens: Optional[int],
+    record_stats: bool = True,
+) -> Optional[str]:
+    if cache_key is None:
+        return None
+    cached = get_llm_cache().get(cache_key, max_tokens=max_tokens, record_stats=record_stats)
+    if cached is not None:
+        logger.info("LLM model=%s served %d chars from response cache", model, len(cached))
+    return cached
+
+#function to take the cross-worker lease on a cache miss, or wait for the worker holding it to cache the
+#response; returns (cached response or None, whether this call now holds the lease)
+def _claim_response(cache_key: Optional[str], model: str, max_tokens: Optional[int]) -> Tuple[Optional[str], bool]:
+    if cache_key is None:
+        return None, False
+    cache = get_llm_cache()
+    deadline = time.time() + LLM_CACHE_LEASE_SECONDS
+    while not cache.acquire_lease(cache_key):
+        if time.time() >= deadline:
+            logger.warning("LLM model=%s: gave up waiting for an identical in-flight call; calling the API", model)
+            return None, False
+        time.sleep(_LEASE_POLL_SECONDS)
+        cached = _leased_response(cache_key, model, max_tokens)
+        if cached is not None:
+            return cached, False
+    #the previous holder may have cached the response between our miss and taking the lease
+    cached = _cached_response(cache_key, model, max_tokens, record_stats=False)
+    if cached is not None:
+        cache.release_lease(cache_key)
+        return cached, False
+    return None, True
+
+#function to take the cross-worker lease on a cache miss without blocking the event loop while waiting
+async def _claim_response_async(
+    cache_key: Optional[str],
+    model: str,
+    max_tokens: Optional[int],
+) -> Tuple[Optional[str], bool]:
+    if cache_key is None:
+        return None, False
+    cache = get_llm_cache()
+    deadline = time.time() + LLM_CACHE_LEASE_SECONDS
+    while not await asyncio.to_thread(cache.acquire_lease, cache_key):
+        if time.time() >= deadline:
+            logger.warning("LLM model=%s: gave up waiting for an identical in-flight call; calling the API", model)
+            return None, False
+        await asyncio.sleep(_LEASE_POLL_SECONDS)
+        cached = await asyncio.to_thread(_leased_response, cache_key, model, max_tokens)
+        if cached is not None:
+            return cached, False
+    cached = await asyncio.to_thread(_cached_response, cache_key, model, max_tokens, record_stats=False)
+    if cached is not None:
+        await asyncio.to_thread(cache.release_lease, cache_key)
+        return cached, False
+    return None, True
+
+#function to read the response of a released lease (None while the lease is still held, or when the
+#holder got no cacheable answer and the caller has to take the lease itself)
+def _leased_response(cache_key: str, model: str, max_tokens: Optional[int]) -> Optional[str]:
+    if get_llm_cache().lease_held(cache_key):
+        return None
+    cached = _cached_response(cache_key, model, max_tokens, record_stats=False)
+    if cached is not None:
+        logger.info("LLM model=%s: shared the response of an identical call from another worker", model)
+    return cached
+
+#function to store a deterministic response in the persistent cache (only complete, non-truncated answers)
+def _store_cached_response(cache_key: Optional[str], model: str, completion: Any, content: str) -> None:
+    if cache_key is None or not content:
+        return
+    choice = completion.choices[0]
+    if getattr(choice, "finish_reason", None) != "stop":
+        return
+    usage = getattr(completion, "usage", None)
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    get_llm_cache().put(cache_key, model, content, completion_tokens)
+
+#function to build the chat completion arguments, adding response_format when the deployment accepts it
+def _completion_kwargs(
+    deployment_name: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: Optional[int],
+    response_format: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {
+        "model": deployment_name,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format and LLM_STRUCTURED_OUTPUT and deployment_name not in _RESPONSE_FORMAT_UNSUPPORTED:
+        kwargs["response_format"] = response_format
+    return kwargs
+
+#function to detect a request rejected because the deployment does not support response_format; the
+#deployment is remembered so later calls go straight to the plain-text path
+def _response_format_rejected(error: Exception, deployment_name: str, kwargs: Dict[str, Any]) -> bool:
+    if "response_format" not in kwargs or not isinstance(error, BadRequestError):
+        return False
+    message = str(error).lower()
+    if "response_format" not in message and "json_schema" not in message:
+        return False
+    logger.warning(
+        "Deployment %s rejected structured output (%s); falling back to plain JSON parsing",
+        deployment_name, error,
+    )
+    _RESPONSE_FORMAT_UNSUPPORTED.add(deployment_name)
+    kwargs.pop("response_format")
+    return True
+
+#function to estimate the tokens a request will consume (tokenized prompt plus completion budget)
+def _estimate_request_tokens(prompt_tokens: int, max_tokens: Optional[int]) -> int:
+    return prompt_tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+#function to record prompt, completion and reserved tokens of a finished call against its agent
+def _record_token_usage(
+    agent: Optional[str],
+    model: str,
+    prompt_tokens: int,
+    max_tokens: Optional[int],
+    content: str,
+    finish_reason: Optional[str],
+    usage: Any = None,
+) -> None:
+    reported_prompt = getattr(usage, "prompt_tokens", None) if usage is not None else None
+    reported_completion = getattr(usage, "completion_tokens", None) if usage is not None else None
+    get_token_usage(agent or model).record(
+        reported_prompt if reported_prompt is not None else prompt_tokens,
+        reported_completion if reported_completion is not None else count_tokens(content),
+        max_tokens,
+        truncated=finish_reason == "length",
+    )
+
+#function to read the total token usage reported for a completion
+def _usage_tokens(completion: Any) -> Optional[int]:
+    usage = getattr(completion, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+#function to classify an LLM error as retryable (returns None for errors that should be raised immediately)
+def _retry_reason(error: Exception) -> Optional[str]:
+    if isinstance(error, RateLimitError):
+        return "throttled"
+    if isinstance(error, (APITimeoutError, TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection error"
+    if isinstance(error, APIStatusError) and error.status_code >= 500:
+        return f"server error {error.status_code}"
+    return None
+
+#function to record a failed attempt and return the backoff delay (None when the error must be raised)
+def _retry_delay(
+    limiter: DeploymentRateLimiter,
+    error: Exception,
+    model: str,
+    attempt: int,
+    max_retries: int,
+) -> Optional[float]:
+    reason = _retry_reason(error)
+    if reason is None:
+        logger.error("LLM model=%s error: %s", model, str(error))
+        return None
+    retry_after = retry_after_seconds(error)
+    if reason == "throttled":
+        limiter.record_throttle(retry_after)
+    elif reason.startswith("server error"):
+        limiter.record_server_error()
+    if attempt >= max_retries:
+        logger.error("LLM model=%s %s after %d attempts: %s", model, reason, max_retries + 1, error)
+        return None
+    delay = backoff_delay(attempt, retry_after)
+    limiter.record_retry()
+    logger.warning(
+        "LLM model=%s %s on attempt %d/%d, retrying in %.1fs...",
+        model, reason, attempt + 1, max_retries + 1, delay,
+    )
+    return delay
+
+#function to send a completion request through the deployment rate limiter, retrying throttling and transient errors
+def _create_with_retries(
+    create: Callable[[], Any],
+    model: str,
+    deployment_name: str,
+    estimated_tokens: int,
+    max_retries: Optional[int],
+) -> Any:
+    limiter = get_rate_limiter(deployment_name)
+    retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        limiter.acquire(estimated_tokens)
+        try:
+            completion = create()
+        except Exception as e:
+            delay = _retry_delay(limiter, e, model, attempt, retries)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        limiter.record_usage(estimated_tokens, _usage_tokens(completion))
+        return completion
+
+#function to send an async completion request through the deployment rate limiter, retrying throttling and transient errors
+async def _create_with_retries_async(
+    create: Callable[[], Awaitable[Any]],
+    model: str,
+    deployment_name: str,
+    estimated_tokens: int,
+    max_retries: Optional[int],
+) -> Any:
+    limiter = get_rate_limiter(deployment_name)
+    retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        await limiter.acquire_async(estimated_tokens)
+        try:
+            completion = await create()
+        except Exception as e:
+            delay = _retry_delay(limiter, e, model, attempt, retries)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        limiter.record_usage(estimated_tokens, _usage_tokens(completion))
+        return completion
+
+#function to serialise a chat completion into a cassette response
+def _completion_payload(completion: Any) -> Dict[str, Any]:
+    usage = getattr(completion, "usage", None)
+    return {
+        "content": _completion_text(completion),
+        "finish_reason": getattr(completion.choices[0], "finish_reason", None),
+        "usage": {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+        } if usage is not None else None,
+    }
+
+#function to rebuild a completion-like object from a cassette response
+def _completion_from_payload(payload: Dict[str, Any]) -> Any:
+    usage = payload.get("usage")
+    return SimpleNamespace(
+        choices=[SimpleNamespace(
+            message=SimpleNamespace(content=payload.get("content", "")),
+            finish_reason=payload.get("finish_reason"),
+        )],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
+
+#function to build the cassette key of a chat or vision request
+def _chat_cassette_key(
+    kind: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    payload: Dict[str, Any] = {"messages": messages, "temperature": temperature}
+    if response_format:
+        payload["response_format"] = response_format
+    return cassette_key(kind, model, payload)
+
+#function to send a completion through the cassette (replay from disk, or call the API and record the result)
+def _completion_via_cassette(
+    kind: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]],
+    send: Callable[[], Any],
+) -> Any:
+    cassette = get_cassette()
+    if cassette is None:
+        return send()
+    key = _chat_cassette_key(kind, model, messages, temperature, response_format)
+    if cassette.replaying:
+        return _completion_from_payload(cassette.replay(key, kind, model))
+    start_time = time.time()
+    completion = send()
+    cassette.record(key, kind, model, _completion_payload(completion), time.time() - start_time)
+    return completion
+
+#function to send an async completion through the cassette (replay from disk, or call the API and record the result)
+async def _completion_via_cassette_async(
+    kind: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]],
+    send: Callable[[], Awaitable[Any]],
+) -> Any:
+    cassette = get_cassette()
+    if cassette is None:
+        return await send()
+    key = _chat_cassette_key(kind, model, messages, temperature, response_format)
+    if cassette.replaying:
+        return _completion_from_payload(await cassette.replay_async(key, kind, model))
+    start_time = time.time()
+    completion = await send()
+    cassette.record(key, kind, model, _completion_payload(completion), time.time() - start_time)
+    return completion
+
+#function to call chat completion on either hf or azure openai with rate limiting and retries
 def chat_completion(
     model: str,
     messages: List[Dict[str, Any]],
     temperature: float = 0.2,
     max_tokens: Optional[int] = None,
-    max_retries: int = 2,
+    max_retries: Optional[int] = None,
+    agent: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
 ) -> str:
     logger.info("Calling LLM model=%s temperature=%s max_tokens=%s", model, temperature, max_tokens)
-    use_azure = model.startswith("gpt-5") or "azure" in model.lower()
-    if use_azure:
-        client = get_azure_client()
-        deployment_name = os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", model)
-    else:
-        client = get_hf_client()
-        deployment_name = model
-    last_error = None
-    for attempt in range(max_retries + 1):
-        try:
-            start_time = time.time()
-            completion = client.chat.completions.create(
-                model=deployment_name,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            elapsed = time.time() - start_time
-            message = completion.choices[0].message
-            content = getattr(message, "content", "") or ""
-            if isinstance(content, list):
-                content = "".join(
-                    part.get("text", "") if isinstance(part, dict) else str(part)
-                    for part in content
+    use_azure, deployment_name = _resolve_deployment(model)
+    cache_key = _response_cache_key(model, deployment_name, use_azure, messages, temperature, response_format)
+    cached = _cached_response(cache_key, model, max_tokens)
+    if cached is not None:
+        return cached
+    #identical deterministic calls in other uvicorn workers wait for this one and share its cached response
+    cached, leased = _claim_response(cache_key, model, max_tokens)
+    if cached is not None:
+        return cached
+    try:
+        return _chat_completion_uncached(
+            model, messages, temperature, max_tokens, max_retries, agent, response_format,
+            use_azure, deployment_name, cache_key,
+        )
+    finally:
+        if leased:
+            get_llm_cache().release_lease(cache_key)
+
+#function to send a chat completion that missed the response cache and store a complete answer in it
+def _chat_completion_uncached(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: Optional[int],
+    max_retries: Optional[int],
+    agent: Optional[str],
+    response_format: Optional[Dict[str, Any]],
+    use_azure: bool,
+    deployment_name: str,
+    cache_key: Optional[str],
+) -> str:
+    prompt_tokens = count_message_tokens(messages)
+    start_time = time.time()
+
+    #function to send the request to the live endpoint (retrying without response_format if it is rejected)
+    def send() -> Any:
+        client = get_azure_client() if use_azure else get_hf_client()
+        kwargs = _completion_kwargs(deployment_name, messages, temperature, max_tokens, response_format)
+        while True:
+            try:
+                return _create_with_retries(
+                    lambda: client.chat.completions.create(**kwargs),
+                    model,
+                    deployment_name,
+                    _estimate_request_tokens(prompt_tokens, max_tokens),
+                    max_retries,
                 )
-            logger.info("LLM model=%s returned %d chars in %.2fs", model, len(content), elapsed)
-            return content
-        except (APITimeoutError, TimeoutError) as e:
-            last_error = e
-            if attempt < max_retries:
-                wait_time = 2 ** attempt
-                logger.warning(
-                    "LLM model=%s timeout on attempt %d/%d, retrying in %ds...",
-                    model, attempt + 1, max_retries + 1, wait_time
+            except BadRequestError as e:
+                if not _response_format_rejected(e, deployment_name, kwargs):
+                    raise
+
+    completion = _completion_via_cassette("chat", model, messages, temperature, response_format, send)
+    elapsed = time.time() - start_time
+    content = _completion_text(completion)
+    logger.info("LLM model=%s returned %d chars in %.2fs", model, len(content), elapsed)
+    _record_token_usage(
+        agent, model, prompt_tokens, max_tokens, content,
+        completion.choices[0].finish_reason, getattr(completion, "usage", None),
+    )
+    _store_cached_response(cache_key, model, completion, content)
+    return content
+
+#function to call chat completion asynchronously (non-blocking for the event loop) with rate limiting and retries
+async def chat_completion_async(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.2,
+    max_tokens: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    agent: Optional[str] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    logger.info("Calling LLM (async) model=%s temperature=%s max_tokens=%s", model, temperature, max_tokens)
+    use_azure, deployment_name = _resolve_deployment(model)
+    cache_key = _response_cache_key(model, deployment_name, use_azure, messages, temperature, response_format)
+    #sqlite cache and lease lookups can wait on the busy timeout, so they run off the event loop
+    cached = await asyncio.to_thread(_cached_response, cache_key, model, max_tokens)
+    if cached is not None:
+        return cached
+    cached, leased = await _claim_response_async(cache_key, model, max_tokens)
+    if cached is not None:
+        return cached
+    try:
+        return await _chat_completion_uncached_async(
+            model, messages, temperature, max_tokens, max_retries, agent, response_format,
+            use_azure, deployment_name, cache_key,
+        )
+    finally:
+        if leased:
+            await asyncio.to_thread(get_llm_cache().release_lease, cache_key)
+
+#function to send an async chat completion that missed the response cache and store a complete answer in it
+async def _chat_completion_uncached_async(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: Optional[int],
+    max_retries: Optional[int],
+    agent: Optional[str],
+    response_format: Optional[Dict[str, Any]],
+    use_azure: bool,
+    deployment_name: str,
+    cache_key: Optional[str],
+) -> str:
+    prompt_tokens = count_message_tokens(messages)
+    start_time = time.time()
+
+    #function to send the request to the live endpoint (retrying without response_format if it is rejected)
+    async def send() -> Any:
+        client = get_async_azure_client() if use_azure else get_async_hf_client()
+        kwargs = _completion_kwargs(deployment_name, messages, temperature, max_tokens, response_format)
+        while True:
+            try:
+                return await _create_with_retries_async(
+                    lambda: client.chat.completions.create(**kwargs),
+                    model,
+                    deployment_name,
+                    _estimate_request_tokens(prompt_tokens, max_tokens),
+                    max_retries,
                 )
-                time.sleep(wait_time)
-            else:
-                logger.error("LLM model=%s timeout after %d attempts", model, max_retries + 1)
-                raise
-        except Exception as e:
-            logger.error("LLM model=%s error: %s", model, str(e))
-            raise
-    if last_error:
-        raise last_error
-    raise RuntimeError(f"LLM model={model} failed after {max_retries + 1} attempts")
+            except BadRequestError as e:
+                if not _response_format_rejected(e, deployment_name, kwargs):
+                    raise
+
+    completion = await _completion_via_cassette_async("chat", model, messages, temperature, response_format, send)
+    elapsed = time.time() - start_time
+    content = _completion_text(completion)
+    logger.info("LLM model=%s returned %d chars in %.2fs (async)", model, len(content), elapsed)
+    _record_token_usage(
+        agent, model, prompt_tokens, max_tokens, content,
+        completion.choices[0].finish_reason, getattr(completion, "usage", None),
+    )
+    await asyncio.to_thread(_store_cached_response, cache_key, model, completion, content)
+    return content
+
+#function to stream chat completion text deltas asynchronously (closing the generator stops generation server-side)
+async def chat_completion_stream(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.2,
+    max_tokens: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    agent: Optional[str] = None,
+) -> AsyncIterator[str]:
+    logger.info("Streaming LLM model=%s temperature=%s max_tokens=%s", model, temperature, max_tokens)
+    use_azure, deployment_name = _resolve_deployment(model)
+    cache_key = _response_cache_key(model, deployment_name, use_azure, messages, temperature)
+    cached = await asyncio.to_thread(_cached_response, cache_key, model, max_tokens)
+    if cached is not None:
+        yield cached
+        return
+    prompt_tokens = count_message_tokens(messages)
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        #streams have their own cassette entries (a recorded stream may have been stopped early, which a
+        #non-streamed call must never replay); the recorded text is replayed in small deltas
+        payload = await cassette.replay_async(
+            _chat_cassette_key("chat_stream", model, messages, temperature), "chat_stream", model
+        )
+        content = payload.get("content", "")
+        for i in range(0, len(content), _REPLAY_DELTA_CHARS):
+            yield content[i:i + _REPLAY_DELTA_CHARS]
+        _record_token_usage(agent, model, prompt_tokens, max_tokens, content, payload.get("finish_reason"))
+        return
+    client = get_async_azure_client() if use_azure else get_async_hf_client()
+    start_time = time.time()
+    #retries only cover opening the stream; once deltas have been yielded a failure is raised to the caller
+    stream = await _create_with_retries_async(
+        lambda: client.chat.completions.create(
+            model=deployment_name,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        ),
+        model,
+        deployment_name,
+        _estimate_request_tokens(prompt_tokens, max_tokens),
+        max_retries,
+    )
+    parts: List[str] = []
+    finish_reason = None
+    first_delta_at = None
+    failed = False
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+            delta = getattr(choice.delta, "content", None) if choice.delta is not None else None
+            if delta:
+                if first_delta_at is None:
+                    first_delta_at = time.time()
+                    logger.info("LLM model=%s first token after %.2fs (stream)", model, first_delta_at - start_time)
+                parts.append(delta)
+                yield delta
+    except Exception:
+        failed = True
+        raise
+    finally:
+        await stream.close()
+        content = "".join(parts)
+        if cassette is not None and not failed:
+            #an early stop is recorded too, so a replay sees the same text and stops at the same point
+            cassette.record(
+                _chat_cassette_key("chat_stream", model, messages, temperature),
+                "chat_stream",
+                model,
+                {"content": content, "finish_reason": finish_reason, "usage": None},
+                time.time() - start_time,
+            )
+        #a caller that stops early closes the generator here, so usage is recorded in this block too
+        if not failed:
+            logger.info(
+                "LLM model=%s streamed %d chars in %.2fs (finish_reason=%s)",
+                model, len(content), time.time() - start_time, finish_reason,
+            )
+            _record_token_usage(agent, model, prompt_tokens, max_tokens, content, finish_reason)
+    if cache_key is not None and finish_reason == "stop" and content:
+        await asyncio.to_thread(get_llm_cache().put, cache_key, model, content)
 
 #function to call chat completion on vision models
 def chat_completion_with_vision(
@@ -114,23 +760,58 @@ def chat_completion_with_vision(
     messages: List[Dict[str, Any]],
     temperature: float = 0.2,
     max_tokens: Optional[int] = None,
+    agent: Optional[str] = None,
 ) -> str:
     logger.info("Calling vision LLM model=%s temperature=%s", model, temperature)
-    client = get_hf_client()
-    completion = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
-    message = completion.choices[0].message
-    content = getattr(message, "content", "") or ""
-    if isinstance(content, list):
-        content = "".join(
-            part.get("text", "") if isinstance(part, dict) else str(part)
-            for part in content
+    prompt_tokens = count_message_tokens(messages)
+
+    #function to send the request to the live endpoint
+    def send() -> Any:
+        client = get_hf_client()
+        return _create_with_retries(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            ),
+            model,
+            model,
+            _estimate_request_tokens(prompt_tokens, max_tokens),
+            None,
         )
+
+    completion = _completion_via_cassette("vision", model, messages, temperature, None, send)
+    content = _completion_text(completion)
     logger.debug("Vision LLM model=%s returned %d chars", model, len(content))
+    _record_token_usage(
+        agent, model, prompt_tokens, max_tokens, content,
+        completion.choices[0].finish_reason, getattr(completion, "usage", None),
+    )
     return content
 
-
+#function to create embeddings through the cassette (replay from disk, or call the API with rate limiting and retries and record the vectors)
+def create_embeddings(
+    get_client: Callable[[], Any],
+    model: str,
+    texts: Union[str, List[str]],
+    max_retries: Optional[int] = None,
+) -> List[List[float]]:
+    cassette = get_cassette()
+    key = cassette_key("embedding", model, {"input": texts}) if cassette is not None else None
+    if cassette is not None and cassette.replaying:
+        return decode_embeddings(cassette.replay(key, "embedding", model))
+    start_time = time.time()
+    inputs = [texts] if isinstance(texts, str) else texts
+    #embedding requests share the deployment's rpm/tpm budget and retry throttling like chat calls
+    response = _create_with_retries(
+        lambda: get_client().embeddings.create(model=model, input=texts),
+        model,
+        model,
+        sum(count_tokens(text) for text in inputs),
+        max_retries,
+    )
+    embeddings = [list(d.embedding) for d in response.data]
+    if cassette is not None:
+        cassette.record(key, "embedding", model, encode_embeddings(embeddings), time.time() - start_time)
+    return embeddings
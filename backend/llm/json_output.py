@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DECODER = json.JSONDecoder()
+_CLOSERS = {"{": "}", "[": "]"}
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+#function to wrap a JSON schema into a chat completion response_format
+def json_schema_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    #strict mode would force every property to be required; the agents normalise missing fields themselves
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": False},
+    }
+
+
+#function to find where the JSON value starts (skipping code fences and leading prose)
+def _json_start(text: str, expect: Optional[str]) -> int:
+    if expect == "object":
+        return text.find("{")
+    if expect == "array":
+        return text.find("[")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return min(starts) if starts else -1
+
+
+#function to tell whether a character is a control character the model should never emit
+def _is_junk_control(ch: str) -> bool:
+    code = ord(ch)
+    return code < 0x20 or 0x7F <= code <= 0x9F
+
+
+#function to drop a trailing comma (and whitespace) from the output buffer
+def _strip_trailing_comma(out: List[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i] in " \n\r\t":
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+
+#function to repair LLM JSON in one pass: escapes raw newlines in strings, drops junk control characters
+#and trailing commas, ignores text after the top-level value and closes a truncated value
+def repair_json(text: str, start: int = 0) -> Tuple[str, bool]:
+    out: List[str] = []
+    stack: List[str] = []
+    #(buffer length, open containers) after the last complete element, used to cut off a dangling one
+    safe_point: Optional[Tuple[int, List[str]]] = None
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch in _STRING_ESCAPES:
+                out.append(_STRING_ESCAPES[ch])
+            elif not _is_junk_control(ch):
+                out.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            out.append(ch)
+            safe_point = (len(out), list(stack))
+        elif ch in "}]":
+            if not stack:
+                break
+            _strip_trailing_comma(out)
+            out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                return "".join(out), False
+        elif ch == ",":
+            safe_point = (len(out), list(stack))
+            out.append(ch)
+        elif not _is_junk_control(ch) or ch in " \n\r\t":
+            out.append(ch)
+
+    #the value was cut off: first try to keep everything written so far, else drop the dangling element
+    closed = list(out)
+    if in_string:
+        if escape:
+            closed.pop()
+        closed.append('"')
+    _strip_trailing_comma(closed)
+    candidate = "".join(closed) + "".join(_CLOSERS[c] for c in reversed(stack))
+    try:
+        json.loads(candidate)
+        return candidate, True
+    except json.JSONDecodeError:
+        pass
+    if safe_point is None:
+        return candidate, True
+    length, open_stack = safe_point
+    trimmed = out[:length]
+    _strip_trailing_comma(trimmed)
+    return "".join(trimmed) + "".join(_CLOSERS[c] for c in reversed(open_stack)), True
+
+
+#function to parse JSON produced by an LLM: a fast strict decode first, then a single tolerant repair pass
+def parse_json_output(raw: str, expect: Optional[str] = None, label: str = "LLM") -> Any:
+    text = raw or ""
+    start = _json_start(text, expect)
+    if start < 0:
+        raise json.JSONDecodeError(f"{label} output contains no JSON {expect or 'value'}", text, 0)
+    try:
+        value, _ = _DECODER.raw_decode(text, start)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    repaired, truncated = repair_json(text, start)
+    try:
+        value = json.loads(repaired)
+    except json.JSONDecodeError as e:
+        logger.error("%s: JSON could not be repaired at position %s: %s", label, e.pos, e.msg)
+        logger.debug("%s: unparseable JSON (first 2000 chars): %s", label, repaired[:2000])
+        raise
+    if truncated:
+        logger.warning("%s: output was truncated (%d chars); recovered the complete part", label, len(text))
+    else:
+        logger.info("%s: repaired malformed JSON output (%d chars)", label, len(text))
+    return value
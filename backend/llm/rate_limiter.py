@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+#default limits applied to every deployment without a specific override (0 = unlimited)
+LLM_RPM_LIMIT = int(os.environ.get("LLM_RPM_LIMIT", "0"))
+LLM_TPM_LIMIT = int(os.environ.get("LLM_TPM_LIMIT", "0"))
+
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "60.0"))
+
+#token estimate used for the completion part when the caller does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+#function to turn a deployment name into an env-var suffix (gpt-5-chat -> GPT_5_CHAT)
+def _env_suffix(deployment: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", deployment).strip("_").upper()
+
+
+#function to read the rpm/tpm limits for a deployment (LLM_RPM_LIMIT_<DEPLOYMENT> overrides LLM_RPM_LIMIT)
+def _limits_for(deployment: str) -> tuple[int, int]:
+    suffix = _env_suffix(deployment)
+    rpm = int(os.environ.get(f"LLM_RPM_LIMIT_{suffix}", LLM_RPM_LIMIT))
+    tpm = int(os.environ.get(f"LLM_TPM_LIMIT_{suffix}", LLM_TPM_LIMIT))
+    return rpm, tpm
+
+
+class DeploymentRateLimiter:
+
+    #function to initialise token buckets for one deployment
+    def __init__(self, deployment: str, rpm_limit: int, tpm_limit: int):
+        self.deployment = deployment
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self._lock = threading.Lock()
+        self._request_budget = float(rpm_limit)
+        self._token_budget = float(tpm_limit)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._stats = {
+            "requests": 0,
+            "queued": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "wait_seconds": 0.0,
+            "throttled": 0,
+            "server_errors": 0,
+            "retries": 0,
+        }
+
+    #function to refill both buckets for the elapsed time (caller holds the lock)
+    def _refill_locked(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.rpm_limit > 0:
+            self._request_budget = min(float(self.rpm_limit), self._request_budget + elapsed * self.rpm_limit / 60.0)
+        if self.tpm_limit > 0:
+            self._token_budget = min(float(self.tpm_limit), self._token_budget + elapsed * self.tpm_limit / 60.0)
+
+    #function to reserve capacity for one request and return how long the caller must wait before sending it
+    def _reserve(self, estimated_tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self._stats["requests"] += 1
+            wait = max(0.0, self._blocked_until - now)
+            #budgets may go negative: later callers then wait for the debt to refill, which queues them in order
+            if self.rpm_limit > 0:
+                self._request_budget -= 1
+                if self._request_budget < 0:
+                    wait = max(wait, -self._request_budget * 60.0 / self.rpm_limit)
+            if self.tpm_limit > 0:
+                tokens = min(estimated_tokens, self.tpm_limit)
+                self._token_budget -= tokens
+                if self._token_budget < 0:
+                    wait = max(wait, -self._token_budget * 60.0 / self.tpm_limit)
+            if wait > 0:
+                self._stats["queued"] += 1
+                self._stats["queue_depth"] += 1
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queue_depth"])
+                self._stats["wait_seconds"] += wait
+            return wait
+
+    #function to mark a queued caller as released
+    def _release_wait(self) -> None:
+        with self._lock:
+            self._stats["queue_depth"] -= 1
+
+    #function to block the calling thread until the deployment has capacity
+    def acquire(self, estimated_tokens: int) -> None:
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            logger.info("Rate limiter: deployment=%s queueing request for %.2fs", self.deployment, wait)
+            try:
+                time.sleep(wait)
+            finally:
+                self._release_wait()
+
+    #function to wait on the event loop until the deployment has capacity
+    async def acquire_async(self, estimated_tokens: int) -> None:
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            logger.info("Rate limiter: deployment=%s queueing request for %.2fs", self.deployment, wait)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._release_wait()
+
+    #function to correct the token budget once the real usage is known
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        if self.tpm_limit <= 0 or actual_tokens is None:
+            return
+        with self._lock:
+            self._token_budget += min(estimated_tokens, self.tpm_limit) - actual_tokens
+
+    #function to record a 429 and pause every caller of this deployment for retry_after seconds
+    def record_throttle(self, retry_after: Optional[float]) -> None:
+        with self._lock:
+            self._stats["throttled"] += 1
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    #function to record a retryable server error
+    def record_server_error(self) -> None:
+        with self._lock:
+            self._stats["server_errors"] += 1
+
+    #function to record a retry attempt
+    def record_retry(self) -> None:
+        with self._lock:
+            self._stats["retries"] += 1
+
+    #function to report limiter state and counters
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            return {
+                "rpm_limit": self.rpm_limit,
+                "tpm_limit": self.tpm_limit,
+                "request_budget": round(self._request_budget, 2) if self.rpm_limit > 0 else None,
+                "token_budget": int(self._token_budget) if self.tpm_limit > 0 else None,
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - now), 2),
+                **{k: (round(v, 2) if isinstance(v, float) else v) for k, v in self._stats.items()},
+            }
+
+
+_LIMITERS: Dict[str, DeploymentRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+#function to get the process-wide rate limiter for a deployment
+def get_rate_limiter(deployment: str) -> DeploymentRateLimiter:
+    limiter = _LIMITERS.get(deployment)
+    if limiter is None:
+        with _LIMITERS_LOCK:
+            limiter = _LIMITERS.get(deployment)
+            if limiter is None:
+                rpm, tpm = _limits_for(deployment)
+                logger.info("Rate limiter for deployment=%s (rpm=%s, tpm=%s)", deployment, rpm or "unlimited", tpm or "unlimited")
+                limiter = DeploymentRateLimiter(deployment, rpm, tpm)
+                _LIMITERS[deployment] = limiter
+    return limiter
+
+
+#function to report rate limiter statistics for all deployments seen so far
+def rate_limiter_stats() -> Dict[str, Any]:
+    return {name: limiter.stats() for name, limiter in list(_LIMITERS.items())}
+
+
+#function to read the server-requested retry delay from an API error's headers
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+#function to compute a jittered exponential backoff delay, never shorter than the server's Retry-After
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    ceiling = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))
+    delay = random.uniform(ceiling / 2, ceiling)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
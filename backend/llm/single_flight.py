@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+#function to build a stable request fingerprint from string parts
+def fingerprint(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class _InFlightCall:
+    __slots__ = ("event", "result", "error")
+
+    #function to initialise the shared state of one in-flight sync call
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+
+    #function to initialise a named single-flight group
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._async_calls: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    #function to run fn once per key across concurrent threads; other callers wait and share the result
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            logger.info("Single-flight %s: waiting on in-flight call (key=%s)", self.name, key[:16])
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    #function to await coro_fn once per key on the running loop; other callers await the same future
+    async def do_async(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._async_calls.get(key)
+            leader = future is None or future.get_loop() is not loop
+            if leader:
+                future = loop.create_future()
+                self._async_calls[key] = future
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            logger.info("Single-flight %s: awaiting in-flight call (key=%s)", self.name, key[:16])
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                #the leader was cancelled (not this caller): run the call ourselves instead
+                if future.cancelled():
+                    return await self.do_async(key, coro_fn)
+                raise
+
+        try:
+            result = await coro_fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+            #mark the exception as retrieved so an unobserved future does not log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._async_calls.get(key) is future:
+                    del self._async_calls[key]
+
+    #function to report counters and the number of calls currently in flight
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "in_flight": len(self._calls) + len(self._async_calls),
+            }
+
+
+_GROUPS: Dict[str, SingleFlight] = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+#function to get (or create) the process-wide single-flight group with the given name; groups coalesce calls
+#within one worker process only (deterministic LLM calls are also coalesced across workers by cache leases)
+def get_single_flight(name: str) -> SingleFlight:
+    group = _GROUPS.get(name)
+    if group is None:
+        with _GROUPS_LOCK:
+            group = _GROUPS.setdefault(name, SingleFlight(name))
+    return group
+
+
+#function to report counters for every single-flight group
+def single_flight_stats() -> Dict[str, Any]:
+    return {name: group.stats() for name, group in list(_GROUPS.items())}
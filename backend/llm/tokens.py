@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+#encoding used to count prompt tokens (o200k_base matches the gpt-4o / gpt-5 family)
+LLM_TOKENIZER_ENCODING = os.environ.get("LLM_TOKENIZER_ENCODING", "o200k_base")
+
+#context window shared by prompt and completion for the deployed chat models
+LLM_CONTEXT_WINDOW = int(os.environ.get("LLM_CONTEXT_WINDOW", "32769"))
+#tokens kept free between prompt and completion so a slightly off count never overflows the window
+LLM_CONTEXT_SAFETY_MARGIN = int(os.environ.get("LLM_CONTEXT_SAFETY_MARGIN", "1000"))
+
+#how many recent completions per agent drive the max_tokens plan
+LLM_TOKEN_HISTORY = int(os.environ.get("LLM_TOKEN_HISTORY", "50"))
+#completions an agent must have finished before its observed output is trusted over the default budget
+LLM_TOKEN_MIN_SAMPLES = int(os.environ.get("LLM_TOKEN_MIN_SAMPLES", "5"))
+#headroom applied on top of the largest recent completion
+LLM_TOKEN_HEADROOM = float(os.environ.get("LLM_TOKEN_HEADROOM", "1.25"))
+
+#chat format overhead per message and for the assistant reply priming (OpenAI cookbook values)
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_REPLY = 3
+#rough cost of one high-detail image part in a vision request
+_TOKENS_PER_IMAGE = 765
+
+_ENCODER = None
+_ENCODER_LOCK = threading.Lock()
+_ENCODER_FAILED = False
+
+
+#function to get the shared tiktoken encoder (None when tiktoken is not installed or the encoding cannot load)
+def _get_encoder():
+    global _ENCODER, _ENCODER_FAILED
+    if not TIKTOKEN_AVAILABLE or _ENCODER_FAILED:
+        return None
+    if _ENCODER is None:
+        with _ENCODER_LOCK:
+            if _ENCODER is None:
+                try:
+                    _ENCODER = tiktoken.get_encoding(LLM_TOKENIZER_ENCODING)
+                except Exception as e:
+                    logger.warning(
+                        "Tokenizer %s unavailable (%s); falling back to a chars/4 estimate",
+                        LLM_TOKENIZER_ENCODING, e,
+                    )
+                    _ENCODER_FAILED = True
+                    return None
+    return _ENCODER
+
+
+#function to count the tokens of a text (chars/4 estimate when no tokenizer is available)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is None:
+        return len(text) // 4
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+#function to count the prompt tokens of a list of chat messages, including the chat format overhead
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    total = _TOKENS_PER_REPLY
+    for message in messages:
+        total += _TOKENS_PER_MESSAGE
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "image_url":
+                    total += _TOKENS_PER_IMAGE
+                else:
+                    total += count_tokens(part.get("text", ""))
+    return total
+
+
+class AgentTokenUsage:
+
+    #function to initialise usage counters for one agent
+    def __init__(self, agent: str, history: int = LLM_TOKEN_HISTORY):
+        self.agent = agent
+        self._lock = threading.Lock()
+        #recent (completion_tokens, truncated) pairs
+        self._recent: Deque[Tuple[int, bool]] = deque(maxlen=history)
+        self._stats = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "reserved_tokens": 0,
+            "truncated": 0,
+            "max_completion_tokens": 0,
+        }
+
+    #function to record the tokens of one finished call
+    def record(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        reserved_tokens: Optional[int],
+        truncated: bool = False,
+    ) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += completion_tokens
+            self._stats["reserved_tokens"] += reserved_tokens or 0
+            self._stats["max_completion_tokens"] = max(self._stats["max_completion_tokens"], completion_tokens)
+            if truncated:
+                self._stats["truncated"] += 1
+            self._recent.append((completion_tokens, truncated))
+
+    #function to suggest a completion budget from recent output (None while there is too little history)
+    def observed_budget(self) -> Optional[int]:
+        with self._lock:
+            if len(self._recent) < LLM_TOKEN_MIN_SAMPLES:
+                return None
+            #a recent truncation means the observed sizes understate what the agent needs
+            if any(truncated for _, truncated in self._recent):
+                return None
+            largest = max(tokens for tokens, _ in self._recent)
+        return int(largest * LLM_TOKEN_HEADROOM) + 1
+
+    #function to report usage counters, averages and how much of the reserved budget was used
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._stats["calls"]
+            reserved = self._stats["reserved_tokens"]
+            return {
+                **self._stats,
+                "avg_prompt_tokens": round(self._stats["prompt_tokens"] / calls, 1) if calls else 0.0,
+                "avg_completion_tokens": round(self._stats["completion_tokens"] / calls, 1) if calls else 0.0,
+                "reserved_utilization": round(self._stats["completion_tokens"] / reserved, 3) if reserved else None,
+            }
+
+
+_USAGE: Dict[str, AgentTokenUsage] = {}
+_USAGE_LOCK = threading.Lock()
+
+
+#function to get the process-wide token usage tracker for an agent
+def get_token_usage(agent: str) -> AgentTokenUsage:
+    usage = _USAGE.get(agent)
+    if usage is None:
+        with _USAGE_LOCK:
+            usage = _USAGE.setdefault(agent, AgentTokenUsage(agent))
+    return usage
+
+
+#function to size max_tokens for a call from its real prompt size and the agent's observed output;
+#default is the budget used while the agent has too little history (the ceiling unless given)
+def plan_max_tokens(
+    agent: str,
+    prompt_tokens: int,
+    ceiling: int,
+    floor: int = 0,
+    context_window: int = LLM_CONTEXT_WINDOW,
+    default: Optional[int] = None,
+) -> int:
+    available = context_window - prompt_tokens - LLM_CONTEXT_SAFETY_MARGIN
+    target = ceiling if default is None else min(ceiling, default)
+    observed = get_token_usage(agent).observed_budget()
+    if observed is not None:
+        target = min(ceiling, observed)
+    #the remaining context always wins, since the API rejects a request that cannot fit the window
+    max_tokens = min(max(floor, target), available)
+    if available < floor:
+        logger.warning(
+            "Token plan agent=%s: only %d tokens left in the context window after a %d-token prompt "
+            "(floor %d); capping max_tokens at %d",
+            agent, available, prompt_tokens, floor, max_tokens,
+        )
+    logger.info(
+        "Token plan agent=%s: prompt=%d, observed=%s, ceiling=%d, available=%d -> max_tokens=%d",
+        agent, prompt_tokens, observed, ceiling, available, max_tokens,
+    )
+    return max_tokens
+
+
+#function to report per-agent token usage and the tokenizer in use
+def token_usage_stats() -> Dict[str, Any]:
+    return {
+        "tokenizer": LLM_TOKENIZER_ENCODING if _get_encoder() is not None else "chars/4 estimate",
+        "agents": {name: usage.stats() for name, usage in list(_USAGE.items())},
+    }
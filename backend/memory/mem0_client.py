@@ -402,24 +402,20 @@ def _cosine_similarity(a: List[float], b: List[float]) -> float:
 
 #function to compute an embedding for text using HF or Azure clients
 def _get_embedding(text: str) -> List[float]:
-    from backend.llm.client import get_hf_client, get_azure_client
+    from backend.llm.client import create_embeddings, get_hf_client, get_azure_client
 
     if not text:
         return []
 
     try:
         if os.environ.get("HF_TOKEN"):
-            client = get_hf_client()
             logger.debug("Mem0 embedding: using HF client, model=%s", EMBEDDING_MODEL)
-            resp = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
-            emb = resp.data[0].embedding
+            emb = create_embeddings(get_hf_client, EMBEDDING_MODEL, text)[0]
             logger.debug("Mem0 embedding: HF response length=%d", len(emb) if emb else 0)
             return list(emb)
         elif os.environ.get("AZURE_OPENAI_API_KEY"):
-            client = get_azure_client()
             logger.debug("Mem0 embedding: using Azure client, model=%s", EMBEDDING_MODEL)
-            resp = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
-            emb = resp.data[0].embedding
+            emb = create_embeddings(get_azure_client, EMBEDDING_MODEL, text)[0]
             logger.debug("Mem0 embedding: Azure response length=%d", len(emb) if emb else 0)
             return list(emb)
     except Exception as e:
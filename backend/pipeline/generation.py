@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.agents.build_query import build_query_for_single_requirement
+from backend.agents.quality_agent import assess_response_quality_async
+from backend.agents.response_agent import run_response_agent_async
+from backend.models import ExtractionResult, RequirementsResult
+
+logger = logging.getLogger(__name__)
+
+#number of requirements generated concurrently (each uses up to three LLM calls: clarity, response, quality)
+GENERATION_CONCURRENCY = int(os.environ.get("GENERATION_CONCURRENCY", "6"))
+
+#async callback receiving progress events (start/delta/result) when responses are streamed
+EventSink = Callable[[Dict[str, Any]], Awaitable[None]]
+
+#function to extract key phrase from requirement text
+def _extract_key_phrase(source_text: str, max_words: int = 10) -> str:
+    words = source_text.split()
+    return " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+
+#function to create an error response dict for a failed requirement
+def _create_error_response(
+    requirement_id: str,
+    requirement_text: str,
+    key_phrase: str,
+    error: Exception,
+) -> Dict[str, Any]:
+    return {
+        "requirement_id": requirement_id,
+        "requirement_text": requirement_text,
+        "key_phrase": key_phrase,
+        "response": f"[ERROR: Failed to generate response for this requirement: {str(error)}]",
+        "notes": f"Error: {str(error)}",
+        "quality": {
+            "score": 0.0,
+            "completeness": "incomplete",
+            "relevance": "low",
+            "issues": [f"Generation failed: {str(error)}"],
+            "suggestions": ["Fix the error and regenerate"],
+        },
+    }
+
+#function to log progress for requirement processing
+def _log_requirement_progress(
+    idx: int,
+    total: int,
+    successful: int,
+    failed: int,
+    requirement_id: str,
+) -> None:
+    logger.info(
+        "[%d/%d] Progress: %d successful, %d failed, %d remaining",
+        idx,
+        total,
+        successful,
+        failed,
+        total - idx,
+    )
+
+#function to process a single requirement and generate response
+async def _process_single_requirement(
+    solution_req: Any,
+    idx: int,
+    total_requirements: int,
+    extraction_result: ExtractionResult,
+    requirements_result: RequirementsResult,
+    knowledge_base: Any,
+    qa_context: str,
+    event_sink: Optional[EventSink] = None,
+) -> Dict[str, Any]:
+    req_start_time = time.time()
+    key_phrase = _extract_key_phrase(solution_req.source_text)
+    
+    logger.info(
+        "[%d/%d] Processing requirement: %s",
+        idx,
+        total_requirements,
+        solution_req.id,
+    )
+    logger.debug(
+        "[%d/%d] Requirement text: %s",
+        idx,
+        total_requirements,
+        solution_req.source_text[:100] + "..."
+        if len(solution_req.source_text) > 100
+        else solution_req.source_text,
+    )
+    
+    try:
+        build_query_obj = build_query_for_single_requirement(
+            extraction_result=extraction_result,
+            single_requirement=solution_req,
+            all_response_structure_requirements=requirements_result.response_structure_requirements,
+        )
+        build_query_obj.confirmed = True
+        
+        on_delta = None
+        if event_sink is not None:
+            await event_sink({"event": "start", "index": idx, "requirement_id": solution_req.id, "key_phrase": key_phrase})
+            
+            #function to forward a streamed text delta for this requirement
+            async def _forward_delta(text: str) -> None:
+                await event_sink({"event": "delta", "index": idx, "requirement_id": solution_req.id, "text": text})
+            
+            on_delta = _forward_delta
+        
+        result = await run_response_agent_async(
+            build_query=build_query_obj,
+            knowledge_base=knowledge_base,
+            qa_context=qa_context,
+            on_delta=on_delta,
+        )
+        
+        quality_assessment = await assess_response_quality_async(solution_req, result.response_text)
+        req_elapsed = time.time() - req_start_time
+        
+        response_dict = {
+            "requirement_id": solution_req.id,
+            "requirement_text": solution_req.source_text,
+            "key_phrase": key_phrase,
+            "response": result.response_text,
+            "notes": result.notes,
+            "quality": quality_assessment,
+        }
+        
+        logger.info(
+            "[%d/%d] ✓ SUCCESS: Generated response for requirement %s (length=%d chars, time=%.2fs)",
+            idx,
+            total_requirements,
+            solution_req.id,
+            len(result.response_text),
+            req_elapsed,
+        )
+        
+        return {"response": response_dict, "success": True, "elapsed": req_elapsed}
+        
+    except Exception as req_exc:
+        req_elapsed = time.time() - req_start_time
+        logger.error(
+            "[%d/%d] ✗ FAILED: Requirement %s failed after %.2fs: %s",
+            idx,
+            total_requirements,
+            solution_req.id,
+            req_elapsed,
+            req_exc,
+        )
+        logger.exception(
+            "[%d/%d] Full error traceback for requirement %s:",
+            idx,
+            total_requirements,
+            solution_req.id,
+        )
+        
+        error_response = _create_error_response(
+            requirement_id=solution_req.id,
+            requirement_text=solution_req.source_text,
+            key_phrase=key_phrase,
+            error=req_exc,
+        )
+        
+        return {"response": error_response, "success": False, "elapsed": req_elapsed}
+
+#function to generate responses for all solution requirements with bounded concurrency, preserving requirement order
+async def generate_requirement_responses(
+    extraction_result: ExtractionResult,
+    requirements_result: RequirementsResult,
+    knowledge_base: Any,
+    qa_context: str,
+    max_concurrency: Optional[int] = None,
+    event_sink: Optional[EventSink] = None,
+) -> List[Dict[str, Any]]:
+    solution_requirements = requirements_result.solution_requirements
+    total_requirements = len(solution_requirements)
+    concurrency = max(1, min(max_concurrency or GENERATION_CONCURRENCY, total_requirements or 1))
+    semaphore = asyncio.Semaphore(concurrency)
+    progress = {"completed": 0, "successful": 0, "failed": 0}
+    
+    logger.info(
+        "Generation engine: %d requirement(s) across %d concurrent slot(s)",
+        total_requirements,
+        concurrency,
+    )
+    
+    #function to run one requirement inside a concurrency slot and record progress
+    async def _run_slot(idx: int, solution_req: Any) -> Dict[str, Any]:
+        async with semaphore:
+            result = await _process_single_requirement(
+                solution_req=solution_req,
+                idx=idx,
+                total_requirements=total_requirements,
+                extraction_result=extraction_result,
+                requirements_result=requirements_result,
+                knowledge_base=knowledge_base,
+                qa_context=qa_context,
+                event_sink=event_sink,
+            )
+        
+        progress["completed"] += 1
+        if result["success"]:
+            progress["successful"] += 1
+        else:
+            progress["failed"] += 1
+        _log_requirement_progress(
+            idx=progress["completed"],
+            total=total_requirements,
+            successful=progress["successful"],
+            failed=progress["failed"],
+            requirement_id=solution_req.id,
+        )
+        if event_sink is not None:
+            await event_sink({
+                "event": "result",
+                "index": idx,
+                "requirement_id": solution_req.id,
+                "success": result["success"],
+                "response": result["response"],
+            })
+        return result
+    
+    return await asyncio.gather(*[
+        _run_slot(idx, solution_req)
+        for idx, solution_req in enumerate(solution_requirements, 1)
+    ])
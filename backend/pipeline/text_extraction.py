@@ -122,6 +122,7 @@ def _extract_text_from_images(images: List[Image.Image]) -> str:
             messages=messages,
             temperature=0.0,
             max_tokens=None,
+            agent="text_extraction",
         )
 
         all_text_parts.append(page_text)
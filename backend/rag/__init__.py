@@ -1,4 +1,17 @@
-from backend.rag.rag_system import RAGSystem
-
-__all__ = ["RAGSystem"]
+from backend.rag.rag_system import (
+    RAGSystem,
+    create_shared_rag_system,
+    get_shared_rag_system,
+    rag_readiness,
+    shutdown_shared_rag_system,
+    warm_shared_rag_system,
+)
 
+__all__ = [
+    "RAGSystem",
+    "create_shared_rag_system",
+    "get_shared_rag_system",
+    "rag_readiness",
+    "shutdown_shared_rag_system",
+    "warm_shared_rag_system",
+]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from typing import Any, Dict, List, Optional
+
+from backend.rag.rag_system import RAG_BUILD_CHECKPOINT_SECONDS, create_shared_rag_system
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+
+#function to format a duration in seconds as h:mm:ss
+def _format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--:--"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+#function to print one progress line per indexed build batch
+def _print_progress(report: Dict[str, Any]) -> None:
+    print(
+        f"[batch {report['batch']}] {report['fraction'] * 100:5.1f}% | "
+        f"{report['documents']}/{report['total_documents']} docs | {report['chunks']} chunks | "
+        f"elapsed {_format_duration(report['elapsed'])} | ETA {_format_duration(report['eta'])}",
+        flush=True,
+    )
+
+
+#function to rebuild and publish the index as a maintenance job, resuming an interrupted build
+def _build(args: argparse.Namespace) -> int:
+    rag_system = create_shared_rag_system(
+        docs_folder=args.docs_folder,
+        index_path=args.index_path,
+        use_azure_blob=not args.no_azure,
+    )
+    print(
+        f"Building RAG index {rag_system.index_path} from {rag_system.docs_folder} "
+        f"(checkpoint every {RAG_BUILD_CHECKPOINT_SECONDS:.0f}s{', starting over' if args.fresh else ''})",
+        flush=True,
+    )
+    try:
+        built = rag_system.rebuild_index(resume=not args.fresh, progress=_print_progress)
+    except ValueError as e:
+        print(f"Build failed: {e}", file=sys.stderr)
+        return 1
+    except (Exception, KeyboardInterrupt) as e:
+        logging.getLogger(__name__).debug("Build interrupted", exc_info=True)
+        print(
+            f"Build interrupted ({type(e).__name__}: {e}); run the command again to resume from the last checkpoint",
+            file=sys.stderr,
+        )
+        return 1
+    if not built:
+        print("Another process is building this index; run again once it has finished", file=sys.stderr)
+        return 2
+
+    stats = rag_system.get_stats()
+    print(
+        f"Published index version {stats.get('index_version')}: {stats.get('num_documents')} docs, "
+        f"{stats.get('num_vectors')} vectors ({stats.get('index_type')})",
+        flush=True,
+    )
+    return 0
+
+
+#function to parse the command line and run the requested maintenance command
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.rag", description="RAG index maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser(
+        "build",
+        help="rebuild the index offline with checkpoints, resuming an interrupted build",
+    )
+    build.add_argument("--docs-folder", help="documents to index (default: the project's docs folder)")
+    build.add_argument("--index-path", help="index files to write (default: the project's rag_index)")
+    build.add_argument("--fresh", action="store_true", help="discard any checkpoint and build from scratch")
+    build.add_argument("--no-azure", action="store_true", help="do not upload the finished index to Azure Blob Storage")
+    build.add_argument("-v", "--verbose", action="store_true", help="log every document and batch")
+    build.set_defaults(handler=_build)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format=LOG_FORMAT)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
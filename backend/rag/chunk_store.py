@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    vector_id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    total_chunks INTEGER NOT NULL,
+    chunk_text TEXT NOT NULL
+);
+"""
+
+#BM25 full-text index over chunk_text, kept in sync with the chunks table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE chunks_fts USING fts5(
+    chunk_text, content='chunks', content_rowid='vector_id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER chunks_fts_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, chunk_text) VALUES (new.vector_id, new.chunk_text);
+END;
+CREATE TRIGGER chunks_fts_delete AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, chunk_text) VALUES ('delete', old.vector_id, old.chunk_text);
+END;
+"""
+
+_COLUMNS = ("file_path", "file_name", "chunk_index", "total_chunks", "chunk_text")
+
+#ids per lookup statement, to stay under sqlite's bound-parameter limit
+_LOOKUP_BATCH = 500
+#longer queries are cut to this many distinct terms for the lexical search
+_MAX_QUERY_TERMS = 64
+#id ranges per filtered lexical statement (two bound parameters each)
+_RANGES_PER_QUERY = 200
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+#function to check whether this sqlite build ships the FTS5 full-text extension
+def _fts5_available() -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+FTS5_AVAILABLE = _fts5_available()
+if not FTS5_AVAILABLE:
+    logger.warning("sqlite3 was built without FTS5; lexical RAG retrieval is disabled")
+
+
+#function to turn free text into an FTS5 query matching any of its terms (terms are quoted so
+#words like AND/NEAR and punctuation are never read as query syntax)
+def _match_expression(query: str) -> str:
+    terms = list(dict.fromkeys(term.lower() for term in _TERM_PATTERN.findall(query)))[:_MAX_QUERY_TERMS]
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class ChunkStore:
+
+    #function to open (or create) a chunk metadata store; path None keeps it in memory, building=True marks
+    #a private file that publish() may rename (published files are copied so their readers are unaffected)
+    def __init__(self, path: Optional[str] = None, building: bool = False):
+        self.path = path
+        self.building = building
+        self._lock = threading.Lock()
+        self.lexical_available = False
+        self._conn = self._connect()
+
+    #function to open the sqlite connection
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is not None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path or ":memory:", timeout=30.0, check_same_thread=False)
+        #rollback journal (not WAL) so a finished store file can be swapped in with a single rename
+        conn.execute("PRAGMA synchronous=NORMAL")
+        #replaced rows must fire the delete trigger so the full-text index drops their old text
+        conn.execute("PRAGMA recursive_triggers=ON")
+        conn.executescript(_SCHEMA)
+        self.lexical_available = FTS5_AVAILABLE and self._ensure_fts(conn)
+        return conn
+
+    #function to create the full-text index if missing, filling it from stores written before it existed
+    def _ensure_fts(self, conn: sqlite3.Connection) -> bool:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone():
+            return True
+        try:
+            conn.executescript("BEGIN;" + _FTS_SCHEMA + "INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild'); COMMIT;")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.warning("Could not create the full-text index of chunk store %s: %s", self.path, e)
+            return False
+        return True
+
+    #function to insert (or replace) chunk metadata keyed by vector id
+    def put_many(self, chunks: Dict[int, Dict[str, Any]]) -> None:
+        rows = [(vector_id, *(chunk[column] for column in _COLUMNS)) for vector_id, chunk in chunks.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO chunks (vector_id, {', '.join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    #function to delete the chunks of a vector id range [first_id, end_id)
+    def delete_range(self, first_id: int, end_id: int) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM chunks WHERE vector_id >= ? AND vector_id < ?", (first_id, end_id))
+            return max(cur.rowcount, 0)
+
+    #function to fetch chunk metadata for the given vector ids (unknown ids are left out)
+    def get_many(self, vector_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        ids = [int(vector_id) for vector_id in vector_ids if vector_id >= 0]
+        found: Dict[int, Dict[str, Any]] = {}
+        with self._lock:
+            for start in range(0, len(ids), _LOOKUP_BATCH):
+                batch = ids[start:start + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT vector_id, {', '.join(_COLUMNS)} FROM chunks "
+                    f"WHERE vector_id IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = dict(zip(_COLUMNS, row[1:]))
+        return found
+
+    #function to rank chunks against a query with BM25, returning (vector_id, score) best first; id_ranges
+    #([first_id, end_id) pairs) restricts the search to those vector ids
+    def search_lexical(
+        self,
+        query: str,
+        k: int,
+        id_ranges: Optional[List[Tuple[int, int]]] = None,
+    ) -> List[Tuple[int, float]]:
+        expression = _match_expression(query)
+        if not expression or not self.lexical_available or k <= 0 or id_ranges == []:
+            return []
+        groups: List[Optional[List[Tuple[int, int]]]] = [None]
+        if id_ranges is not None:
+            groups = [
+                id_ranges[start:start + _RANGES_PER_QUERY] for start in range(0, len(id_ranges), _RANGES_PER_QUERY)
+            ]
+        rows: List[Tuple[int, float]] = []
+        with self._lock:
+            for group in groups:
+                condition = ""
+                bounds: List[int] = []
+                if group is not None:
+                    condition = " AND (" + " OR ".join("(rowid >= ? AND rowid < ?)" for _ in group) + ")"
+                    bounds = [bound for id_range in group for bound in id_range]
+                rows.extend(self._conn.execute(
+                    f"SELECT rowid, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ?{condition} "
+                    "ORDER BY bm25(chunks_fts) LIMIT ?",
+                    (expression, *bounds, k),
+                ).fetchall())
+        #bm25 statistics cover the whole table, so scores from separate range groups compare directly
+        rows = sorted(rows, key=lambda row: row[1])[:k]
+        #sqlite's bm25() is negative with lower meaning better; flip it so higher scores rank first
+        return [(vector_id, -score) for vector_id, score in rows]
+
+    #function to iterate (vector_id, chunk_text) for every stored chunk in id order
+    def iter_texts(self) -> Iterator[Tuple[int, str]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT vector_id, chunk_text FROM chunks ORDER BY vector_id").fetchall()
+        return iter(rows)
+
+    #function to list every stored vector id in order
+    def vector_ids(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT vector_id FROM chunks ORDER BY vector_id")]
+
+    #function to count distinct documents
+    def count_files(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT file_name) FROM chunks").fetchone()[0]
+
+    #function to count stored chunks
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    #function to copy this store into a new private (building) store at path, or in memory when path is None
+    def copy(self, path: Optional[str] = None) -> "ChunkStore":
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+        target = ChunkStore(path, building=True)
+        with self._lock, target._lock:
+            self._conn.backup(target._conn)
+        return target
+
+    #function to publish this store at path and keep working on the published file: a building store is
+    #renamed into place, any other store is copied there so processes reading its current file are unaffected
+    def publish(self, path: str) -> None:
+        if self.path == path:
+            return
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self.building and self.path is not None:
+                self._conn.close()
+                os.replace(self.path, path)
+            else:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                target = sqlite3.connect(tmp_path)
+                try:
+                    self._conn.backup(target)
+                finally:
+                    target.close()
+                self._conn.close()
+                os.replace(tmp_path, path)
+            self.path = path
+            self.building = False
+            self._conn = self._connect()
+        logger.debug("Chunk store published at %s", path)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import watchfiles
+    WATCHFILES_AVAILABLE = True
+except ImportError:
+    WATCHFILES_AVAILABLE = False
+
+#document types the RAG index reads
+DOC_EXTENSIONS = (".pdf", ".docx", ".doc", ".txt")
+
+RAG_DOCS_WATCH = os.environ.get("RAG_DOCS_WATCH", "true").lower() in ("1", "true", "yes")
+#quiet period after the last change before a reindex is scheduled
+RAG_WATCH_DEBOUNCE_SECONDS = float(os.environ.get("RAG_WATCH_DEBOUNCE_SECONDS", "5"))
+#rescan interval when file system events are unavailable (watchfiles not installed or watching failed)
+RAG_WATCH_POLL_INTERVAL = float(os.environ.get("RAG_WATCH_POLL_INTERVAL", "30"))
+
+
+#function to stat one document into its manifest entry (None when it is not an indexable document)
+def _manifest_entry(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.name.endswith(DOC_EXTENSIONS):
+        return None
+    try:
+        file_stat = path.stat()
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return {"size": file_stat.st_size, "mtime": file_stat.st_mtime}
+
+
+#function to build the docs manifest ({relative path: {"size", "mtime"}}) in one directory walk
+def scan_docs_manifest(docs_folder: Path) -> Dict[str, Dict[str, Any]]:
+    manifest: Dict[str, Dict[str, Any]] = {}
+    for dir_path, _, file_names in os.walk(docs_folder):
+        for file_name in file_names:
+            if not file_name.endswith(DOC_EXTENSIONS):
+                continue
+            file_path = Path(dir_path) / file_name
+            entry = _manifest_entry(file_path)
+            if entry is not None:
+                manifest[str(file_path.relative_to(docs_folder))] = entry
+    return manifest
+
+
+class DocsWatcher:
+
+    #function to initialise a watcher that keeps the docs manifest in memory and calls on_change once
+    #changes have settled for debounce_seconds
+    def __init__(
+        self,
+        docs_folder: Path,
+        on_change: Callable[[], None],
+        debounce_seconds: float = RAG_WATCH_DEBOUNCE_SECONDS,
+        poll_interval: float = RAG_WATCH_POLL_INTERVAL,
+    ):
+        #absolute, since watch events report absolute paths
+        self.docs_folder = Path(docs_folder).resolve()
+        self.on_change = on_change
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.mode = "stopped"
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._timer: Optional[threading.Timer] = None
+        self._stats = {"events": 0, "rescans": 0, "notifications": 0}
+
+    #function to scan the folder once and start watching it in a daemon thread
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._rescan()
+        self.mode = "events" if WATCHFILES_AVAILABLE else "polling"
+        self._thread = threading.Thread(target=self._run, name="rag-docs-watcher", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Docs watcher started on %s (%s, debounce=%.1fs, %d docs)",
+            self.docs_folder, self.mode, self.debounce_seconds, len(self._manifest),
+        )
+
+    #function to stop watching and cancel a pending notification
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.mode = "stopped"
+
+    #function to report whether the in-memory manifest is being kept current
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    #function to get a copy of the current docs manifest
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {rel_path: dict(entry) for rel_path, entry in self._manifest.items()}
+
+    #function to watch for file system events, falling back to polling if watching fails
+    def _run(self) -> None:
+        if WATCHFILES_AVAILABLE:
+            try:
+                self._watch_events()
+                return
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                logger.warning("Docs watcher: file system events failed (%s); falling back to polling", e)
+                self.mode = "polling"
+        self._poll()
+
+    #function to apply inotify/FSEvents batches reported by watchfiles
+    def _watch_events(self) -> None:
+        for changes in watchfiles.watch(self.docs_folder, stop_event=self._stop, recursive=True, raise_interrupt=False):
+            self._stats["events"] += len(changes)
+            if self._apply_changes(path for _, path in changes):
+                self._schedule_notification()
+
+    #function to rescan the folder every poll_interval seconds
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            if self._rescan():
+                self._schedule_notification()
+
+    #function to update the manifest for changed paths; returns True when an indexed document changed
+    def _apply_changes(self, paths: Iterable[str]) -> bool:
+        changed = False
+        for raw_path in set(paths):
+            path = Path(raw_path)
+            try:
+                rel_path = str(path.relative_to(self.docs_folder))
+            except ValueError:
+                continue
+            if path.is_dir():
+                #a directory moved in or out carries files no single-file event reports
+                changed = self._rescan() or changed
+                continue
+            entry = _manifest_entry(path)
+            with self._lock:
+                if entry is None:
+                    #deleted, or a directory that was removed: drop everything below it as well
+                    prefix = rel_path + os.sep
+                    stale = [p for p in self._manifest if p == rel_path or p.startswith(prefix)]
+                    for stale_path in stale:
+                        del self._manifest[stale_path]
+                    changed = changed or bool(stale)
+                elif self._manifest.get(rel_path) != entry:
+                    self._manifest[rel_path] = entry
+                    changed = True
+        return changed
+
+    #function to rebuild the manifest from a full walk; returns True when it changed
+    def _rescan(self) -> bool:
+        manifest = scan_docs_manifest(self.docs_folder) if self.docs_folder.exists() else {}
+        self._stats["rescans"] += 1
+        with self._lock:
+            changed = manifest != self._manifest
+            self._manifest = manifest
+        return changed
+
+    #function to (re)start the debounce timer so a burst of changes triggers one notification
+    def _schedule_notification(self) -> None:
+        with self._lock:
+            if self._stop.is_set():
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_seconds, self._notify)
+            self._timer.daemon = True
+            self._timer.start()
+
+    #function to call on_change once the debounce period has passed
+    def _notify(self) -> None:
+        with self._lock:
+            self._timer = None
+        self._stats["notifications"] += 1
+        logger.info("Docs watcher: documents changed in %s, scheduling reindex", self.docs_folder)
+        try:
+            self.on_change()
+        except Exception as e:
+            logger.warning("Docs watcher: change callback failed: %s", e)
+
+    #function to report watcher mode and counters
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode if self.running else "stopped",
+                "dir": str(self.docs_folder),
+                "docs": len(self._manifest),
+                "pending": self._timer is not None,
+                **self._stats,
+            }
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+RAG_EMBEDDING_STORE_ENABLED = os.environ.get("RAG_EMBEDDING_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+RAG_EMBEDDING_STORE_DIR = os.environ.get("RAG_EMBEDDING_STORE_DIR") or str(_PROJECT_ROOT / "rag_embeddings")
+
+#file layout: 16-byte header (magic, dimension, reserved) followed by fixed-size records of
+#a 32-byte sha256 key and the float32 vector, so the file can be memory-mapped as one array
+_MAGIC = b"RAGEMB01"
+_HEADER = struct.Struct("<8sII")
+_KEY_BYTES = 32
+
+
+#function to build the store key of a chunk embedding (model and exact chunk text)
+def embedding_key(model: str, text: str) -> bytes:
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+class _EmbeddingFile:
+
+    #function to open the append-only embedding file of one model (created on the first write)
+    def __init__(self, path: Path):
+        self.path = path
+        self.dimension: Optional[int] = None
+        self._rows: Optional[np.memmap] = None
+        self._positions: Dict[bytes, int] = {}
+        self._refresh()
+
+    #function to get the numpy record type of one stored embedding
+    def _record_dtype(self) -> np.dtype:
+        return np.dtype([("key", f"V{_KEY_BYTES}"), ("vector", "<f4", (self.dimension,))])
+
+    #function to map records appended since the last refresh (possibly by another worker process)
+    def _refresh(self) -> None:
+        if not self.path.exists() or self.path.stat().st_size < _HEADER.size:
+            return
+        with open(self.path, "rb") as f:
+            magic, dimension, _ = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            logger.warning("Ignoring embedding store %s: unrecognised file header", self.path)
+            return
+        self.dimension = dimension
+        record_size = self._record_dtype().itemsize
+        #a record cut short by a crash mid-write is ignored and overwritten by the next append
+        count = (self.path.stat().st_size - _HEADER.size) // record_size
+        known = len(self)
+        if count <= known:
+            return
+        self._rows = np.memmap(self.path, dtype=self._record_dtype(), mode="r", offset=_HEADER.size, shape=(count,))
+        keys = self._rows["key"]
+        for position in range(known, count):
+            self._positions.setdefault(keys[position].tobytes(), position)
+
+    #function to look up stored vectors by key (None for keys that were never stored)
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        if self._rows is None:
+            return [None] * len(keys)
+        vectors = self._rows["vector"]
+        return [
+            np.array(vectors[self._positions[key]], dtype=np.float32) if key in self._positions else None
+            for key in keys
+        ]
+
+    #function to append new vectors (one write under an exclusive file lock shared with other workers)
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> int:
+        if self.dimension is not None and vectors.shape[1] != self.dimension:
+            logger.warning(
+                "Embedding store %s holds %d-dim vectors; not storing %d-dim vectors",
+                self.path, self.dimension, vectors.shape[1],
+            )
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a+b") as f:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                fresh = list({key: vector for key, vector in zip(keys, vectors) if key not in self._positions}.items())
+                if not fresh:
+                    return 0
+                if self.dimension is None:
+                    self.dimension = int(vectors.shape[1])
+                    f.truncate(0)
+                    f.write(_HEADER.pack(_MAGIC, self.dimension, 0))
+                record_dtype = self._record_dtype()
+                records = np.empty(len(fresh), dtype=record_dtype)
+                records["key"] = [np.void(key) for key, _ in fresh]
+                records["vector"] = np.stack([vector for _, vector in fresh]).astype(np.float32)
+                f.truncate(_HEADER.size + len(self) * record_dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(records.tobytes())
+                f.flush()
+                self._refresh()
+                return len(fresh)
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    #function to count the vectors currently mapped
+    def __len__(self) -> int:
+        return 0 if self._rows is None else len(self._rows)
+
+
+class EmbeddingStore:
+
+    #function to initialise a persistent chunk-embedding store with one file per embedding model
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._files: Dict[str, _EmbeddingFile] = {}
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    #function to get the file of one model
+    def _file(self, model: str) -> _EmbeddingFile:
+        embedding_file = self._files.get(model)
+        if embedding_file is None:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+            embedding_file = self._files[model] = _EmbeddingFile(self.directory / f"{safe_name}.bin")
+        return embedding_file
+
+    #function to look up stored embeddings for texts (None for each text never embedded with this model)
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [embedding_key(model, text) for text in texts]
+        with self._lock:
+            try:
+                vectors = self._file(model).get_many(keys)
+            except (OSError, ValueError) as e:
+                logger.warning("Embedding store lookup failed for %s: %s", model, e)
+                self._stats["errors"] += 1
+                return [None] * len(texts)
+            hits = sum(1 for vector in vectors if vector is not None)
+            self._stats["hits"] += hits
+            self._stats["misses"] += len(texts) - hits
+        return vectors
+
+    #function to persist embeddings of texts for a model (already stored texts are skipped)
+    def put_many(self, model: str, texts: List[str], embeddings: np.ndarray) -> None:
+        if not texts:
+            return
+        keys = [embedding_key(model, text) for text in texts]
+        with self._lock:
+            try:
+                stored = self._file(model).put_many(keys, embeddings)
+            except (OSError, ValueError) as e:
+                logger.warning("Embedding store write failed for %s: %s", model, e)
+                self._stats["errors"] += 1
+                return
+            self._stats["stores"] += stored
+        logger.debug("Embedding store: stored %d new vector(s) for %s", stored, model)
+
+    #function to report hit/miss counters and stored vectors per model
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "dir": str(self.directory),
+                "vectors": {model: len(embedding_file) for model, embedding_file in self._files.items()},
+            }
+
+
+_STORE: Optional[EmbeddingStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+#function to get the process-wide chunk-embedding store (None when disabled)
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    global _STORE
+    if not RAG_EMBEDDING_STORE_ENABLED:
+        return None
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = EmbeddingStore(RAG_EMBEDDING_STORE_DIR)
+    return _STORE
+
+
+#function to report embedding store statistics for monitoring endpoints
+def embedding_store_stats() -> Dict[str, Any]:
+    store = get_embedding_store()
+    if store is None:
+        return {"enabled": False}
+    return {"enabled": True, **store.stats()}
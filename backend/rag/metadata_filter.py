@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+from pathlib import PurePath
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#fields a search can be restricted by: exact file name, folder or path prefix relative to the docs folder,
+#and file extension (document type)
+FILTER_FIELDS = ("file_name", "path_prefix", "extension")
+
+_NO_IDS = np.empty(0, dtype=np.int64)
+
+
+#function to normalise a relative path or path prefix to forward slashes without leading ./ or slashes
+def _normalise_path(path: str) -> str:
+    posix = path.replace("\\", "/").strip()
+    while posix.startswith("./"):
+        posix = posix[2:]
+    return posix.strip("/")
+
+
+#function to split sorted vector ids into half-open [first_id, end_id) runs of consecutive ids
+def id_ranges(ids: np.ndarray) -> List[Tuple[int, int]]:
+    if not len(ids):
+        return []
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(ids)]))
+    return [(int(ids[start]), int(ids[end - 1]) + 1) for start, end in zip(starts, ends)]
+
+
+class MetadataFilterIndex:
+
+    #function to precompute the sorted vector ids of every file name, extension and folder from the
+    #per-file vector id ranges of an index
+    def __init__(self, file_ranges: Dict[str, Dict[str, int]]):
+        self._file_ids: Dict[str, np.ndarray] = {}
+        groups: Dict[str, Dict[str, List[str]]] = {field: {} for field in FILTER_FIELDS}
+        for rel_path, vector_range in file_ranges.items():
+            posix_path = _normalise_path(rel_path)
+            first_id, count = vector_range["first_id"], vector_range["count"]
+            self._file_ids[posix_path] = np.arange(first_id, first_id + count, dtype=np.int64)
+            path = PurePath(posix_path)
+            groups["file_name"].setdefault(path.name, []).append(posix_path)
+            groups["extension"].setdefault(path.suffix.lower(), []).append(posix_path)
+            for parent in path.parents:
+                groups["path_prefix"].setdefault(_normalise_path(parent.as_posix()), []).append(posix_path)
+        self._ids: Dict[str, Dict[str, np.ndarray]] = {
+            field: {value: self._union(paths) for value, paths in values.items()}
+            for field, values in groups.items()
+        }
+
+    #function to merge the ids of several files into one sorted array
+    def _union(self, paths: List[str]) -> np.ndarray:
+        arrays = [self._file_ids[path] for path in paths]
+        return np.unique(np.concatenate(arrays)) if arrays else _NO_IDS
+
+    #function to get the ids matching one value of a field (unknown values match nothing)
+    def _lookup(self, field: str, value: str) -> np.ndarray:
+        if field == "file_name":
+            return self._ids[field].get(value, _NO_IDS)
+        if field == "extension":
+            extension = value.lower() if value.startswith(".") else f".{value.lower()}"
+            return self._ids[field].get(extension, _NO_IDS)
+
+        prefix = _normalise_path(value)
+        if prefix in self._ids["path_prefix"]:
+            return self._ids["path_prefix"][prefix]
+        if prefix in self._file_ids:
+            return self._file_ids[prefix]
+        #not a folder or file: a plain string prefix such as "proposals/2023_" over the relative paths
+        return self._union([path for path in self._file_ids if path.startswith(prefix)])
+
+    #function to get the sorted vector ids matching every filter; a list of values for one field matches
+    #any of them, e.g. {"path_prefix": "clients/acme", "extension": [".pdf", ".docx"]}
+    def select(self, filters: Dict[str, Any]) -> np.ndarray:
+        selected: Optional[np.ndarray] = None
+        for field, value in filters.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown search filter: {field} (supported: {', '.join(FILTER_FIELDS)})")
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            matched = [self._lookup(field, str(item)) for item in values]
+            ids = np.unique(np.concatenate(matched)) if matched else _NO_IDS
+            selected = ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+        if selected is None:
+            return np.unique(np.concatenate(list(self._file_ids.values()))) if self._file_ids else _NO_IDS
+        return selected
+
+    #function to report how many distinct values each field has
+    def stats(self) -> Dict[str, int]:
+        return {field: len(values) for field, values in self._ids.items()}
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#least recently used query embeddings beyond this many are evicted (0 = unbounded)
+RAG_QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("RAG_QUERY_CACHE_MAX_ENTRIES", "20000"))
+
+#eviction is checked every N stored embeddings rather than on every write
+_EVICTION_INTERVAL = 100
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_embeddings (
+    model TEXT NOT NULL,
+    key TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (model, key)
+);
+CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_access ON query_embeddings(last_access);
+"""
+
+
+class QueryEmbeddingCache:
+
+    #function to open (or create) the sqlite query-embedding cache
+    def __init__(self, path: str, max_entries: int = RAG_QUERY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stores_since_eviction = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        #WAL lets several uvicorn workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info("Query embedding cache opened at %s (max_entries=%d)", path, max_entries)
+
+    #function to look up embeddings by query hash (missing keys are left out of the result)
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        found: Dict[str, np.ndarray] = {}
+        try:
+            with self._lock:
+                #batched to stay under sqlite's bound-parameter limit
+                for start in range(0, len(keys), _LOOKUP_BATCH):
+                    batch = keys[start:start + _LOOKUP_BATCH]
+                    rows = self._conn.execute(
+                        "SELECT key, dimension, vector FROM query_embeddings "
+                        f"WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                        (model, *batch),
+                    ).fetchall()
+                    for key, dimension, vector in rows:
+                        found[key] = np.frombuffer(vector, dtype=np.float16, count=dimension).astype(np.float32)
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE query_embeddings SET last_access = ? WHERE model = ? AND key = ?",
+                        [(now, model, key) for key in found],
+                    )
+                self._stats["hits"] += len(found)
+                self._stats["misses"] += len(set(keys)) - len(found)
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("Query embedding cache read failed: %s", e)
+            return {}
+        return found
+
+    #function to store embeddings as float16 and periodically evict least recently used entries
+    def put_many(self, model: str, embeddings: Dict[str, np.ndarray]) -> None:
+        if not embeddings:
+            return
+        now = time.time()
+        rows = [
+            (model, key, int(vector.shape[0]), np.asarray(vector, dtype=np.float16).tobytes(), now, now)
+            for key, vector in embeddings.items()
+        ]
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO query_embeddings (model, key, dimension, vector, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._stats["stores"] += len(rows)
+                self._stores_since_eviction += len(rows)
+                if self._stores_since_eviction >= _EVICTION_INTERVAL:
+                    self._stores_since_eviction = 0
+                    self._evict_locked()
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning("Query embedding cache write failed: %s", e)
+
+    #function to drop least recently used entries beyond max_entries
+    def _evict_locked(self) -> None:
+        if self.max_entries <= 0:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM query_embeddings WHERE rowid IN "
+                "(SELECT rowid FROM query_embeddings ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+            self._stats["evictions"] += excess
+            logger.info("Query embedding cache evicted %d least recently used entries", excess)
+
+    #function to count cached embeddings
+    def __len__(self) -> int:
+        with self._lock:
+            try:
+                return self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    #function to report hit/miss counters and current size
+    def stats(self) -> Dict[str, Any]:
+        entries = len(self)
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hit_rate": (self._stats["hits"] / lookups) if lookups else 0.0,
+                **self._stats,
+            }
@@ -4,18 +4,34 @@ from __future__ import annotations
 import hashlib
 import io
 import logging
+import multiprocessing
 import os
+import shutil
+import sqlite3
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
 import pickle
 
 import faiss
 import numpy as np
 from dotenv import load_dotenv
+from openai import BadRequestError
 
-from backend.llm.client import get_azure_client, REQUEST_TIMEOUT
+from backend.llm.client import create_embeddings, get_azure_client, REQUEST_TIMEOUT
+from backend.llm.single_flight import fingerprint, get_single_flight
+from backend.llm.tokens import count_tokens
 from backend.pipeline.text_extraction import extract_text_from_file
+from backend.rag.chunk_store import ChunkStore
+from backend.rag.docs_watcher import DocsWatcher, RAG_DOCS_WATCH, scan_docs_manifest
+from backend.rag.embedding_store import get_embedding_store
+from backend.rag.metadata_filter import MetadataFilterIndex, id_ranges
+from backend.rag.query_cache import QueryEmbeddingCache
 
 logger = logging.getLogger(__name__)
 
@@ -26,14 +42,143 @@ except ImportError:
     AZURE_BLOB_AVAILABLE = False
     logger.warning("Azure Blob Storage not available. Install azure-storage-blob to enable.")
 
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
 load_dotenv()
 
 EMBEDDING_MODEL = "text-embedding-3-large"
-EMBEDDING_DIMENSION = 3072
+#native output size of the embedding model; shorter vectors are its leading components, re-normalised
+NATIVE_EMBEDDING_DIMENSION = 3072
+#dimension stored in the index and query cache (text-embedding-3 keeps most quality at 256/512/1024)
+EMBEDDING_DIMENSION = int(os.environ.get("RAG_EMBEDDING_DIMENSION", str(NATIVE_EMBEDDING_DIMENSION)))
+#scalar quantization of vectors in flat/HNSW indexes: none (float32), fp16 (2x smaller) or int8 (4x smaller)
+RAG_VECTOR_QUANTIZATION = os.environ.get("RAG_VECTOR_QUANTIZATION", "none").strip().lower()
 
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+#upper bounds for one embeddings request (the API caps inputs per request and total tokens per request)
+RAG_EMBEDDING_BATCH_TOKENS = int(os.environ.get("RAG_EMBEDDING_BATCH_TOKENS", "64000"))
+RAG_EMBEDDING_BATCH_ITEMS = int(os.environ.get("RAG_EMBEDDING_BATCH_ITEMS", "256"))
+#embedding batches in flight at once (the deployment rate limiter still applies to each)
+RAG_EMBEDDING_CONCURRENCY = int(os.environ.get("RAG_EMBEDDING_CONCURRENCY", "4"))
+#chunks embedded and added to the index per build step, bounded by estimated tokens (0 = as many as fill
+#RAG_EMBEDDING_CONCURRENCY full embedding requests); build memory grows with this, not with the corpus
+RAG_BUILD_BATCH_TOKENS = (
+    int(os.environ.get("RAG_BUILD_BATCH_TOKENS", "0")) or RAG_EMBEDDING_BATCH_TOKENS * max(RAG_EMBEDDING_CONCURRENCY, 1)
+)
+_BUILD_BATCH_ITEMS = RAG_EMBEDDING_BATCH_ITEMS * max(RAG_EMBEDDING_CONCURRENCY, 1)
+#processes extracting PDF/Word text in parallel while building (0 = one per CPU, 1 = in this process)
+RAG_EXTRACT_WORKERS = int(os.environ.get("RAG_EXTRACT_WORKERS", "0"))
+
+#index type: flat (exact), hnsw (graph, fast and exact-ish, no deletes) or ivfpq (clustered and compressed)
+RAG_INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", "flat").strip().lower()
+RAG_HNSW_M = int(os.environ.get("RAG_HNSW_M", "32"))
+RAG_HNSW_EF_CONSTRUCTION = int(os.environ.get("RAG_HNSW_EF_CONSTRUCTION", "80"))
+RAG_HNSW_EF_SEARCH = int(os.environ.get("RAG_HNSW_EF_SEARCH", "64"))
+#IVF lists (0 = about 4*sqrt(vectors)) and how many of them each search visits
+RAG_IVF_NLIST = int(os.environ.get("RAG_IVF_NLIST", "0"))
+RAG_IVF_NPROBE = int(os.environ.get("RAG_IVF_NPROBE", "16"))
+#PQ sub-quantizers (must divide the dimension; 64 x 8 bits = 64 bytes per 3072-dim vector) and bits per code
+RAG_PQ_M = int(os.environ.get("RAG_PQ_M", "64"))
+RAG_PQ_NBITS = int(os.environ.get("RAG_PQ_NBITS", "8"))
+#vectors buffered to train IVF-PQ (and int8 quantizers) before the rest of the corpus is streamed in;
+#an automatic nlist is sized from this sample
+RAG_INDEX_TRAIN_VECTORS = int(os.environ.get("RAG_INDEX_TRAIN_VECTORS", "10000"))
+#sample queries for the recall-vs-flat check run after building an approximate index (0 = skip)
+RAG_RECALL_CHECK_QUERIES = int(os.environ.get("RAG_RECALL_CHECK_QUERIES", "100"))
+RAG_RECALL_CHECK_K = int(os.environ.get("RAG_RECALL_CHECK_K", "10"))
+
+_INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+_RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+_QUANTIZERS = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+#k-means wants ~39 points per list and PQ needs at least one training point per code
+_IVFPQ_MIN_VECTORS = max(2 ** RAG_PQ_NBITS, 39)
+
+#vector (embeddings + FAISS), lexical (BM25 over the chunk store, no API call) or hybrid (both, rank-fused)
+RAG_RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "vector").strip().lower()
+#candidates taken from each retriever before hybrid fusion, and the reciprocal rank fusion constant
+RAG_HYBRID_CANDIDATES = int(os.environ.get("RAG_HYBRID_CANDIDATES", "20"))
+RAG_HYBRID_RRF_K = int(os.environ.get("RAG_HYBRID_RRF_K", "60"))
+#filtered HNSW/IVF searches raise efSearch/nprobe by how selective the filter is, up to this factor
+RAG_FILTER_SEARCH_BOOST = float(os.environ.get("RAG_FILTER_SEARCH_BOOST", "16"))
+
+#load saved indexes memory-mapped and read-only so uvicorn workers on one host share a single page-cache copy
+RAG_INDEX_MMAP = os.environ.get("RAG_INDEX_MMAP", "true").lower() in ("1", "true", "yes")
+#IO_FLAG_MMAP maps only IVF inverted lists; flat, scalar-quantized and HNSW vectors need IO_FLAG_MMAP_IFC,
+#which faiss exports from 1.11 on (older releases read those indexes into private memory)
+_MMAP_IVF_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+_MMAP_IFC_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+if RAG_INDEX_TYPE not in _INDEX_TYPES:
+    logger.warning("Unknown RAG_INDEX_TYPE=%s; using a flat index", RAG_INDEX_TYPE)
+    RAG_INDEX_TYPE = "flat"
+if RAG_RETRIEVAL_MODE not in _RETRIEVAL_MODES:
+    logger.warning("Unknown RAG_RETRIEVAL_MODE=%s; using vector retrieval", RAG_RETRIEVAL_MODE)
+    RAG_RETRIEVAL_MODE = "vector"
+if RAG_VECTOR_QUANTIZATION not in ("none", *_QUANTIZERS):
+    logger.warning("Unknown RAG_VECTOR_QUANTIZATION=%s; storing float32 vectors", RAG_VECTOR_QUANTIZATION)
+    RAG_VECTOR_QUANTIZATION = "none"
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+#how often the shared RAG system re-checks the docs folder for changes (0 = never)
+RAG_REFRESH_INTERVAL = float(os.environ.get("RAG_REFRESH_INTERVAL", "300"))
+#index versions kept on disk (the current one included); older ones are deleted after each save
+RAG_INDEX_KEEP_VERSIONS = max(int(os.environ.get("RAG_INDEX_KEEP_VERSIONS", "2")), 1)
+#how often a checkpointed build (python -m backend.rag build) saves its progress so a rerun can resume
+RAG_BUILD_CHECKPOINT_SECONDS = float(os.environ.get("RAG_BUILD_CHECKPOINT_SECONDS", "60"))
+#how long to wait before retrying after the shared RAG system failed to load (e.g. empty docs folder)
+RAG_RETRY_INTERVAL = float(os.environ.get("RAG_RETRY_INTERVAL", "60"))
+
+#function to describe the index the current settings ask for (a change triggers a rebuild)
+def _configured_index() -> Dict[str, Any]:
+    return {"type": RAG_INDEX_TYPE, "dimension": EMBEDDING_DIMENSION, "quantization": RAG_VECTOR_QUANTIZATION}
+
+
+#function to shorten embeddings to the configured dimension (leading components re-normalised to unit length,
+#which is how text-embedding-3 produces its shortened outputs)
+def _reduce_dimension(embeddings: np.ndarray, dimension: int = EMBEDDING_DIMENSION) -> np.ndarray:
+    if dimension <= 0 or embeddings.ndim != 2 or embeddings.shape[1] <= dimension:
+        return embeddings
+    reduced = np.ascontiguousarray(embeddings[:, :dimension], dtype=np.float32)
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return reduced / norms
+
+
+class _ExactNeighbours:
+
+    #function to track the exact k nearest neighbours of a fixed query sample while vectors are added in batches
+    def __init__(self, queries: np.ndarray, k: int):
+        self.queries = np.ascontiguousarray(queries, dtype=np.float32)
+        self.k = k
+        self.count = 0
+        self.seconds = 0.0
+        self.distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        self.ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+    #function to search one batch exactly and merge its hits into the running top k
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        if not len(ids) or not self.k:
+            return
+        start = time.time()
+        exact = faiss.IndexFlatL2(vectors.shape[1])
+        exact.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        distances, positions = exact.search(self.queries, min(self.k, len(ids)))
+        found = np.where(positions >= 0, ids[positions], -1)
+        merged_distances = np.hstack([self.distances, distances])
+        merged_ids = np.hstack([self.ids, found])
+        order = np.argsort(merged_distances, axis=1, kind="stable")[:, :self.k]
+        self.distances = np.take_along_axis(merged_distances, order, axis=1)
+        self.ids = np.take_along_axis(merged_ids, order, axis=1)
+        self.count += len(ids)
+        self.seconds += time.time() - start
+
+
 class RAGSystem:
 
     #function to initialize RAG system, index paths, and optional Azure storage
@@ -49,9 +194,34 @@ class RAGSystem:
         self.index_path = Path(index_path) if index_path else None
         self.query_cache_path = Path(query_cache_path) if query_cache_path else None
         self.index: Optional[faiss.Index] = None
-        self.metadata: List[Dict[str, Any]] = []
+        #chunk metadata and text keyed by FAISS vector id, read from sqlite only for the top-k results
+        self.chunk_store: Optional[ChunkStore] = None
+        #vector id range of each indexed file (path relative to docs_folder), used for incremental updates
+        self._file_ranges: Optional[Dict[str, Dict[str, int]]] = None
+        self._next_id = 0
+        self._index_type = "flat"
+        #settings the index was built for (type differs from _index_type when IVF-PQ fell back to flat)
+        self._index_config: Dict[str, Any] = {"type": "flat", "dimension": None, "quantization": "none"}
+        #true for indexes written before vector ids existed (ids are row positions)
+        self._positional_ids = False
+        #true while the index is a read-only mapping of the saved file (edits work on an in-memory copy)
+        self._index_mmapped = False
+        self._last_recall_check: Optional[Dict[str, Any]] = None
         self.client = None
-        self._query_embedding_cache: Dict[str, np.ndarray] = {}
+        #query embeddings live in a sqlite store that is opened on the first search
+        self._query_cache: Optional[QueryEmbeddingCache] = None
+        self._query_cache_failed = False
+        #guards swapping index/chunk store; searches work on a snapshot of both
+        self._lock = threading.RLock()
+        self._docs_manifest: Optional[Dict[str, Dict[str, Any]]] = None
+        #version of the on-disk index that is loaded (None for unversioned files or an unsaved index)
+        self._version: Optional[str] = None
+        #serialises builds within this process; the build lock file does the same across processes
+        self._build_mutex = threading.Lock()
+        #keeps the docs manifest in memory once watch_docs() is called
+        self._docs_watcher: Optional[DocsWatcher] = None
+        #(file ranges, filter index) of the current index, built on the first filtered search
+        self._filter_index: Optional[Tuple[Dict[str, Dict[str, int]], MetadataFilterIndex]] = None
         
         self.azure_blob: Optional[AzureBlobStorage] = None
         if use_azure_blob and AZURE_BLOB_AVAILABLE:
@@ -66,12 +236,11 @@ class RAGSystem:
                 logger.warning("Failed to initialize Azure Blob Storage: %s", str(e))
                 self.azure_blob = None
         
-        self._load_query_cache()
         logger.info(
-            "RAGSystem initialized (docs_folder=%s, index_path=%s, query_cache_size=%d, azure_blob=%s)",
+            "RAGSystem initialized (docs_folder=%s, index_path=%s, query_cache=%s, azure_blob=%s)",
             self.docs_folder,
             self.index_path,
-            len(self._query_embedding_cache),
+            self.query_cache_path,
             "enabled" if self.azure_blob and self.azure_blob.is_available() else "disabled",
         )
 
@@ -79,39 +248,24 @@ class RAGSystem:
     def _get_query_hash(self, query: str) -> str:
         return hashlib.sha256(query.encode('utf-8')).hexdigest()
 
-    #function to load cached query embeddings from disk if available
-    def _load_query_cache(self) -> None:
-        if self.query_cache_path and self.query_cache_path.exists():
-            try:
-                with open(self.query_cache_path, "rb") as f:
-                    cache_data = pickle.load(f)
-                    self._query_embedding_cache = {
-                        k: np.array(v, dtype=np.float32) 
-                        for k, v in cache_data.items()
-                    }
-                logger.info(
-                    "Loaded query embedding cache: %d entries from %s",
-                    len(self._query_embedding_cache),
-                    self.query_cache_path,
-                )
-            except Exception as e:
-                logger.warning("Failed to load query cache: %s", e)
-                self._query_embedding_cache = {}
-
-    #function to save query embedding cache to disk
-    def _save_query_cache(self) -> None:
-        if self.query_cache_path:
-            try:
-                self.query_cache_path.parent.mkdir(parents=True, exist_ok=True)
-                cache_data = {
-                    k: v.tolist() 
-                    for k, v in self._query_embedding_cache.items()
-                }
-                with open(self.query_cache_path, "wb") as f:
-                    pickle.dump(cache_data, f)
-                logger.debug("Saved query embedding cache: %d entries", len(self._query_embedding_cache))
-            except Exception as e:
-                logger.warning("Failed to save query cache: %s", e)
+    #function to get the query-embedding cache, opening it on first use (None when no path is set or it cannot open)
+    def _get_query_cache(self) -> Optional[QueryEmbeddingCache]:
+        if self.query_cache_path is None or self._query_cache_failed:
+            return None
+        if self._query_cache is None:
+            with self._lock:
+                if self._query_cache is None:
+                    try:
+                        self._query_cache = QueryEmbeddingCache(str(self.query_cache_path))
+                    except (sqlite3.Error, OSError) as e:
+                        logger.warning("Query embedding cache unavailable (%s); continuing without it", e)
+                        self._query_cache_failed = True
+                        return None
+        return self._query_cache
+
+    #function to get the embedding deployment name
+    def _embedding_deployment(self) -> str:
+        return os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", EMBEDDING_MODEL)
 
     #function to obtain or create the embedding client (Azure/OpenAI)
     def _get_embedding_client(self):
@@ -134,67 +288,131 @@ class RAGSystem:
                 self.client = get_azure_client()
         return self.client
 
-    #function to generate embeddings for a list of texts (batch with fallback)
-    def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
-        client = self._get_embedding_client()
-        embedding_deployment = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", EMBEDDING_MODEL)
-        
+    #function to generate embeddings for a list of texts; with persist, chunks embedded before (by this or an
+    #earlier build, or repeated across documents) come from the embedding store and only unseen ones hit the API
+    def _generate_embeddings(self, texts: List[str], persist: bool = True) -> np.ndarray:
+        embedding_deployment = self._embedding_deployment()
+        store = get_embedding_store() if persist else None
+        if store is None or not texts:
+            return self._embed_coalesced(texts, embedding_deployment)
+
+        stored = store.get_many(embedding_deployment, texts)
+        vectors: Dict[str, np.ndarray] = {
+            text: vector for text, vector in zip(texts, stored) if vector is not None
+        }
+        unseen = list(dict.fromkeys(text for text in texts if text not in vectors))
+        logger.info(
+            "Embedding store: %d of %d text(s) already embedded, %d unique text(s) to embed",
+            len(texts) - sum(1 for text in texts if text not in vectors),
+            len(texts),
+            len(unseen),
+        )
+        if unseen:
+            new_embeddings = self._embed_coalesced(unseen, embedding_deployment)
+            store.put_many(embedding_deployment, unseen, new_embeddings)
+            vectors.update(zip(unseen, new_embeddings))
+        return np.stack([vectors[text] for text in texts]).astype(np.float32)
+
+    #function to request embeddings, coalescing identical in-flight requests
+    def _embed_coalesced(self, texts: List[str], embedding_deployment: str) -> np.ndarray:
+        #identical concurrent requests (e.g. the same query from two tabs) share one in-flight embedding call
+        key = fingerprint(embedding_deployment, *texts)
+        embeddings = get_single_flight("embeddings").do(
+            key, lambda: self._request_embeddings(texts, embedding_deployment)
+        )
+        return embeddings.copy()
+
+    #function to pack texts into batches bounded by estimated tokens and item count, keeping input order
+    def _embedding_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        batches: List[Tuple[int, int]] = []
+        start = 0
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text)
+            if i > start and (
+                i - start >= RAG_EMBEDDING_BATCH_ITEMS or batch_tokens + tokens > RAG_EMBEDDING_BATCH_TOKENS
+            ):
+                batches.append((start, i))
+                start = i
+                batch_tokens = 0
+            batch_tokens += tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    #function to embed one batch; create_embeddings retries throttling and transient errors, and a batch
+    #the API rejects as a bad request is sent again in halves so one rejected input cannot sink its
+    #neighbours (any other error has already been retried and is raised as is)
+    def _embed_batch(self, texts: List[str], embedding_deployment: str) -> np.ndarray:
+        try:
+            embeddings = create_embeddings(self._get_embedding_client, embedding_deployment, texts)
+            return np.array(embeddings, dtype=np.float32)
+        except BadRequestError as e:
+            if len(texts) == 1:
+                raise RuntimeError(
+                    f"Embedding request rejected for a {len(texts[0])}-char text: {e}"
+                ) from e
+            logger.warning("Embedding batch of %d texts rejected (%s); retrying in two halves", len(texts), e)
+        middle = len(texts) // 2
+        return np.vstack([
+            self._embed_batch(texts[:middle], embedding_deployment),
+            self._embed_batch(texts[middle:], embedding_deployment),
+        ])
+
+    #function to request embeddings from the API in token/item-bounded batches sent concurrently
+    def _request_embeddings(self, texts: List[str], embedding_deployment: str) -> np.ndarray:
         total_chars = sum(len(text) for text in texts)
         avg_text_length = total_chars / len(texts) if texts else 0
+        batches = self._embedding_batches(texts)
         
         logger.info(
-            "Generating embeddings: %d texts, %d total chars, avg %d chars/text",
+            "Generating embeddings: %d texts, %d total chars, avg %d chars/text, %d batch(es), concurrency=%d",
             len(texts),
             total_chars,
             int(avg_text_length),
+            len(batches),
+            min(RAG_EMBEDDING_CONCURRENCY, len(batches)),
         )
 
         start_time = time.time()
-        try:
-            logger.debug(
-                "Requesting batch embeddings: %d texts, model=%s",
-                len(texts),
-                embedding_deployment,
-            )
-            response = client.embeddings.create(
-                model=embedding_deployment,
-                input=texts,
-            )
-            embeddings = [d.embedding for d in response.data]
-            embeddings_array = np.array(embeddings, dtype=np.float32)
-            elapsed = time.time() - start_time
-            logger.info(
-                "Embedding generation complete (batch): %d embeddings, dimension=%d, elapsed=%.2fs",
-                len(embeddings),
-                embeddings_array.shape[1] if len(embeddings) > 0 else 0,
-                elapsed,
-            )
-            return embeddings_array
-        except Exception:
-            logger.exception("Batch embedding request failed, falling back to per-text embedding requests")
-
-        embeddings = []
-        start_time = time.time()
-        for i, text in enumerate(texts):
-            try:
-                logger.debug("Generating embedding %d/%d: text_length=%d chars", i + 1, len(texts), len(text))
-                response = client.embeddings.create(model=embedding_deployment, input=text)
-                embedding = response.data[0].embedding
-                embeddings.append(embedding)
-            except Exception as e:
-                logger.error(
-                    "Failed to generate embedding for text %d (length: %d chars): %s",
-                    i, len(text) if text else 0, str(e)
-                )
-                embeddings.append([0.0] * EMBEDDING_DIMENSION)
-
+        results: List[Optional[np.ndarray]] = [None] * len(batches)
+        if len(batches) <= 1 or RAG_EMBEDDING_CONCURRENCY <= 1:
+            for batch_num, (start, end) in enumerate(batches):
+                results[batch_num] = self._embed_batch(texts[start:end], embedding_deployment)
+        else:
+            embedded = 0
+            with ThreadPoolExecutor(
+                max_workers=min(RAG_EMBEDDING_CONCURRENCY, len(batches)),
+                thread_name_prefix="rag-embed",
+            ) as executor:
+                futures = {
+                    executor.submit(self._embed_batch, texts[start:end], embedding_deployment): batch_num
+                    for batch_num, (start, end) in enumerate(batches)
+                }
+                try:
+                    for future in as_completed(futures):
+                        batch_num = futures[future]
+                        results[batch_num] = future.result()
+                        embedded += len(results[batch_num])
+                        elapsed = time.time() - start_time
+                        logger.info(
+                            "Embedded batch %d/%d: %d/%d texts (%.1f chunks/s)",
+                            batch_num + 1, len(batches), embedded, len(texts),
+                            embedded / elapsed if elapsed > 0 else 0.0,
+                        )
+                except BaseException:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+
+        embeddings_array = np.vstack(results) if results else np.empty((0, 0), dtype=np.float32)
         elapsed = time.time() - start_time
-        embeddings_array = np.array(embeddings, dtype=np.float32)
         logger.info(
-            "Embedding generation complete (fallback): %d embeddings, dimension=%d, elapsed=%.2fs",
-            len(embeddings),
-            embeddings_array.shape[1] if len(embeddings) > 0 else 0,
+            "Embedding generation complete: %d embeddings, dimension=%d, elapsed=%.2fs (%.1f chunks/s)",
+            len(embeddings_array),
+            embeddings_array.shape[1] if len(embeddings_array) > 0 else 0,
             elapsed,
+            len(embeddings_array) / elapsed if elapsed > 0 else 0.0,
         )
         return embeddings_array
 
@@ -223,15 +441,17 @@ class RAGSystem:
                 chunk_num, start, end, chunk_length, (chunk_length / chunk_size * 100)
             )
             
+            #the chunk reaching the end is the last one; stepping back by the overlap from there would only
+            #emit ever shorter suffixes of it
+            if end >= text_length:
+                logger.debug("Reached end of text at position %d", end)
+                break
+
             next_start = end - overlap
             if next_start <= start:
                 logger.warning("Overlap is too large (%d), adjusting to prevent infinite loop", overlap)
                 next_start = start + 1
-            
-            if next_start >= text_length:
-                logger.debug("Reached end of text at position %d", next_start)
-                break
-                
+
             start = next_start
         
         logger.info(
@@ -266,26 +486,18 @@ class RAGSystem:
             logger.error("Failed to load document %s: %s", file_path, str(e))
             raise
 
-    #function to compute a manifest (size/mtime) for files under docs folder
+    #function to compute a manifest (size/mtime) for files under docs folder; kept in memory by the docs
+    #watcher once watch_docs() was called, otherwise built in one walk of the folder
     def _compute_docs_manifest(self) -> Dict[str, Dict[str, Any]]:
-        manifest: Dict[str, Dict[str, Any]] = {}
+        watcher = self._docs_watcher
+        if watcher is not None and watcher.running:
+            return watcher.manifest()
 
         if not self.docs_folder.exists():
             logger.warning("Docs folder does not exist when computing manifest: %s", self.docs_folder)
-            return manifest
-
-        for ext in [".pdf", ".docx", ".doc", ".txt"]:
-            for file_path in self.docs_folder.glob(f"**/*{ext}"):
-                try:
-                    stat = file_path.stat()
-                    rel_path = str(file_path.relative_to(self.docs_folder))
-                    manifest[rel_path] = {
-                        "size": stat.st_size,
-                        "mtime": stat.st_mtime,
-                    }
-                except Exception as e:
-                    logger.warning("Failed to stat file %s for manifest: %s", file_path, str(e))
+            return {}
 
+        manifest = scan_docs_manifest(self.docs_folder)
         logger.info(
             "Computed docs manifest for %d file(s) in %s",
             len(manifest),
@@ -293,46 +505,120 @@ class RAGSystem:
         )
         return manifest
 
-    #function to build a FAISS index from documents under the docs folder
-    def build_index(self) -> None:
-        if not self.docs_folder.exists():
-            raise ValueError(f"Docs folder does not exist: {self.docs_folder}")
-
-        logger.info("Building RAG index from documents in: %s", self.docs_folder)
-        build_start_time = time.time()
-
-        documents: List[Tuple[Path, str]] = []
-        total_files_found = 0
-        
+    #function to keep the docs manifest current with a file watcher and call on_change (debounced) when
+    #documents are added, changed or removed
+    def watch_docs(self, on_change: Callable[[], None]) -> DocsWatcher:
+        if self._docs_watcher is None:
+            self._docs_watcher = DocsWatcher(self.docs_folder, on_change)
+            self._docs_watcher.start()
+        return self._docs_watcher
+
+    #function to stop the docs watcher (the manifest is then computed by walking the folder again)
+    def stop_watching_docs(self) -> None:
+        watcher, self._docs_watcher = self._docs_watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    #function to list the supported documents under the docs folder
+    def _collect_doc_files(self) -> List[Path]:
+        files: List[Path] = []
         for ext in [".pdf", ".docx", ".doc", ".txt"]:
-            files = list(self.docs_folder.glob(f"**/*{ext}"))
-            total_files_found += len(files)
-            logger.info("Found %d %s files", len(files), ext.upper())
-            
-            for file_path in files:
+            ext_files = list(self.docs_folder.glob(f"**/*{ext}"))
+            logger.info("Found %d %s files", len(ext_files), ext.upper())
+            files.extend(ext_files)
+        return files
+
+    #function to load and extract text from documents, skipping empty or unreadable ones
+    def _load_documents(self, file_paths: List[Path]) -> List[Tuple[Path, str]]:
+        return list(self._iter_documents(file_paths))
+
+    #function to yield (path, text) for documents in order; PDF/Word extraction runs in a process pool kept a
+    #bounded window ahead of the consumer, so only a few extracted documents are held at a time
+    def _iter_documents(self, file_paths: List[Path]) -> Iterator[Tuple[Path, str]]:
+        extract_count = sum(1 for file_path in file_paths if file_path.suffix.lower() != ".txt")
+        workers = min(RAG_EXTRACT_WORKERS or os.cpu_count() or 1, extract_count)
+        executor: Optional[ProcessPoolExecutor] = None
+        if workers > 1:
+            try:
+                #spawned rather than forked: forking a server process that runs threads can deadlock the child
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError) as e:
+                logger.warning("Could not start document extraction processes (%s); extracting in-process", e)
+        if executor is None:
+            for file_path in file_paths:
+                text = self._document_text(file_path, None)
+                if text is not None:
+                    yield file_path, text
+            return
+
+        logger.info("Extracting %d document(s) with %d worker process(es)", extract_count, workers)
+        pending: "deque[Tuple[Path, Optional[Future]]]" = deque()
+        try:
+            for file_path in file_paths:
+                future = None if file_path.suffix.lower() == ".txt" else executor.submit(extract_text_from_file, file_path)
+                pending.append((file_path, future))
+                while len(pending) > workers * 2:
+                    done_path, done_future = pending.popleft()
+                    text = self._document_text(done_path, done_future)
+                    if text is not None:
+                        yield done_path, text
+            while pending:
+                done_path, done_future = pending.popleft()
+                text = self._document_text(done_path, done_future)
+                if text is not None:
+                    yield done_path, text
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    #function to get one document's text from its extraction future (or by loading it here when there is
+    #none or the pool broke); returns None for empty or unreadable documents
+    def _document_text(self, file_path: Path, future: Optional[Future]) -> Optional[str]:
+        try:
+            if future is None:
+                text = self._load_document(file_path)
+            else:
                 try:
+                    text = future.result()
+                except BrokenProcessPool:
+                    logger.warning("Extraction process died on %s; extracting it in-process", file_path.name)
                     text = self._load_document(file_path)
-                    if text.strip():
-                        documents.append((file_path, text))
-                        logger.info("Successfully loaded document: %s (%d chars)", file_path.name, len(text))
-                    else:
-                        logger.warning("Document %s is empty or contains only whitespace", file_path.name)
-                except Exception as e:
-                    logger.error("Failed to load document %s: %s", file_path, str(e), exc_info=True)
-        
-        logger.info(
-            "Document loading complete: %d files found, %d successfully loaded",
-            total_files_found, len(documents)
-        )
-
-        if not documents:
-            raise ValueError(f"No documents found in {self.docs_folder}")
-
-        logger.info("Starting chunking process for %d documents", len(documents))
-        chunking_start_time = time.time()
-        
+        except Exception as e:
+            logger.error("Failed to load document %s: %s", file_path, str(e), exc_info=True)
+            return None
+        if not text.strip():
+            logger.warning("Document %s is empty or contains only whitespace", file_path.name)
+            return None
+        logger.info("Successfully loaded document: %s (%d chars)", file_path.name, len(text))
+        return text
+
+    #function to chunk documents and assign each file a contiguous range of vector ids starting at first_id
+    def _chunk_documents(
+        self,
+        documents: List[Tuple[Path, str]],
+        first_id: int,
+    ) -> Tuple[List[str], Dict[int, Dict[str, Any]], Dict[str, Dict[str, int]]]:
         all_chunks: List[str] = []
-        self.metadata = []
+        metadata: Dict[int, Dict[str, Any]] = {}
+        file_ranges: Dict[str, Dict[str, int]] = {}
+        for texts, batch_metadata in self._iter_chunk_batches(documents, first_id, file_ranges):
+            all_chunks.extend(texts)
+            metadata.update(batch_metadata)
+        return all_chunks, metadata, file_ranges
+
+    #function to chunk streamed documents into build batches of (texts, metadata by vector id) bounded by
+    #RAG_BUILD_BATCH_TOKENS; each file's vector id range is recorded in file_ranges as it is chunked, and
+    #chunks with ids below resume_id (already indexed by an interrupted build) are skipped
+    def _iter_chunk_batches(
+        self,
+        documents: Iterable[Tuple[Path, str]],
+        first_id: int,
+        file_ranges: Dict[str, Dict[str, int]],
+        resume_id: int = 0,
+    ) -> Iterator[Tuple[List[str], Dict[int, Dict[str, Any]]]]:
+        texts: List[str] = []
+        metadata: Dict[int, Dict[str, Any]] = {}
+        batch_tokens = 0
+        next_id = first_id
 
         for file_path, text in documents:
             logger.info("Processing document: %s (%d chars)", file_path.name, len(text))
@@ -341,54 +627,674 @@ class RAGSystem:
                 "Document %s: created %d chunks (avg %d chars per chunk)",
                 file_path.name, len(chunks), len(text) // len(chunks) if chunks else 0
             )
-            
+            file_ranges[str(file_path.relative_to(self.docs_folder))] = {"first_id": next_id, "count": len(chunks)}
+
             for chunk_idx, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                self.metadata.append({
+                if next_id < resume_id:
+                    next_id += 1
+                    continue
+                tokens = count_tokens(chunk)
+                if texts and (len(texts) >= _BUILD_BATCH_ITEMS or batch_tokens + tokens > RAG_BUILD_BATCH_TOKENS):
+                    yield texts, metadata
+                    texts, metadata, batch_tokens = [], {}, 0
+                texts.append(chunk)
+                metadata[next_id] = {
                     "file_path": str(file_path),
                     "file_name": file_path.name,
                     "chunk_index": chunk_idx,
                     "total_chunks": len(chunks),
                     "chunk_text": chunk,
-                })
-                logger.debug(
-                    "Added chunk %d/%d from %s (length: %d chars)",
-                    chunk_idx + 1, len(chunks), file_path.name, len(chunk)
+                }
+                batch_tokens += tokens
+                next_id += 1
+
+        if texts:
+            yield texts, metadata
+
+    #function to create an empty exact index whose vectors are addressed by explicit ids
+    def _new_index(self, dimension: int) -> faiss.Index:
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+    #function to create, train and fill an index of the configured type (falls back to flat when the
+    #corpus is too small to train IVF-PQ); returns the index and the type actually built
+    def _create_index(self, embeddings: np.ndarray, ids: np.ndarray) -> Tuple[faiss.Index, str]:
+        count, dimension = embeddings.shape
+        index_type = RAG_INDEX_TYPE
+
+        qtype = _QUANTIZERS.get(RAG_VECTOR_QUANTIZATION)
+        if index_type == "hnsw":
+            if qtype is None:
+                hnsw = faiss.IndexHNSWFlat(dimension, RAG_HNSW_M)
+            else:
+                hnsw = faiss.IndexHNSWSQ(dimension, qtype, RAG_HNSW_M)
+            hnsw.hnsw.efConstruction = RAG_HNSW_EF_CONSTRUCTION
+            index = faiss.IndexIDMap2(hnsw)
+        elif index_type == "ivfpq":
+            nlist = RAG_IVF_NLIST or int(4 * np.sqrt(count))
+            nlist = max(1, min(nlist, count // 39))
+            pq_m = max(m for m in range(1, min(RAG_PQ_M, dimension) + 1) if dimension % m == 0)
+            if RAG_VECTOR_QUANTIZATION != "none":
+                logger.info("RAG_VECTOR_QUANTIZATION is ignored for IVF-PQ, which already compresses vectors")
+            if count < _IVFPQ_MIN_VECTORS:
+                logger.warning(
+                    "Only %d vectors: too few to train IVF-PQ (need >= %d); building a flat index instead",
+                    count, _IVFPQ_MIN_VECTORS,
                 )
+                index_type = "flat"
+                index = self._new_index(dimension)
+            else:
+                #IVF keeps the ids itself; an IndexIDMap around it could not remove vectors correctly
+                quantizer = faiss.IndexFlatL2(dimension)
+                index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, RAG_PQ_NBITS)
+                train_start = time.time()
+                index.train(embeddings)
+                logger.info(
+                    "Trained IVF-PQ index: nlist=%d, pq_m=%d, nbits=%d on %d vectors in %.2fs",
+                    nlist, pq_m, RAG_PQ_NBITS, count, time.time() - train_start,
+                )
+        elif qtype is not None:
+            index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2))
+        else:
+            index = self._new_index(dimension)
+
+        if not index.is_trained:
+            index.train(embeddings)
+        index.add_with_ids(embeddings, ids)
+        self._configure_search(index)
+        return index, index_type
+
+    #function to apply the search-time parameters (efSearch / nprobe) to a built or loaded index
+    def _configure_search(self, index: faiss.Index) -> None:
+        params = faiss.ParameterSpace()
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+        if isinstance(inner, faiss.IndexHNSW):
+            params.set_index_parameter(index, "efSearch", RAG_HNSW_EF_SEARCH)
+        elif isinstance(inner, faiss.IndexIVF):
+            params.set_index_parameter(index, "nprobe", RAG_IVF_NPROBE)
+
+    #function to measure recall@k and speed of an index against exact flat search over the full-size vectors
+    #(so the loss from dimension reduction, quantization and approximate search is measured together)
+    def _measure_recall(
+        self,
+        index: faiss.Index,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        num_queries: int = RAG_RECALL_CHECK_QUERIES,
+        k: int = RAG_RECALL_CHECK_K,
+    ) -> Dict[str, Any]:
+        neighbours = _ExactNeighbours(self._recall_queries(vectors, num_queries), min(k, len(ids)))
+        neighbours.add(vectors, ids)
+        return self._recall_report(index, neighbours)
+
+    #function to sample the chunk vectors used as recall-check queries
+    def _recall_queries(self, vectors: np.ndarray, num_queries: int) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+        #indexed chunks stand in for queries: they follow the same distribution as real questions' answers
+        return np.ascontiguousarray(vectors[sample], dtype=np.float32)
+
+    #function to compare an index's answers for the query sample with the exact neighbours found by flat search
+    def _recall_report(self, index: faiss.Index, neighbours: _ExactNeighbours) -> Dict[str, Any]:
+        queries = neighbours.queries
+        k = min(neighbours.k, neighbours.count)
+        expected = neighbours.ids[:, :k]
+
+        index_queries = _reduce_dimension(queries, index.d)
+        ann_start = time.time()
+        _, found = index.search(index_queries, k)
+        ann_seconds = time.time() - ann_start
+
+        hits = sum(len(set(row_expected) & set(row_found)) for row_expected, row_found in zip(expected, found))
+        return {
+            "queries": len(queries),
+            "k": k,
+            "recall": round(hits / (len(queries) * k), 4) if k else 1.0,
+            "flat_ms_per_query": round(neighbours.seconds * 1000 / len(queries), 3),
+            "index_ms_per_query": round(ann_seconds * 1000 / len(queries), 3),
+            "speedup": round(neighbours.seconds / ann_seconds, 1) if ann_seconds > 0 else None,
+            "index_bytes": int(faiss.serialize_index(index).size),
+            "flat_bytes": int(neighbours.count * queries.shape[1] * 4),
+        }
 
-        chunking_elapsed = time.time() - chunking_start_time
-        logger.info(
-            "Chunking complete: created %d chunks from %d documents in %.2fs (avg %.2f chunks/doc)",
-            len(all_chunks), len(documents), chunking_elapsed,
-            len(all_chunks) / len(documents) if documents else 0
+    #function to check recall of the loaded index against exact search, using the exact chunk vectors from
+    #the embedding store (or from the index itself when it stores full vectors)
+    def evaluate_recall(
+        self,
+        num_queries: int = RAG_RECALL_CHECK_QUERIES,
+        k: int = RAG_RECALL_CHECK_K,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            index, chunk_store, index_type = self.index, self.chunk_store, self._index_type
+            quantization = self._index_config.get("quantization", "none")
+        if index is None or chunk_store is None:
+            raise ValueError("Index not built. Call build_index() or load_index() first.")
+
+        id_texts = list(chunk_store.iter_texts())
+        ids = np.array([vector_id for vector_id, _ in id_texts], dtype=np.int64)
+        store = get_embedding_store()
+        stored = (
+            store.get_many(self._embedding_deployment(), [text for _, text in id_texts])
+            if store is not None else [None] * len(ids)
         )
+        if any(vector is None for vector in stored):
+            if index_type == "ivfpq" or quantization != "none":
+                raise ValueError("Exact vectors for every chunk are needed; enable the embedding store and rebuild")
+            vectors = np.vstack([index.reconstruct(int(i)) for i in ids])
+        else:
+            vectors = np.vstack(stored)
 
-        embeddings = self._generate_embeddings(all_chunks)
-        logger.info("Generated embeddings: shape %s", embeddings.shape)
+        result = {
+            "index_type": index_type,
+            "dimension": index.d,
+            "quantization": quantization,
+            **self._measure_recall(index, vectors, ids, num_queries, k),
+        }
+        self._last_recall_check = result
+        return result
 
-        logger.info("Creating FAISS index...")
-        index_start_time = time.time()
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings)
-        index_elapsed = time.time() - index_start_time
-        
+    #function to build a FAISS index from documents under the docs folder
+    #with checkpoint, progress is saved every RAG_BUILD_CHECKPOINT_SECONDS and a build interrupted with
+    #the docs unchanged resumes from its last checkpoint; progress is called with a report after each batch
+    def build_index(
+        self,
+        checkpoint: bool = False,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        if not self.docs_folder.exists():
+            raise ValueError(f"Docs folder does not exist: {self.docs_folder}")
+        if checkpoint and self.index_path is None:
+            raise ValueError("index_path not set, cannot checkpoint the build")
+
+        logger.info("Building RAG index from documents in: %s", self.docs_folder)
+        build_start_time = time.time()
+
+        #taken before reading so an edit made during the build shows up as a change on the next check
+        docs_manifest = self._compute_docs_manifest()
+        files = self._collect_doc_files()
+
+        resumed = self._load_build_checkpoint(docs_manifest) if checkpoint else None
+        if resumed is not None:
+            index, state, chunk_store = resumed
+            index_type = state["index_type"]
+            total_chunks = state["next_id"]
+            file_ranges = {
+                rel_path: vector_range for rel_path, vector_range in state["file_ranges"].items()
+                if vector_range["first_id"] + vector_range["count"] <= total_chunks
+            }
+            #the document cut off by the checkpoint is chunked again from its first id, skipping indexed chunks
+            partial = sorted(
+                (vector_range["first_id"], rel_path) for rel_path, vector_range in state["file_ranges"].items()
+                if vector_range["first_id"] < total_chunks < vector_range["first_id"] + vector_range["count"]
+            )
+            first_id = partial[0][0] if partial else total_chunks
+            partial_paths = {self.docs_folder / rel_path for _, rel_path in partial}
+            files = [self.docs_folder / rel_path for _, rel_path in partial] + [
+                file_path for file_path in files
+                if file_path not in partial_paths and str(file_path.relative_to(self.docs_folder)) not in file_ranges
+            ]
+            batch_offset, elapsed_before = state["batches"], state["elapsed"]
+            logger.info(
+                "Resuming build from checkpoint: %d chunks of %d document(s) already indexed, %d file(s) left",
+                total_chunks, len(file_ranges), len(files),
+            )
+        else:
+            index, index_type, total_chunks, first_id = None, RAG_INDEX_TYPE, 0, 0
+            file_ranges = {}
+            batch_offset, elapsed_before = 0, 0.0
+            if checkpoint:
+                self._remove_build_checkpoint()
+                chunk_store_path = self._artifact_path("checkpoint.chunks.sqlite3")
+            else:
+                chunk_store_path = self._chunk_store_path(building=True) if self.index_path else None
+            if chunk_store_path is not None and chunk_store_path.exists():
+                chunk_store_path.unlink()
+            chunk_store = ChunkStore(str(chunk_store_path) if chunk_store_path else None, building=True)
+
+        #documents stream from the extraction pool into chunk batches that are embedded and added to the
+        #index one at a time, so memory follows the batch size rather than the corpus size
+        batches = self._iter_chunk_batches(self._iter_documents(files), first_id, file_ranges, resume_id=total_chunks)
+        needs_training = RAG_INDEX_TYPE == "ivfpq" or RAG_VECTOR_QUANTIZATION == "int8"
+        #vectors held back until there are enough to train the index on
+        train_vectors: List[np.ndarray] = []
+        train_ids: List[np.ndarray] = []
+        neighbours: Optional[_ExactNeighbours] = None
+        full_dimension = 0
+        total_bytes = sum(entry["size"] for entry in docs_manifest.values()) or 1
+        start_fraction = sum(docs_manifest.get(rel_path, {}).get("size", 0) for rel_path in file_ranges) / total_bytes
+        start_chunks = total_chunks
+        last_checkpoint = time.time()
+
+        for batch_num, (texts, metadata) in enumerate(batches, batch_offset + 1):
+            full_embeddings = self._generate_embeddings(texts)
+            embeddings = _reduce_dimension(full_embeddings)
+            ids = np.fromiter(metadata.keys(), dtype=np.int64, count=len(metadata))
+            full_dimension = full_embeddings.shape[1]
+            #an exact flat index over full-size vectors has nothing to measure, so no recall check is tracked
+            lossy_index = (
+                RAG_INDEX_TYPE != "flat" or RAG_VECTOR_QUANTIZATION != "none" or embeddings.shape[1] != full_dimension
+            )
+            if neighbours is None and lossy_index and RAG_RECALL_CHECK_QUERIES > 0 and resumed is None:
+                #recall-check queries are sampled from the first batch; their exact neighbours are tracked
+                #over every batch so the full-size vectors never have to be held at once
+                neighbours = _ExactNeighbours(
+                    self._recall_queries(full_embeddings, RAG_RECALL_CHECK_QUERIES), RAG_RECALL_CHECK_K
+                )
+            if neighbours is not None:
+                neighbours.add(full_embeddings, ids)
+            del full_embeddings
+
+            chunk_store.put_many(metadata)
+            if index is not None:
+                index.add_with_ids(embeddings, ids)
+            else:
+                train_vectors.append(embeddings)
+                train_ids.append(ids)
+                buffered = sum(len(batch_ids) for batch_ids in train_ids)
+                if not needs_training or buffered >= max(RAG_INDEX_TRAIN_VECTORS, _IVFPQ_MIN_VECTORS):
+                    index, index_type = self._create_index(np.vstack(train_vectors), np.concatenate(train_ids))
+                    train_vectors, train_ids = [], []
+
+            total_chunks += len(texts)
+            elapsed = time.time() - build_start_time
+            #progress by document bytes, the only size known before every document has been chunked
+            fraction = sum(docs_manifest.get(rel_path, {}).get("size", 0) for rel_path in file_ranges) / total_bytes
+            rate = (fraction - start_fraction) / elapsed if elapsed > 0 else 0.0
+            report = {
+                "batch": batch_num,
+                "chunks": total_chunks,
+                "documents": len(file_ranges),
+                "total_documents": len(docs_manifest),
+                "fraction": round(min(fraction, 1.0), 4),
+                "elapsed": round(elapsed_before + elapsed, 1),
+                "eta": round((1.0 - fraction) / rate, 1) if rate > 0 else None,
+            }
+            logger.info(
+                "Build batch %d: %d chunks from %d/%d document(s) indexed so far (%.0f%%, %.1f chunks/s, ETA %ss)",
+                batch_num, total_chunks, report["documents"], report["total_documents"], report["fraction"] * 100,
+                (total_chunks - start_chunks) / elapsed if elapsed > 0 else 0.0,
+                report["eta"],
+            )
+            if checkpoint and index is not None and time.time() - last_checkpoint >= RAG_BUILD_CHECKPOINT_SECONDS:
+                self._write_build_checkpoint(index, {
+                    "docs_manifest": docs_manifest,
+                    "index_config": _configured_index(),
+                    "index_type": index_type,
+                    "next_id": index.ntotal,
+                    "file_ranges": file_ranges,
+                    "batches": batch_num,
+                    "elapsed": elapsed_before + elapsed,
+                })
+                last_checkpoint = time.time()
+            if progress is not None:
+                progress(report)
+
+        if index is None and train_vectors:
+            index, index_type = self._create_index(np.vstack(train_vectors), np.concatenate(train_ids))
+            train_vectors, train_ids = [], []
+
+        logger.info(
+            "Document loading complete: %d files found, %d successfully loaded",
+            len(files), len(file_ranges)
+        )
+        if index is None:
+            raise ValueError(f"No documents found in {self.docs_folder}")
+
+        dimension = index.d
         logger.info(
-            "FAISS index created: %d vectors, dimension=%d, elapsed=%.2fs",
-            self.index.ntotal, dimension, index_elapsed
+            "FAISS %s index created: %d vectors, dimension=%d (embedded at %d)",
+            index_type, index.ntotal, dimension, full_dimension
         )
+
+        recall_check = None
+        exact_index = index_type == "flat" and RAG_VECTOR_QUANTIZATION == "none" and dimension == full_dimension
+        if not exact_index and neighbours is not None:
+            recall_check = {
+                "index_type": index_type,
+                "dimension": dimension,
+                "quantization": RAG_VECTOR_QUANTIZATION,
+                **self._recall_report(index, neighbours),
+            }
+            logger.info(
+                "Recall check vs full-size flat: recall@%d=%.3f over %d queries, %.3f ms/query vs %.3f ms flat "
+                "(%sx), %d bytes vs %d bytes flat",
+                recall_check["k"], recall_check["recall"], recall_check["queries"],
+                recall_check["index_ms_per_query"], recall_check["flat_ms_per_query"], recall_check["speedup"],
+                recall_check["index_bytes"], recall_check["flat_bytes"],
+            )
+
+        #swap in the new index only once it is complete so concurrent searches never see a partial one
+        with self._lock:
+            self.index = index
+            self._index_mmapped = False
+            self.chunk_store = chunk_store
+            self._file_ranges = file_ranges
+            self._next_id = total_chunks
+            self._index_type = index_type
+            self._index_config = _configured_index()
+            self._positional_ids = False
+            self._last_recall_check = recall_check
+            self._docs_manifest = docs_manifest
         
         total_elapsed = time.time() - build_start_time
         logger.info(
             "RAG index build complete: %d documents, %d chunks, %d vectors, total time=%.2fs",
-            len(documents), len(all_chunks), self.index.ntotal, total_elapsed
+            len(file_ranges), total_chunks, index.ntotal, total_elapsed
         )
 
         if self.index_path:
             self.save_index()
+        if checkpoint:
+            self._remove_build_checkpoint()
+
+    #function to save an unfinished build's index and state; its chunk store already holds every chunk written
+    def _write_build_checkpoint(self, index: faiss.Index, state: Dict[str, Any]) -> None:
+        checkpoint_start = time.time()
+        index_path = self._artifact_path("checkpoint.index")
+        tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, index_path)
+        #the state is replaced last, so it never refers to an index older than itself
+        state_path = self._artifact_path("checkpoint.pkl")
+        tmp_path = state_path.with_name(f"{state_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, state_path)
+        logger.info(
+            "Build checkpoint saved: %d vectors after batch %d in %.2fs",
+            state["next_id"], state["batches"], time.time() - checkpoint_start,
+        )
+
+    #function to load the checkpoint of an interrupted build as (index, state, chunk store); None when there is
+    #none or it was taken with other docs or index settings
+    def _load_build_checkpoint(
+        self,
+        docs_manifest: Dict[str, Dict[str, Any]],
+    ) -> Optional[Tuple[faiss.Index, Dict[str, Any], ChunkStore]]:
+        state_path = self._artifact_path("checkpoint.pkl")
+        index_path = self._artifact_path("checkpoint.index")
+        chunk_store_path = self._artifact_path("checkpoint.chunks.sqlite3")
+        if not state_path.exists():
+            return None
+        try:
+            with open(state_path, "rb") as f:
+                state = pickle.load(f)
+            if state["docs_manifest"] != docs_manifest:
+                logger.info("Build checkpoint ignored: documents changed since it was taken")
+                return None
+            if state["index_config"] != _configured_index():
+                logger.info("Build checkpoint ignored: index settings changed since it was taken")
+                return None
+            if not chunk_store_path.exists():
+                logger.info("Build checkpoint ignored: its chunk store is missing")
+                return None
+            index = faiss.read_index(str(index_path))
+        except Exception as e:
+            logger.warning("Build checkpoint unreadable, starting over: %s", e)
+            return None
+        if index.ntotal != state["next_id"]:
+            logger.warning("Build checkpoint ignored: index holds %d vectors, expected %d", index.ntotal, state["next_id"])
+            return None
+        self._configure_search(index)
+        chunk_store = ChunkStore(str(chunk_store_path), building=True)
+        #chunks written after the checkpoint never reached its index and are indexed again
+        chunk_store.delete_range(state["next_id"], 2 ** 62)
+        return index, state, chunk_store
+
+    #function to delete the checkpoint files of an interrupted build
+    def _remove_build_checkpoint(self) -> None:
+        for suffix in ("checkpoint.pkl", "checkpoint.index", "checkpoint.chunks.sqlite3"):
+            try:
+                self._artifact_path(suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+    #function to bring the index in line with the docs folder by embedding only added/changed files
+    #and removing the vectors of changed/deleted ones; returns False when a full rebuild is needed
+    def update_index(
+        self,
+        stored_manifest: Dict[str, Dict[str, Any]],
+        current_manifest: Dict[str, Dict[str, Any]],
+    ) -> bool:
+        with self._lock:
+            index, chunk_store = self.index, self.chunk_store
+            file_ranges, next_id = self._file_ranges, self._next_id
+            index_type, positional_ids = self._index_type, self._positional_ids
+            index_config = self._index_config
+            mapped_file = self._artifact_path("index", self._version) if self._index_mmapped else None
+
+        if index is None or chunk_store is None or file_ranges is None:
+            logger.info("RAG: Index has no per-file vector ranges, incremental update not possible")
+            return False
+        if index_config != _configured_index():
+            logger.info("RAG: Index settings changed (%s -> %s), full rebuild needed", index_config, _configured_index())
+            return False
+
+        added = sorted(set(current_manifest) - set(stored_manifest))
+        removed = sorted(set(stored_manifest) - set(current_manifest))
+        changed = sorted(
+            rel_path for rel_path in set(current_manifest) & set(stored_manifest)
+            if current_manifest[rel_path] != stored_manifest[rel_path]
+        )
+        if not current_manifest:
+            logger.info("RAG: Docs folder is now empty, incremental update not possible")
+            return False
+        if index_type == "hnsw" and (changed or removed):
+            logger.info("RAG: HNSW indexes cannot remove vectors, full rebuild needed")
+            return False
+
+        logger.info(
+            "RAG: Incremental index update: %d added, %d changed, %d removed file(s)",
+            len(added), len(changed), len(removed),
+        )
+        update_start_time = time.time()
+
+        documents = self._load_documents([self.docs_folder / rel_path for rel_path in added + changed])
+        new_chunks, new_metadata, new_ranges = self._chunk_documents(documents, first_id=next_id)
+        #checked before embedding, so a rebuild does not throw away embeddings paid for here
+        if index_type != index_config["type"] and index.ntotal + len(new_chunks) >= _IVFPQ_MIN_VECTORS:
+            logger.info("RAG: Corpus is now large enough for a %s index, full rebuild needed", index_config["type"])
+            return False
+        embeddings = _reduce_dimension(self._generate_embeddings(new_chunks)) if new_chunks else None
+        if embeddings is not None and embeddings.shape[1] != index.d:
+            logger.warning(
+                "RAG: Embedding dimension changed (%d -> %d), incremental update not possible",
+                index.d, embeddings.shape[1],
+            )
+            return False
+
+        #searches keep using the current index while the copy is edited, then the copy is swapped in
+        updated_index = self._editable_copy(index, positional_ids, mapped_file)
+        updated_ranges = dict(file_ranges)
+        removed_ranges: List[Tuple[int, int]] = []
+        removed_vectors = 0
+        for rel_path in changed + removed:
+            vector_range = updated_ranges.pop(rel_path, None)
+            if not vector_range or not vector_range["count"]:
+                continue
+            first_id, count = vector_range["first_id"], vector_range["count"]
+            removed_vectors += updated_index.remove_ids(faiss.IDSelectorRange(first_id, first_id + count))
+            removed_ranges.append((first_id, first_id + count))
+
+        if embeddings is not None:
+            updated_index.add_with_ids(
+                embeddings, np.fromiter(new_metadata.keys(), dtype=np.int64, count=len(new_metadata))
+            )
+        updated_ranges.update(new_ranges)
+
+        if updated_index.ntotal == 0:
+            logger.info("RAG: No indexable documents left after the update, full rebuild needed")
+            return False
+
+        #the published chunk store keeps serving the current version (here and in other workers),
+        #so the update goes into a private copy that is swapped in with the index
+        updated_store = chunk_store.copy(str(self._chunk_store_path(building=True)) if self.index_path else None)
+        updated_store.put_many(new_metadata)
+        for first_id, end_id in removed_ranges:
+            updated_store.delete_range(first_id, end_id)
+
+        with self._lock:
+            self.index = updated_index
+            self._index_mmapped = False
+            self.chunk_store = updated_store
+            self._file_ranges = updated_ranges
+            self._next_id = next_id + len(new_chunks)
+            self._positional_ids = False
+            self._docs_manifest = current_manifest
+
+        logger.info(
+            "RAG: Incremental update complete in %.2fs: embedded %d chunk(s) from %d file(s), "
+            "removed %d vector(s), index now %d vectors",
+            time.time() - update_start_time,
+            len(new_chunks),
+            len(documents),
+            removed_vectors,
+            updated_index.ntotal,
+        )
 
-    #function to derive blob names for index, metadata and manifest
-    def _get_blob_names(self) -> Tuple[str, str, str]:
+        if self.index_path:
+            self.save_index()
+        return True
+
+    #function to copy an index for editing, converting a positional (pre-id) flat index to an id-mapped one;
+    #mapped_file is the file a memory-mapped index was read from
+    def _editable_copy(
+        self,
+        index: faiss.Index,
+        positional_ids: bool,
+        mapped_file: Optional[Path] = None,
+    ) -> faiss.Index:
+        if not positional_ids:
+            #a memory-mapped index can be neither cloned nor serialized (IVF-PQ lists live on disk), so the
+            #editable copy is read from its file into memory
+            if mapped_file is not None:
+                updated_index = faiss.read_index(str(mapped_file))
+            else:
+                updated_index = faiss.clone_index(index)
+            self._configure_search(updated_index)
+            return updated_index
+        #indexes written before vector ids existed use the row position as id
+        converted = self._new_index(index.d)
+        if index.ntotal:
+            converted.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype=np.int64))
+        return converted
+
+    #function to derive per-file vector ranges from positional metadata of an index built before ranges existed
+    def _file_ranges_from_metadata(
+        self,
+        metadata: Dict[int, Dict[str, Any]],
+    ) -> Optional[Dict[str, Dict[str, int]]]:
+        file_ranges: Dict[str, Dict[str, int]] = {}
+        for vector_id in sorted(metadata):
+            try:
+                rel_path = str(Path(metadata[vector_id]["file_path"]).relative_to(self.docs_folder))
+            except (KeyError, ValueError):
+                return None
+            vector_range = file_ranges.setdefault(rel_path, {"first_id": vector_id, "count": 0})
+            #chunks of one file were written consecutively; anything else cannot be expressed as a range
+            if vector_range["first_id"] + vector_range["count"] != vector_id:
+                return None
+            vector_range["count"] += 1
+        return file_ranges
+
+    #function to get the local path of one index artifact (e.g. "index", "metadata.pkl") of a version;
+    #version None is the unversioned layout written before versions existed
+    def _artifact_path(self, suffix: str, version: Optional[str] = None) -> Path:
+        base_name = self.index_path.name if version is None else f"{self.index_path.name}.{version}"
+        return self.index_path.with_name(f"{base_name}.{suffix}")
+
+    #function to get the local path of a chunk store (building=True for a private store still being written)
+    def _chunk_store_path(self, version: Optional[str] = None, building: bool = False) -> Path:
+        if building:
+            return self._artifact_path(f"chunks.{os.getpid()}.building.sqlite3")
+        return self._artifact_path("chunks.sqlite3", version)
+
+    #function to read which index version is current (None when no version was published yet)
+    def _current_version(self) -> Optional[str]:
+        try:
+            return self._artifact_path("current").read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    #function to make a fully written version current with one atomic rename of the pointer file
+    def _publish_version(self, version: str) -> None:
+        pointer_path = self._artifact_path("current")
+        tmp_path = pointer_path.with_name(f"{pointer_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(version, encoding="utf-8")
+        os.replace(tmp_path, pointer_path)
+
+    #function to hold the build lock shared by all processes using this index path; yields False
+    #without waiting when blocking=False and another thread or process holds it
+    @contextmanager
+    def _build_lock(self, blocking: bool = True) -> Iterator[bool]:
+        if not self._build_mutex.acquire(blocking=blocking):
+            yield False
+            return
+        try:
+            lock_path = self._artifact_path("build.lock")
+            lock_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(lock_path, "a+b") as f:
+                if FCNTL_AVAILABLE:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        yield False
+                        return
+                try:
+                    yield True
+                finally:
+                    if FCNTL_AVAILABLE:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._build_mutex.release()
+
+    #function to delete index versions beyond RAG_INDEX_KEEP_VERSIONS (workers still serving one keep their
+    #open handles) and the unversioned files a published version replaces
+    def _remove_old_versions(self, current_version: str) -> None:
+        prefix = f"{self.index_path.name}.v"
+        versions = set()
+        for path in self.index_path.parent.glob(f"{prefix}*"):
+            version = "v" + path.name[len(prefix):].split(".", 1)[0]
+            if version[1:].isdigit():
+                versions.add(version)
+        keep = set(sorted(versions, key=lambda v: int(v[1:]))[-RAG_INDEX_KEEP_VERSIONS:]) | {current_version}
+        stale_paths = [
+            path for path in self.index_path.parent.glob(f"{prefix}*")
+            if "v" + path.name[len(prefix):].split(".", 1)[0] in versions - keep
+        ]
+        stale_paths += [
+            self._artifact_path(suffix) for suffix in ("index", "metadata.pkl", "docs_manifest.pkl", "chunks.sqlite3")
+        ]
+        for path in stale_paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("RAG: Could not remove old index file %s: %s", path, e)
+
+    #function to read a saved index of the given type, memory-mapped read-only when enabled and supported by
+    #the installed faiss; returns (index, mapped)
+    def _read_index_file(self, index_file: Path, index_type: str) -> Tuple[faiss.Index, bool]:
+        if RAG_INDEX_MMAP:
+            if index_type == "ivfpq":
+                flags = _MMAP_IVF_FLAGS
+            elif _MMAP_IFC_FLAG is not None:
+                flags = _MMAP_IFC_FLAG | faiss.IO_FLAG_READ_ONLY
+            else:
+                flags = None
+                logger.warning(
+                    "RAG: faiss %s cannot memory-map %s indexes (needs faiss >= 1.11); reading %s into memory",
+                    getattr(faiss, "__version__", "?"), index_type, index_file,
+                )
+            if flags is not None:
+                try:
+                    return faiss.read_index(str(index_file), flags), True
+                except RuntimeError as e:
+                    logger.warning("RAG: Could not memory-map %s (%s); reading it into memory", index_file, e)
+        return faiss.read_index(str(index_file)), False
+
+    #function to derive blob names for index, metadata, manifest and chunk store
+    def _get_blob_names(self) -> Tuple[str, str, str, str]:
         if self.index_path:
             base_name = self.index_path.name
         else:
@@ -397,9 +1303,11 @@ class RAGSystem:
             f"{base_name}.index",
             f"{base_name}.metadata.pkl",
             f"{base_name}.docs_manifest.pkl",
+            f"{base_name}.chunks.sqlite3",
         )
 
-    #function to save FAISS index, metadata and manifest locally and optionally to Azure
+    #function to save FAISS index, metadata and manifest as a new local version (made current atomically
+    #once every file is written) and optionally to Azure
     def save_index(self) -> None:
         if self.index_path is None:
             raise ValueError("index_path not set, cannot save index")
@@ -410,26 +1318,68 @@ class RAGSystem:
         logger.info("Saving index to: %s", self.index_path)
         self.index_path.parent.mkdir(parents=True, exist_ok=True)
 
-        index_file_path = Path(str(self.index_path) + ".index")
-        faiss.write_index(self.index, str(index_file_path))
+        with self._lock:
+            index, chunk_store = self.index, self.chunk_store
+            file_ranges, next_id = self._file_ranges, self._next_id
+            index_type, positional_ids = self._index_type, self._positional_ids
+            index_config = self._index_config
+            docs_manifest = self._docs_manifest
+            mapped_file = self._artifact_path("index", self._version) if self._index_mmapped else None
+
+        #every save writes a new set of files, so the files other workers have open or mapped are never
+        #touched; the pointer file then switches readers to the new version in one rename
+        version = f"v{time.time_ns() // 1_000_000}"
+        index_file_path = self._artifact_path("index", version)
+        if mapped_file is not None:
+            #writing a mapped IVF-PQ index would store a reference to its on-disk lists, not the lists
+            shutil.copyfile(mapped_file, index_file_path)
+        else:
+            faiss.write_index(index, str(index_file_path))
+
+        chunk_store_path = self._chunk_store_path(version)
+        chunk_store.publish(str(chunk_store_path))
 
-        metadata_path = self.index_path.with_suffix(".metadata.pkl")
+        #chunk texts live in the chunk store; the pickle only keeps the small per-file bookkeeping
+        metadata_path = self._artifact_path("metadata.pkl", version)
         with open(metadata_path, "wb") as f:
-            pickle.dump(self.metadata, f)
+            pickle.dump(
+                {
+                    "files": file_ranges,
+                    "next_id": next_id,
+                    "index_type": index_type,
+                    "index_config": index_config,
+                    "positional_ids": positional_ids,
+                },
+                f,
+            )
 
-        manifest_path = self.index_path.with_suffix(".docs_manifest.pkl")
-        docs_manifest = self._compute_docs_manifest()
+        manifest_path = self._artifact_path("docs_manifest.pkl", version)
+        if docs_manifest is None:
+            docs_manifest = self._compute_docs_manifest()
+            self._docs_manifest = docs_manifest
         with open(manifest_path, "wb") as f:
             pickle.dump(docs_manifest, f)
 
+        self._publish_version(version)
+        mapped_index, mapped = self._read_index_file(index_file_path, index_type) if RAG_INDEX_MMAP else (None, False)
+        with self._lock:
+            self._version = version
+            #swap in the mapping of what was just saved, unless an update replaced the index meanwhile
+            if mapped and self.index is index:
+                self._configure_search(mapped_index)
+                self.index = mapped_index
+                self._index_mmapped = True
+
         logger.info(
-            "Saved index, metadata, and docs manifest locally (%d docs)",
+            "Saved index, metadata, chunk store and docs manifest locally as version %s (%d docs)",
+            version,
             len(docs_manifest),
         )
+        self._remove_old_versions(version)
 
         if self.azure_blob and self.azure_blob.is_available():
             try:
-                index_blob_name, metadata_blob_name, manifest_blob_name = self._get_blob_names()
+                index_blob_name, metadata_blob_name, manifest_blob_name, chunks_blob_name = self._get_blob_names()
                 
                 if index_file_path.exists():
                     success = self.azure_blob.upload_file(
@@ -463,17 +1413,29 @@ class RAGSystem:
                         logger.info("Uploaded docs manifest to Azure Blob Storage: %s", manifest_blob_name)
                     else:
                         logger.warning("Failed to upload docs manifest to Azure Blob Storage")
+
+                if chunk_store_path.exists():
+                    success = self.azure_blob.upload_file(
+                        blob_name=chunks_blob_name,
+                        file_path=chunk_store_path,
+                        overwrite=True,
+                    )
+                    if success:
+                        logger.info("Uploaded chunk store to Azure Blob Storage: %s", chunks_blob_name)
+                    else:
+                        logger.warning("Failed to upload chunk store to Azure Blob Storage")
             except Exception as e:
                 logger.warning("Failed to save index to Azure Blob Storage: %s", str(e))
 
-    #function to load index and metadata from local files or Azure Blob Storage
+    #function to load the current index version and metadata from local files or Azure Blob Storage
     def load_index(self) -> None:
         if self.index_path is None:
             raise ValueError("index_path not set, cannot load index")
 
-        index_file = Path(str(self.index_path) + ".index")
-        metadata_file = self.index_path.with_suffix(".metadata.pkl")
-        manifest_file = self.index_path.with_suffix(".docs_manifest.pkl")
+        version = self._current_version()
+        index_file = self._artifact_path("index", version)
+        metadata_file = self._artifact_path("metadata.pkl", version)
+        chunk_store_file = self._chunk_store_path(version)
 
         local_files_exist = index_file.exists() and metadata_file.exists()
         
@@ -481,10 +1443,16 @@ class RAGSystem:
         if not local_files_exist:
             if self.azure_blob and self.azure_blob.is_available():
                 try:
-                    index_blob_name, metadata_blob_name, manifest_blob_name = self._get_blob_names()
+                    index_blob_name, metadata_blob_name, manifest_blob_name, chunks_blob_name = self._get_blob_names()
                     
                     if self.azure_blob.blob_exists(index_blob_name) and self.azure_blob.blob_exists(metadata_blob_name):
                         logger.info("RAG: Local index not found, downloading from Azure Blob Storage...")
+                        #downloads go into a new version that only becomes current once index and metadata are in
+                        version = f"v{time.time_ns() // 1_000_000}"
+                        index_file = self._artifact_path("index", version)
+                        metadata_file = self._artifact_path("metadata.pkl", version)
+                        manifest_file = self._artifact_path("docs_manifest.pkl", version)
+                        chunk_store_file = self._chunk_store_path(version)
                         
                         index_data = self.azure_blob.download_bytes(index_blob_name)
                         if index_data:
@@ -509,6 +1477,16 @@ class RAGSystem:
                                 with open(manifest_file, "wb") as f:
                                     f.write(manifest_data)
                                 logger.info("RAG: Downloaded docs manifest from Azure Blob Storage")
+
+                            if self.azure_blob.blob_exists(chunks_blob_name):
+                                chunks_data = self.azure_blob.download_bytes(chunks_blob_name)
+                                if chunks_data:
+                                    with open(chunk_store_file, "wb") as f:
+                                        f.write(chunks_data)
+                                    logger.info("RAG: Downloaded chunk store from Azure Blob Storage")
+
+                            if loaded_from_azure:
+                                self._publish_version(version)
                         else:
                             logger.warning("RAG: Failed to download index from Azure Blob Storage")
                     else:
@@ -528,27 +1506,124 @@ class RAGSystem:
         else:
             logger.info("RAG: Loading index from local files: %s", index_file)
 
-        self.index = faiss.read_index(str(index_file))
-
         with open(metadata_file, "rb") as f:
-            self.metadata = pickle.load(f)
+            stored_metadata = pickle.load(f)
+
+        #the index type decides how the index file can be memory-mapped
+        stored_type = "flat" if isinstance(stored_metadata, list) else stored_metadata.get("index_type", "flat")
+        index, mapped = self._read_index_file(index_file, stored_type)
+        self._configure_search(index)
+
+        #older indexes kept every chunk in the pickle; those are moved into a chunk store once
+        legacy_chunks: Optional[Dict[int, Dict[str, Any]]] = None
+        if isinstance(stored_metadata, list):
+            #written before vector ids existed: ids are row positions and ranges are derived per file
+            legacy_chunks = dict(enumerate(stored_metadata))
+            file_ranges = self._file_ranges_from_metadata(legacy_chunks)
+            next_id = len(stored_metadata)
+            index_type, positional_ids = "flat", True
+            index_config = {"type": "flat", "dimension": index.d, "quantization": "none"}
+        else:
+            legacy_chunks = stored_metadata.get("chunks")
+            file_ranges = stored_metadata.get("files")
+            next_id = stored_metadata.get("next_id", max(legacy_chunks or [-1]) + 1)
+            index_type = stored_metadata.get("index_type", "flat")
+            positional_ids = stored_metadata.get("positional_ids", False)
+            index_config = stored_metadata.get(
+                "index_config", {"type": index_type, "dimension": index.d, "quantization": "none"}
+            )
+
+        if legacy_chunks is not None:
+            building_path = self._chunk_store_path(building=True)
+            if building_path.exists():
+                building_path.unlink()
+            chunk_store = ChunkStore(str(building_path), building=True)
+            chunk_store.put_many(legacy_chunks)
+            chunk_store.publish(str(chunk_store_file))
+            logger.info("RAG: Moved %d chunks from %s into %s", len(legacy_chunks), metadata_file, chunk_store_file)
+        elif chunk_store_file.exists():
+            chunk_store = ChunkStore(str(chunk_store_file))
+        else:
+            raise FileNotFoundError(f"Chunk store not found: {chunk_store_file}")
+
+        with self._lock:
+            self.index = index
+            self._index_mmapped = mapped
+            self.chunk_store = chunk_store
+            self._file_ranges = file_ranges
+            self._next_id = next_id
+            self._index_type = index_type
+            self._index_config = index_config
+            self._positional_ids = positional_ids
+            self._last_recall_check = None
+            #the manifest the loaded index reflects is only known once ensure_index_up_to_date reads it
+            self._docs_manifest = None
+            self._version = version
 
         source = "Azure Blob Storage" if loaded_from_azure else "local files"
         logger.info(
-            "RAG: Loaded index with %d vectors and %d metadata entries from %s (docs_folder=%s)",
-            self.index.ntotal,
-            len(self.metadata),
+            "RAG: Loaded index version %s with %d vectors and %d chunks from %s (docs_folder=%s)",
+            version or "unversioned",
+            index.ntotal,
+            len(chunk_store),
             source,
             self.docs_folder,
         )
 
-    #function to ensure local index is up-to-date with docs folder, rebuilding if needed
+    #function to ensure local index is up-to-date with docs folder, rebuilding if needed (waits for the
+    #build lock, so concurrent callers in any process never build the same index twice)
     def ensure_index_up_to_date(self) -> None:
         if self.index_path is None:
             raise ValueError("index_path not set, cannot ensure index up to date")
 
-        index_file = Path(str(self.index_path) + ".index")
-        manifest_file = self.index_path.with_suffix(".docs_manifest.pkl")
+        with self._build_lock():
+            self._ensure_index_up_to_date_locked()
+
+    #function to bring the index up to date from a background worker: returns at once when another thread
+    #or process holds the build lock, picking up the version it last published instead
+    def refresh_index(self) -> None:
+        if self.index_path is None:
+            raise ValueError("index_path not set, cannot refresh index")
+
+        with self._build_lock(blocking=False) as acquired:
+            if acquired:
+                self._ensure_index_up_to_date_locked()
+                return
+        logger.info("RAG: Index build already running elsewhere; serving the current version meanwhile")
+        if self._current_version() not in (None, self._version):
+            self.load_index()
+
+    #function to load the current index version, building one only when none exists yet (searches can
+    #start on an existing index while a background refresh catches up with docs changes)
+    def load_or_build(self) -> None:
+        try:
+            self.load_index()
+        except FileNotFoundError:
+            self.ensure_index_up_to_date()
+
+    #function to run a full checkpointed rebuild, resuming an interrupted one unless resume=False; returns
+    #False without building when another thread or process holds the build lock
+    def rebuild_index(
+        self,
+        resume: bool = True,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> bool:
+        with self._build_lock(blocking=False) as acquired:
+            if not acquired:
+                logger.warning("RAG: Another build of %s is running, not rebuilding", self.index_path)
+                return False
+            if not resume:
+                self._remove_build_checkpoint()
+            self.build_index(checkpoint=True, progress=progress)
+        return True
+
+    #function to update the index from the docs folder; caller holds the build lock
+    def _ensure_index_up_to_date_locked(self) -> None:
+        #an index that is already loaded is compared against the manifest it was built or updated from,
+        #unless another process has published a newer version meanwhile
+        if self.index is not None and self._docs_manifest is not None and self._current_version() == self._version:
+            self._apply_docs_changes(self._docs_manifest, self._artifact_path("index", self._version))
+            return
 
         try:
             self.load_index()
@@ -561,6 +1636,8 @@ class RAGSystem:
             self.build_index()
             return
 
+        index_file = self._artifact_path("index", self._version)
+        manifest_file = self._artifact_path("docs_manifest.pkl", self._version)
         if not manifest_file.exists():
             logger.info(
                 "RAG: Docs manifest not found alongside index (%s). "
@@ -583,9 +1660,22 @@ class RAGSystem:
             self.build_index()
             return
 
+        self._apply_docs_changes(stored_manifest, index_file)
+
+    #function to compare the docs folder with the manifest of the loaded index and update or rebuild on changes
+    def _apply_docs_changes(self, stored_manifest: Dict[str, Dict[str, Any]], index_file: Path) -> None:
+        if self._index_config != _configured_index():
+            logger.info(
+                "RAG: Index at %s was built with %s but the settings ask for %s. Rebuilding index.",
+                index_file, self._index_config, _configured_index(),
+            )
+            self.build_index()
+            return
+
         current_manifest = self._compute_docs_manifest()
 
         if stored_manifest == current_manifest:
+            self._docs_manifest = current_manifest
             logger.info(
                 "RAG: Docs folder unchanged since last index build (%d docs). "
                 "Reusing existing index from %s.",
@@ -596,87 +1686,249 @@ class RAGSystem:
 
         logger.info(
             "RAG: Docs folder changed since last index build "
-            "(previous=%d docs, current=%d docs). Rebuilding index.",
+            "(previous=%d docs, current=%d docs). Updating index.",
             len(stored_manifest),
             len(current_manifest),
         )
-        self.build_index()
+        try:
+            updated = self.update_index(stored_manifest, current_manifest)
+        except Exception as e:
+            logger.warning("RAG: Incremental index update failed (%s). Rebuilding index.", e)
+            updated = False
+        if not updated:
+            self.build_index()
 
-    #function to search the FAISS index for nearest chunks for a query
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        if self.index is None:
+    #function to report whether the docs folder changed since the index was built or verified, or another
+    #process published a newer index version
+    def is_stale(self) -> bool:
+        if self._docs_manifest is None:
+            return True
+        if self.index_path is not None and self._current_version() not in (None, self._version):
+            return True
+        return self._compute_docs_manifest() != self._docs_manifest
+
+    #function to search the index for a query (mode: vector, lexical or hybrid; None uses RAG_RETRIEVAL_MODE)
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        mode: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.search_many([query], k=k, mode=mode, filters=filters)[0]
+
+    #function to search several queries at once (one batched embedding call for all cache misses and one
+    #matrix search; lexical lookups need no API call), returning one result list per query in input order;
+    #filters ({"file_name" | "path_prefix" | "extension": value or list of values}) restrict every retriever
+    #to the matching chunks inside the search itself, so k results come back whenever k chunks match
+    def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        mode: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+
+        query_hashes = [self._get_query_hash(query) for query in queries]
+        unique_hashes: List[str] = []
+        unique_queries: List[str] = []
+        seen_hashes = set()
+        for query, query_hash in zip(queries, query_hashes):
+            #a blank query would fail the whole embedding request, so it just gets no results
+            if not query or not query.strip():
+                continue
+            if query_hash not in seen_hashes:
+                seen_hashes.add(query_hash)
+                unique_hashes.append(query_hash)
+                unique_queries.append(query)
+
+        with self._lock:
+            index, chunk_store, file_ranges = self.index, self.chunk_store, self._file_ranges
+
+        if index is None:
             raise ValueError("Index not built. Call build_index() or load_index() first.")
 
-        if not self.metadata:
+        if chunk_store is None:
             raise ValueError("Metadata not loaded. Call build_index() or load_index() first.")
 
-        query_length = len(query)
-        query_hash = self._get_query_hash(query)
+        selected_ids: Optional[np.ndarray] = None
+        if filters:
+            if file_ranges is None:
+                raise ValueError("The index has no per-file vector ranges to filter on; rebuild it")
+            selected_ids = self._get_filter_index(file_ranges).select(filters)
+
+        mode = (mode or RAG_RETRIEVAL_MODE).lower()
+        if mode not in _RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if mode != "vector" and not chunk_store.lexical_available:
+            logger.warning("RAG: Lexical index unavailable; falling back from %s to vector retrieval", mode)
+            mode = "vector"
+        candidates = max(k, RAG_HYBRID_CANDIDATES) if mode == "hybrid" else k
+
         logger.info(
-            "RAG search: query_length=%d chars, k=%d, index_size=%d vectors",
-            query_length, k, self.index.ntotal
+            "RAG search: %d queries (%d unique), k=%d, mode=%s, index_size=%d vectors%s",
+            len(queries), len(unique_queries), k, mode, index.ntotal,
+            "" if selected_ids is None else f", filters={filters} ({len(selected_ids)} matching chunks)",
         )
-        logger.debug("Query text (first 200 chars): %s", query[:200])
-
-        embedding_start = time.time()
-        if query_hash in self._query_embedding_cache:
-            logger.debug("Query embedding cache HIT (hash=%s)", query_hash[:16])
-            query_embedding = self._query_embedding_cache[query_hash]
-            query_vector = query_embedding.reshape(1, -1).astype(np.float32)
-            embedding_elapsed = time.time() - embedding_start
-            logger.debug("Query embedding loaded from cache in %.2fs, dimension=%d", embedding_elapsed, query_vector.shape[1])
-        else:
-            logger.debug("Query embedding cache MISS (hash=%s) - generating new embedding", query_hash[:16])
-            query_embedding = self._generate_embeddings([query])
-            query_vector = query_embedding.reshape(1, -1).astype(np.float32)
-            embedding_elapsed = time.time() - embedding_start
-            self._query_embedding_cache[query_hash] = query_embedding[0]
-            self._save_query_cache()
-            logger.debug("Query embedding generated in %.2fs, dimension=%d (cached for future use)", embedding_elapsed, query_vector.shape[1])
-
-        logger.debug("Searching FAISS index...")
+
         search_start = time.time()
-        search_k = min(k, self.index.ntotal)
-        distances, indices = self.index.search(query_vector, search_k)
-        search_elapsed = time.time() - search_start
-        logger.debug("FAISS search completed in %.2fs, found %d results", search_elapsed, len(indices[0]))
+        vector_hits: List[List[Tuple[int, float]]] = [[] for _ in unique_hashes]
+        embedding_elapsed = 0.0
+        #a filter that matches nothing needs neither an embedding call nor a search
+        if unique_queries and mode != "lexical" and (selected_ids is None or len(selected_ids)):
+            query_matrix = self._query_embeddings(index, unique_hashes, unique_queries)
+            embedding_elapsed = time.time() - search_start
+            if selected_ids is None:
+                distances, indices = index.search(query_matrix, min(candidates, index.ntotal))
+            else:
+                #the selector has to outlive the search that uses it
+                selector = faiss.IDSelectorBatch(len(selected_ids), faiss.swig_ptr(selected_ids))
+                distances, indices = index.search(
+                    query_matrix,
+                    min(candidates, len(selected_ids)),
+                    params=self._filtered_search_params(index, selector, len(selected_ids)),
+                )
+            vector_hits = [
+                [(int(idx), float(distance)) for distance, idx in zip(distances[row], indices[row]) if idx >= 0]
+                for row in range(len(unique_hashes))
+            ]
+
+        lexical_hits: List[List[Tuple[int, float]]] = [[] for _ in unique_hashes]
+        if mode != "vector":
+            ranges = None if selected_ids is None else id_ranges(selected_ids)
+            lexical_hits = [chunk_store.search_lexical(query, candidates, ranges) for query in unique_queries]
+
+        ranked = [
+            self._rank_hits(mode, vector_row, lexical_row, k)
+            for vector_row, lexical_row in zip(vector_hits, lexical_hits)
+        ]
+        search_elapsed = time.time() - search_start - embedding_elapsed
+
+        #only the chunks that made the top-k are read from the chunk store, in one lookup for all queries
+        metadata_by_id = chunk_store.get_many({vector_id for hits in ranked for vector_id, _ in hits})
+        results_by_hash: Dict[str, List[Dict[str, Any]]] = {}
+        for query_hash, hits in zip(unique_hashes, ranked):
+            results_by_hash[query_hash] = self._format_results(hits, metadata_by_id)
+
+        logger.info(
+            "RAG search complete: %d queries, %d results returned in %.2fs (embedding: %.2fs, search: %.2fs)",
+            len(queries),
+            sum(len(r) for r in results_by_hash.values()),
+            time.time() - search_start,
+            embedding_elapsed,
+            search_elapsed,
+        )
 
+        #duplicate queries get their own copies so callers can annotate results independently
+        return [[dict(r) for r in results_by_hash.get(h, [])] for h in query_hashes]
+
+    #function to get the precomputed filter id sets of an index, building them once per set of file ranges
+    def _get_filter_index(self, file_ranges: Dict[str, Dict[str, int]]) -> MetadataFilterIndex:
+        cached = self._filter_index
+        if cached is not None and cached[0] is file_ranges:
+            return cached[1]
+        filter_start = time.time()
+        filter_index = MetadataFilterIndex(file_ranges)
+        self._filter_index = (file_ranges, filter_index)
+        logger.info(
+            "RAG: Precomputed filter id sets for %d file(s) in %.3fs: %s",
+            len(file_ranges), time.time() - filter_start, filter_index.stats(),
+        )
+        return filter_index
+
+    #function to build search parameters that restrict a search to the selected ids; graph and cluster
+    #searches look further the fewer vectors pass the filter, so a narrow filter still fills k results
+    def _filtered_search_params(
+        self,
+        index: faiss.Index,
+        selector: faiss.IDSelector,
+        selected: int,
+    ) -> faiss.SearchParameters:
+        boost = min(max(index.ntotal / max(selected, 1), 1.0), max(RAG_FILTER_SEARCH_BOOST, 1.0))
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=int(RAG_HNSW_EF_SEARCH * boost))
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=min(int(RAG_IVF_NPROBE * boost), inner.nlist))
+        return faiss.SearchParameters(sel=selector)
+
+    #function to get query embeddings at the index dimension, embedding only query cache misses in one batch
+    def _query_embeddings(self, index: faiss.Index, query_hashes: List[str], queries: List[str]) -> np.ndarray:
+        #cached query vectors are stored at the index dimension, so the dimension is part of the cache model key
+        cache_model = f"{self._embedding_deployment()}@{index.d}"
+        query_cache = self._get_query_cache()
+        cached = query_cache.get_many(cache_model, query_hashes) if query_cache is not None else {}
+        misses = [(h, q) for h, q in zip(query_hashes, queries) if h not in cached]
+        if misses:
+            logger.debug(
+                "Query embedding cache: %d hit(s), %d miss(es) - embedding misses in one batch",
+                len(query_hashes) - len(misses), len(misses),
+            )
+            #queries have their own cache; only document chunks go to the persistent embedding store
+            new_embeddings = _reduce_dimension(self._generate_embeddings([q for _, q in misses], persist=False), index.d)
+            fresh = {query_hash: embedding for (query_hash, _), embedding in zip(misses, new_embeddings)}
+            cached.update(fresh)
+            if query_cache is not None:
+                query_cache.put_many(cache_model, fresh)
+        else:
+            logger.debug("Query embedding cache HIT for all %d queries", len(query_hashes))
+        return np.stack([cached[h] for h in query_hashes]).astype(np.float32)
+
+    #function to pick the top-k (vector_id, scores) of one query; hybrid fuses both rankings with
+    #reciprocal rank fusion, which needs no calibration between inner-product and BM25 scores
+    def _rank_hits(
+        self,
+        mode: str,
+        vector_hits: List[Tuple[int, float]],
+        lexical_hits: List[Tuple[int, float]],
+        k: int,
+    ) -> List[Tuple[int, Dict[str, float]]]:
+        if mode == "vector":
+            #squared L2 between unit vectors: 1 - d/2 is the cosine similarity, so higher scores rank first
+            return [
+                (vector_id, {"distance": distance, "score": 1.0 - distance / 2.0})
+                for vector_id, distance in vector_hits[:k]
+            ]
+        if mode == "lexical":
+            return [(vector_id, {"bm25": bm25, "score": bm25}) for vector_id, bm25 in lexical_hits[:k]]
+
+        fused: Dict[int, Dict[str, float]] = {}
+        for hits, field in ((vector_hits, "distance"), (lexical_hits, "bm25")):
+            for rank, (vector_id, value) in enumerate(hits):
+                scores = fused.setdefault(vector_id, {"score": 0.0})
+                scores[field] = value
+                scores["score"] += 1.0 / (RAG_HYBRID_RRF_K + rank + 1)
+        return sorted(fused.items(), key=lambda item: item[1]["score"], reverse=True)[:k]
+
+    #function to turn ranked (vector_id, scores) hits into result dicts
+    def _format_results(
+        self,
+        hits: List[Tuple[int, Dict[str, float]]],
+        metadata_by_id: Dict[int, Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
         results = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.metadata):
-                metadata = self.metadata[idx]
+        for vector_id, scores in hits:
+            metadata = metadata_by_id.get(vector_id)
+            if metadata is not None:
                 chunk_text = metadata.get("chunk_text", "")
                 result = {
-                    "rank": i + 1,
+                    "rank": len(results) + 1,
                     "chunk_text": chunk_text,
                     "file_name": metadata.get("file_name", ""),
                     "file_path": metadata.get("file_path", ""),
                     "chunk_index": metadata.get("chunk_index", 0),
-                    "distance": float(distance),
+                    **scores,
                 }
                 results.append(result)
                 logger.debug(
-                    "Result %d: file=%s, chunk=%d/%d, distance=%.4f, chunk_length=%d chars",
-                    i + 1, result["file_name"], result["chunk_index"] + 1,
-                    metadata.get("total_chunks", 0), distance, len(chunk_text)
+                    "Result %d: file=%s, chunk=%d/%d, score=%.4f, chunk_length=%d chars",
+                    result["rank"], result["file_name"], result["chunk_index"] + 1,
+                    metadata.get("total_chunks", 0), scores["score"], len(chunk_text)
                 )
             else:
-                logger.warning("Index %d out of bounds (metadata size: %d)", idx, len(self.metadata))
-
-        total_elapsed = time.time() - embedding_start
-        logger.info(
-            "RAG search complete: %d results returned in %.2fs (embedding: %.2fs, search: %.2fs)",
-            len(results), total_elapsed, embedding_elapsed, search_elapsed
-        )
-        
-        if results:
-            logger.debug(
-                "Result distance range: min=%.4f, max=%.4f, avg=%.4f",
-                min(r["distance"] for r in results),
-                max(r["distance"] for r in results),
-                sum(r["distance"] for r in results) / len(results)
-            )
-        
+                logger.warning("Vector id %d has no chunk in the chunk store", vector_id)
         return results
 
     #function to return basic statistics about the loaded index and metadata
@@ -684,14 +1936,203 @@ class RAGSystem:
         stats = {
             "index_built": self.index is not None,
             "num_vectors": self.index.ntotal if self.index else 0,
-            "num_metadata_entries": len(self.metadata),
-            "embedding_dimension": EMBEDDING_DIMENSION,
+            "num_metadata_entries": len(self.chunk_store) if self.chunk_store else 0,
+            "embedding_dimension": self.index.d if self.index else EMBEDDING_DIMENSION,
             "embedding_model": EMBEDDING_MODEL,
+            "index_type": self._index_type,
+            "quantization": self._index_config.get("quantization", "none"),
+            "index_mmapped": self._index_mmapped,
+            "index_version": self._version,
+            "retrieval_mode": RAG_RETRIEVAL_MODE,
+            "lexical_index": bool(self.chunk_store and self.chunk_store.lexical_available),
         }
+        if self._last_recall_check is not None:
+            stats["recall_check"] = self._last_recall_check
+
+        if self.chunk_store:
+            stats["num_documents"] = self.chunk_store.count_files()
+
+        if self._query_cache is not None:
+            stats["query_cache"] = self._query_cache.stats()
 
-        if self.metadata:
-            unique_files = set(m.get("file_name") for m in self.metadata)
-            stats["num_documents"] = len(unique_files)
+        if self._docs_watcher is not None:
+            stats["docs_watcher"] = self._docs_watcher.stats()
+
+        if self._filter_index is not None and self._filter_index[0] is self._file_ranges:
+            stats["filter_values"] = self._filter_index[1].stats()
 
         return stats
 
+
+_SHARED_RAG: Optional[RAGSystem] = None
+_SHARED_RAG_LOCK = threading.Lock()
+_SHARED_RAG_STATE: Dict[str, Any] = {
+    "status": "cold",
+    "error": None,
+    "loaded_at": None,
+    "load_seconds": None,
+    "last_checked": 0.0,
+    "refreshing": False,
+    "refresh_pending": False,
+}
+#set on shutdown: a load still running in a worker thread then finishes without publishing its RAG system,
+#and no new loads or refreshes start
+_SHARED_RAG_STOPPING = threading.Event()
+#guards publishing the loaded system against a concurrent shutdown (the load itself holds _SHARED_RAG_LOCK
+#for as long as it runs, which shutdown must not wait for)
+_SHARED_RAG_PUBLISH_LOCK = threading.Lock()
+
+
+#function to create a RAG system over the project's docs folder and index files as served by the app
+#(docs_folder and index_path override them, e.g. for an offline build of another corpus)
+def create_shared_rag_system(
+    docs_folder: Optional[str] = None,
+    index_path: Optional[str] = None,
+    use_azure_blob: bool = True,
+) -> RAGSystem:
+    return RAGSystem(
+        docs_folder=docs_folder or str(_PROJECT_ROOT / "docs"),
+        index_path=index_path or str(_PROJECT_ROOT / "rag_index"),
+        query_cache_path=str(_PROJECT_ROOT / "rag_query_cache.sqlite3"),
+        use_azure_blob=use_azure_blob,
+    )
+
+
+#function to load the shared RAG system from disk (building the index if needed); caller holds the lock
+def _load_shared_rag_locked() -> None:
+    global _SHARED_RAG
+    _SHARED_RAG_STATE["status"] = "loading"
+    start_time = time.time()
+    try:
+        rag_system = create_shared_rag_system()
+        #an existing index is served right away and docs changes are picked up by the background refresh;
+        #without refreshes they are applied here once
+        if RAG_REFRESH_INTERVAL > 0:
+            rag_system.load_or_build()
+        else:
+            rag_system.ensure_index_up_to_date()
+    except Exception as e:
+        _SHARED_RAG = None
+        _SHARED_RAG_STATE.update(status="unavailable", error=str(e), loaded_at=time.time(), load_seconds=None)
+        logger.warning(
+            "Shared RAG system not available: %s. Make sure you have documents (PDF, DOCX, TXT) "
+            "in the 'docs' folder. Continuing without RAG.",
+            e,
+        )
+        return
+    with _SHARED_RAG_PUBLISH_LOCK:
+        if _SHARED_RAG_STOPPING.is_set():
+            _SHARED_RAG_STATE["status"] = "stopped"
+            logger.info("Shared RAG system: shut down while loading, not publishing the loaded index")
+            return
+        _SHARED_RAG = rag_system
+        if RAG_DOCS_WATCH:
+            rag_system.watch_docs(_on_shared_docs_changed)
+    now = time.time()
+    _SHARED_RAG_STATE.update(
+        status="ready",
+        error=None,
+        loaded_at=now,
+        load_seconds=round(now - start_time, 2),
+        #a loaded index was not compared with the docs folder yet, so the first refresh is due at once
+        last_checked=0.0 if rag_system._docs_manifest is None else now,
+    )
+    stats = rag_system.get_stats()
+    logger.info(
+        "Shared RAG system ready in %.2fs | docs=%s, vectors=%s, dim=%s, model=%s",
+        now - start_time,
+        stats.get("num_documents"),
+        stats.get("num_vectors"),
+        stats.get("embedding_dimension"),
+        stats.get("embedding_model"),
+    )
+
+
+#function to rebuild the shared index in the background when the docs folder changed (the old index keeps
+#serving searches until the new version is written and swapped in)
+def _refresh_shared_rag(rag_system: RAGSystem) -> None:
+    try:
+        if rag_system.is_stale():
+            logger.info("Shared RAG system: index may be stale, refreshing it in the background")
+            rag_system.refresh_index()
+    except Exception as e:
+        logger.warning("Shared RAG system: background refresh failed: %s", e)
+    finally:
+        with _SHARED_RAG_LOCK:
+            _SHARED_RAG_STATE["refreshing"] = False
+            _SHARED_RAG_STATE["last_checked"] = time.time()
+            #changes reported while this refresh ran get a refresh of their own
+            if _SHARED_RAG_STATE["refresh_pending"]:
+                _SHARED_RAG_STATE["refresh_pending"] = False
+                _start_refresh_locked(rag_system)
+
+
+#function to start the background refresh, or mark one pending if a refresh is running; caller holds the lock
+def _start_refresh_locked(rag_system: RAGSystem) -> None:
+    if _SHARED_RAG_STOPPING.is_set():
+        return
+    if _SHARED_RAG_STATE["refreshing"]:
+        _SHARED_RAG_STATE["refresh_pending"] = True
+        return
+    _SHARED_RAG_STATE["refreshing"] = True
+    threading.Thread(target=_refresh_shared_rag, args=(rag_system,), name="rag-refresh", daemon=True).start()
+
+
+#function to start a background staleness check when the refresh interval has elapsed (with the docs
+#watcher running this is an in-memory comparison plus a read of the version pointer)
+def _maybe_schedule_refresh() -> None:
+    if RAG_REFRESH_INTERVAL <= 0 or _SHARED_RAG is None:
+        return
+    with _SHARED_RAG_LOCK:
+        if _SHARED_RAG_STATE["refreshing"] or time.time() - _SHARED_RAG_STATE["last_checked"] < RAG_REFRESH_INTERVAL:
+            return
+        _start_refresh_locked(_SHARED_RAG)
+
+
+#function to refresh the shared index once the docs watcher reports settled changes
+def _on_shared_docs_changed() -> None:
+    with _SHARED_RAG_LOCK:
+        if _SHARED_RAG is not None:
+            _start_refresh_locked(_SHARED_RAG)
+
+
+#function to load the process-wide RAG system once (safe to call from several threads at startup)
+def warm_shared_rag_system() -> Optional[RAGSystem]:
+    if _SHARED_RAG_STOPPING.is_set():
+        return _SHARED_RAG
+    with _SHARED_RAG_LOCK:
+        status = _SHARED_RAG_STATE["status"]
+        retry_due = (
+            status == "unavailable"
+            and time.time() - (_SHARED_RAG_STATE["loaded_at"] or 0.0) >= RAG_RETRY_INTERVAL
+        )
+        if (status in ("cold", "loading") or retry_due) and not _SHARED_RAG_STOPPING.is_set():
+            _load_shared_rag_locked()
+    return _SHARED_RAG
+
+
+#function to get the process-wide RAG system (None when no index could be built)
+def get_shared_rag_system() -> Optional[RAGSystem]:
+    if _SHARED_RAG_STATE["status"] != "ready":
+        return warm_shared_rag_system()
+    _maybe_schedule_refresh()
+    return _SHARED_RAG
+
+
+#function to stop background work of the shared RAG system (docs watcher) on shutdown; a load still running
+#in another thread is not waited for, it finishes without publishing its result
+def shutdown_shared_rag_system() -> None:
+    with _SHARED_RAG_PUBLISH_LOCK:
+        _SHARED_RAG_STOPPING.set()
+        rag_system = _SHARED_RAG
+    if rag_system is not None:
+        rag_system.stop_watching_docs()
+
+
+#function to report whether the shared RAG index is loaded and warm (never waits for a load in progress)
+def rag_readiness() -> Dict[str, Any]:
+    state = {k: v for k, v in _SHARED_RAG_STATE.items() if k != "last_checked"}
+    rag_system = _SHARED_RAG
+    if rag_system is not None:
+        state["index"] = rag_system.get_stats()
+    return state
@@ -1,12 +1,13 @@
 import React, { useEffect, useState, useRef } from 'react'
 import { usePipeline } from '../context/PipelineContext'
-import { runPreprocess, runRequirements, buildQuery, generateResponse, createChatSession, updateRequirements, getSession, saveDocx } from '../services/api'
+import { runPreprocess, runRequirements, buildQuery, generateResponse, createChatSession, updateRequirements, getSession, saveDocx, streamPreviewResponses, updateResponse, generatePDFFromPreview } from '../services/api'
 import StatusPill from './StatusPill'
 import OutputDisplay from './OutputDisplay'
 import Button from './Button'
 import ChatInterface from './ChatInterface'
 import PreviewBox from './PreviewBox'
 import DocumentViewer from './DocumentViewer'
+import ResponsePreview from './ResponsePreview'
 import { formatPreprocessOutput, formatRequirementsOutput } from '../utils/formatters'
 import './AgentPanel.css'
 
@@ -71,6 +72,10 @@ export default function AgentPanel({ agentId }) {
   const [buildQueryDraft, setBuildQueryDraft] = useState('')
   const [questionsGenerated, setQuestionsGenerated] = useState(false)
   const [isGeneratingDocx, setIsGeneratingDocx] = useState(false)
+  const [isStreamingPreview, setIsStreamingPreview] = useState(false)
+  const [streamedResponses, setStreamedResponses] = useState([])
+  const [previewId, setPreviewId] = useState(null)
+  const [showResponsePreview, setShowResponsePreview] = useState(false)
   const generatingRef = useRef(false)
   const generationTimeoutRef = useRef(null)
   
@@ -398,6 +403,98 @@ export default function AgentPanel({ agentId }) {
     }
   }
 
+  // Handle streamed response preview: responses fill in as each requirement is generated
+  const handleStreamPreview = async () => {
+    if (isStreamingPreview || !pipelineData.preprocess || !pipelineData.requirements) return
+    setIsStreamingPreview(true)
+    setStreamedResponses([])
+    setPreviewId(null)
+    setShowResponsePreview(true)
+    setSummary('Generating response preview...')
+
+    // Events carry a 1-based requirement index, so each response keeps its slot whatever order they finish in
+    const setSlot = (index, update) => {
+      setStreamedResponses(prev => {
+        const next = [...prev]
+        next[index - 1] = update(next[index - 1] || { response: '' })
+        return next
+      })
+    }
+
+    try {
+      await streamPreviewResponses(
+        pipelineData.preprocess,
+        pipelineData.requirements,
+        { use_rag: true, num_retrieval_chunks: 5, session_id: chatSessionId },
+        (event, data) => {
+          switch (event) {
+            case 'begin':
+              setSummary(`Generating response preview for ${data.total} requirements...`)
+              break
+            case 'start':
+              setSlot(data.index, slot => ({ ...slot, requirement_id: data.requirement_id }))
+              break
+            case 'delta':
+              setSlot(data.index, slot => ({ ...slot, response: slot.response + data.text }))
+              break
+            case 'result':
+              setSlot(data.index, slot => ({ ...slot, requirement_id: data.requirement_id, response: data.response }))
+              break
+            case 'done':
+              setPreviewId(data.preview_id)
+              setSummary(`Response preview ready (${data.total} responses)`)
+              break
+            case 'error':
+              setSummary(`Failed to generate preview: ${data.detail}`)
+              break
+            default:
+              break
+          }
+        }
+      )
+    } catch (err) {
+      console.error(err)
+      setSummary(`Failed to generate preview: ${err.message}`)
+    } finally {
+      setIsStreamingPreview(false)
+    }
+  }
+
+  const handlePreviewEdit = async (requirementId, responseText) => {
+    if (!previewId) {
+      setSummary('The preview is still being generated; edits can be saved once it is ready')
+      return
+    }
+    try {
+      await updateResponse(previewId, requirementId, responseText)
+    } catch (err) {
+      console.error('Failed to update response:', err)
+      setSummary(`Failed to update response: ${err.message}`)
+    }
+  }
+
+  const handlePreviewExport = async (format) => {
+    if (!previewId) {
+      setSummary('The preview is still being generated')
+      return
+    }
+    try {
+      const result = await generatePDFFromPreview(previewId, pipelineData.preprocess, pipelineData.requirements, format)
+      const extension = format === 'markdown' ? 'md' : format
+      const url = window.URL.createObjectURL(result.blob)
+      const a = document.createElement('a')
+      a.href = url
+      a.download = `rfp_response_${new Date().getTime()}.${extension}`
+      document.body.appendChild(a)
+      a.click()
+      window.URL.revokeObjectURL(url)
+      document.body.removeChild(a)
+    } catch (err) {
+      console.error('Failed to export preview:', err)
+      setSummary(`Failed to export preview: ${err.message}`)
+    }
+  }
+
   // Handle saving DOCX (supports both original blob and edited HTML)
   const handleSaveDocx = async (docxBase64, htmlContent, filename = null) => {
     try {
@@ -819,8 +916,20 @@ export default function AgentPanel({ agentId }) {
           <Button onClick={handleGenerateResponse} disabled={status === 'processing' || isGeneratingDocx || statuses.response === 'processing'}>
             {isGeneratingDocx || statuses.response === 'processing' ? 'Generating...' : 'Generate DOCX'}
           </Button>
+          <Button variant="secondary" onClick={handleStreamPreview} disabled={isStreamingPreview || isGeneratingDocx}>
+            {isStreamingPreview ? 'Previewing...' : 'Preview responses'}
+          </Button>
         </div>
       )}
+
+      {showResponsePreview && (
+        <ResponsePreview
+          responses={streamedResponses.filter(Boolean)}
+          onEdit={handlePreviewEdit}
+          onExport={handlePreviewExport}
+          onClose={() => setShowResponsePreview(false)}
+        />
+      )}
       
       {/* Chat is now in fixed sidebar - removed from here */}
     </div>
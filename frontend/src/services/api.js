@@ -247,6 +247,51 @@ export async function previewResponses(preprocess, requirements, options = {}) {
   return await response.json();
 }
 
+export async function streamPreviewResponses(preprocess, requirements, options = {}, onEvent = () => {}) {
+  const { use_rag = true, num_retrieval_chunks = 5, session_id = null } = options;
+
+  const response = await fetch(`${API_BASE}/preview-responses/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      preprocess,
+      requirements,
+      use_rag,
+      num_retrieval_chunks,
+      session_id,
+    }),
+  });
+
+  if (!response.ok) {
+    const text = await response.text();
+    throw new Error(`Preview responses stream error ${response.status}: ${text.slice(0, 200)}`);
+  }
+
+  // Parse Server-Sent Events ("event: <name>\ndata: <json>\n\n") as they arrive
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let data = "";
+      raw.split("\n").forEach((line) => {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      });
+      onEvent(event, data ? JSON.parse(data) : null);
+    }
+  }
+}
+
 export async function previewContext(preprocess, requirements, options = {}) {
   const { use_rag = true, num_retrieval_chunks = 5, session_id = null } = options;
 